@@ -0,0 +1,7 @@
+"""End-to-end benchmarks: scripted model, replayed store sites, JSON reports.
+
+``python -m benchmarks.run`` drives ``POST /sessions`` through FastAPI's
+test client with ``fake_llm.ScriptedLlm`` in place of the real model and the
+store fixtures in ``tests/fixtures/sites`` served by the site replay harness,
+so runs are repeatable and comparable between commits.
+"""
@@ -0,0 +1,174 @@
+"""A deterministic model that replays a scripted sequence of tool calls.
+
+A script turns the session's first message (the JSON payload with the store
+and items) into a list of steps: ``ToolCall``s, then a final text. The model
+is stateless: each call counts the tool calls already in the request to
+find its next step, so concurrent sessions and retries behave the same way.
+Like a real model, it reads the items history compaction collapsed from the
+ledger's "✓" lines and skips the script steps that added them.
+Token usage is estimated from the request size (4 characters per token) so
+the budget, metrics and history-size effects stay realistic.
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Callable, Union
+
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.genai import types
+
+from pricepilot.tools.compaction import content_chars
+from pricepilot.tools.tool_results import ADD_TOOLS, BATCH_ADD_TOOL, tool_payload
+
+# Args, or a function of the previous tool result returning the args
+Args = Union[dict[str, Any], Callable[[dict], dict[str, Any]]]
+
+
+@dataclass(frozen=True)
+class ToolCall:
+    name: str
+    args: Args
+
+
+Step = Union[ToolCall, str]
+Script = Callable[[dict], list[Step]]
+
+_CHARS_PER_TOKEN = 4
+
+
+def _progress(contents: list[types.Content]) -> tuple[dict, int, int, dict]:
+    """The session payload, items in the compaction ledger, tool calls made
+    after the payload and the last tool result."""
+    payload: dict = {}
+    collapsed = 0
+    calls = 0
+    last: dict = {}
+    for content in contents:
+        for part in content.parts or []:
+            if part.text and content.role == "user" and not payload:
+                try:
+                    candidate = json.loads(part.text)
+                except ValueError:
+                    continue
+                if isinstance(candidate, dict) and "items" in candidate:
+                    payload = candidate
+            elif part.text and content.role == "user":
+                collapsed += sum(line.startswith("✓ ") for line in part.text.splitlines())
+            elif part.function_call is not None and payload:
+                calls += 1
+            elif part.function_response is not None:
+                last = tool_payload(part.function_response.response)
+    return payload, collapsed, calls, last
+
+
+def _items_added(step: ToolCall) -> int:
+    if step.name in ADD_TOOLS:
+        return 1
+    if step.name == BATCH_ADD_TOOL and isinstance(step.args, dict):
+        return len(step.args.get("items") or [])
+    return 0
+
+
+def _steps_collapsed(tool_steps: list[ToolCall], items: int) -> int:
+    """Script steps up to the one that added the ``items``-th item."""
+    added = 0
+    for idx, step in enumerate(tool_steps):
+        if added >= items:
+            return idx
+        added += _items_added(step)
+    return len(tool_steps)
+
+
+def _request_chars(llm_request: LlmRequest) -> int:
+    chars = len(str(llm_request.config.system_instruction or "")) if llm_request.config else 0
+    return chars + content_chars(llm_request.contents)
+
+
+class ScriptedLlm(BaseLlm):
+    """Replays ``script`` for every session."""
+
+    model: str = "scripted"
+    script: Callable[[dict], list]
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False,
+    ) -> AsyncGenerator[LlmResponse, None]:
+        payload, collapsed, calls, last = _progress(llm_request.contents)
+        steps = self.script(payload)
+        tool_steps = [s for s in steps if isinstance(s, ToolCall)]
+        if collapsed:
+            # The steps up to the last collapsed add left the request with it
+            calls += _steps_collapsed(tool_steps, collapsed)
+        if calls < len(tool_steps):
+            step = tool_steps[calls]
+            args = step.args(last) if callable(step.args) else step.args
+            part = types.Part(function_call=types.FunctionCall(name=step.name, args=args))
+            out_chars = len(json.dumps(args, ensure_ascii=False))
+        else:
+            text = next((s for s in steps if isinstance(s, str)), "Done.")
+            part = types.Part(text=text)
+            out_chars = len(text)
+        yield LlmResponse(
+            content=types.Content(role="model", parts=[part]),
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=_request_chars(llm_request) // _CHARS_PER_TOKEN,
+                candidates_token_count=out_chars // _CHARS_PER_TOKEN + 1,
+            ),
+        )
+
+
+def _item_args(item: dict) -> dict:
+    args = {"name": item["name"], "quantity": item.get("quantity", 1)}
+    if item.get("barcode"):
+        args["barcode"] = item["barcode"]
+    return args
+
+
+def recipe_script(payload: dict) -> list[Step]:
+    """Phase 1 navigation, one ``add_item_by_recipe`` per item, then close."""
+    items = payload.get("items", [])
+    return [
+        ToolCall("navigate", {"url": payload.get("store_url", "")}),
+        ToolCall("screenshot", {"compact": True}),
+        *[ToolCall("add_item_by_recipe", _item_args(item)) for item in items],
+        ToolCall("close_browser", {}),
+        f"Added {len(items)} items. The cart is ready for checkout.",
+    ]
+
+
+def _best_handle(last: dict) -> str:
+    return (last.get("match") or {}).get("handle") or "p1"
+
+
+def search_script(payload: dict) -> list[Step]:
+    """Navigation, then ``search_products`` + ``add_candidate`` and a screenshot per item."""
+    items = payload.get("items", [])
+    steps: list[Step] = [
+        ToolCall("navigate", {"url": payload.get("store_url", "")}),
+        ToolCall("screenshot", {}),
+    ]
+    for item in items:
+        quantity = item.get("quantity", 1)
+        steps += [
+            ToolCall("search_products", {"query": item["name"]}),
+            ToolCall("add_candidate",
+                     lambda last, quantity=quantity: {"handle": _best_handle(last),
+                                                      "quantity": quantity}),
+            ToolCall("screenshot", {"selector": "results"}),
+        ]
+    steps += [ToolCall("close_browser", {}), f"Added {len(items)} items."]
+    return steps
+
+
+def chat_script(payload: dict) -> list[Step]:
+    """No tools: measures the API, job queue and runner overhead alone."""
+    return [f"Received {len(payload.get('items', []))} items."]
+
+
+SCRIPTS: dict[str, Script] = {
+    "recipe": recipe_script,
+    "search": search_script,
+    "chat": chat_script,
+}
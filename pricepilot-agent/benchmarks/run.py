@@ -0,0 +1,313 @@
+"""Run the end-to-end benchmark and write a JSON report.
+
+    python -m benchmarks.run --script recipe --concurrency 1,4,16 --out after.json
+    python -m benchmarks.run --compare before.json --out after.json
+
+Each concurrency level starts ``concurrency × rounds`` sessions at once via
+``POST /sessions`` on a ``TestClient``, with the job manager running
+``concurrency`` agent runs at a time, and waits for every run to finish.
+The model is ``fake_llm.ScriptedLlm`` and store pages come from the replay
+harness (``SITE_REPLAY_DIR`` = ``tests/fixtures/sites`` by default), so
+nothing leaves the machine. Per level the report has p50/p95 run latency
+(job start to finish) and session latency (request to finish), throughput,
+tool calls per item, screenshot bytes and LLM input tokens per session, and
+tool errors; ``chromium_peak_rss_mb`` is the peak summed RSS of the Chromium
+processes under this one.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from fastapi.testclient import TestClient
+
+from benchmarks.fake_llm import SCRIPTS, ScriptedLlm
+from pricepilot.api import server
+from pricepilot.tools.site_replay import site_replay
+
+FIXTURE_SITES = Path(__file__).resolve().parent.parent / "tests" / "fixtures" / "sites"
+
+DEFAULT_STORE = "שופרסל"
+DEFAULT_ITEMS = [
+    {"name": "חלב תנובה 3% 1 ליטר", "quantity": 2, "barcode": "7290000066318"},
+    {"name": "ביצים L 12 יחידות", "quantity": 1},
+    {"name": "קוטג' 5% תנובה 250 גרם", "quantity": 1},
+]
+_FINISHED = ("done", "error", "cancelled")
+_POLL_SECONDS = 0.02
+
+
+def _percentile(values: list[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile (None for no values)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return round(ordered[rank - 1], 3)
+
+
+class ChromiumSampler:
+    """Samples the summed RSS of Chromium processes descended from this one."""
+
+    def __init__(self, interval: float = 0.2) -> None:
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _children() -> dict[int, list[int]]:
+        children: dict[int, list[int]] = {}
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    # The name may contain spaces; the ppid follows the last ")"
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+        return children
+
+    def sample(self) -> int:
+        """Current summed RSS in bytes (0 when /proc is unavailable)."""
+        if not os.path.isdir("/proc"):
+            return 0
+        children = self._children()
+        total = 0
+        stack = list(children.get(os.getpid(), []))
+        while stack:
+            pid = stack.pop()
+            stack.extend(children.get(pid, []))
+            try:
+                with open(f"/proc/{pid}/cmdline", "rb") as f:
+                    cmdline = f.read()
+                if b"chrom" not in cmdline and b"headless_shell" not in cmdline:
+                    continue
+                with open(f"/proc/{pid}/status") as f:
+                    for line in f:
+                        if line.startswith("VmRSS:"):
+                            total += int(line.split()[1]) * 1024
+                            break
+            except (OSError, ValueError):
+                continue
+        self.peak_bytes = max(self.peak_bytes, total)
+        return total
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._loop, name="rss-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def _wait_for_runs(client: TestClient, session_ids: list[str], timeout: float) -> dict[str, dict]:
+    """Poll until every session's run has finished; returns their final status."""
+    deadline = time.monotonic() + timeout
+    statuses: dict[str, dict] = {}
+    pending = list(session_ids)
+    while pending:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{len(pending)} benchmark sessions still running")
+        for session_id in list(pending):
+            status = client.get(f"/sessions/{session_id}", params={"user_id": "bench"}).json()
+            if (status.get("job") or {}).get("state") in _FINISHED:
+                statuses[session_id] = status
+                pending.remove(session_id)
+        time.sleep(_POLL_SECONDS)
+    return statuses
+
+
+def run_level(
+    client: TestClient, concurrency: int, sessions: int, store: str, items: list[dict],
+    timeout: float,
+) -> dict:
+    """Start ``sessions`` carts at once and summarize them."""
+    body = {"user_id": "bench", "store_name": store, "items": items}
+    start = time.monotonic()
+    session_ids = []
+    for _ in range(sessions):
+        response = client.post("/sessions", json=body)
+        response.raise_for_status()
+        session_ids.append(response.json()["session_id"])
+    statuses = _wait_for_runs(client, session_ids, timeout)
+    wall = time.monotonic() - start
+
+    run_latency, session_latency = [], []
+    tool_calls = tool_errors = screenshot_bytes = input_tokens = failed = 0
+    for status in statuses.values():
+        job = status["job"]
+        if job["state"] != "done":
+            failed += 1
+        if job.get("started_at") and job.get("finished_at"):
+            run_latency.append(job["finished_at"] - job["started_at"])
+            session_latency.append(job["finished_at"] - job["created_at"])
+        metrics = status.get("metrics") or {}
+        for name, tool in (metrics.get("tools") or {}).items():
+            tool_calls += tool["calls"]
+            tool_errors += tool["errors"]
+            if name == "screenshot":
+                screenshot_bytes += tool["payload_bytes"]
+        input_tokens += (metrics.get("llm") or {}).get("input_tokens", 0)
+
+    for session_id in session_ids:
+        client.delete(f"/sessions/{session_id}", params={"user_id": "bench"})
+
+    return {
+        "concurrency": concurrency,
+        "sessions": sessions,
+        "failed_sessions": failed,
+        "wall_seconds": round(wall, 3),
+        "throughput_per_minute": round(sessions / wall * 60, 2) if wall else None,
+        "run_latency_p50": _percentile(run_latency, 50),
+        "run_latency_p95": _percentile(run_latency, 95),
+        "session_latency_p50": _percentile(session_latency, 50),
+        "session_latency_p95": _percentile(session_latency, 95),
+        "tool_calls_per_item": round(tool_calls / (sessions * len(items)), 2) if items else None,
+        "tool_errors": tool_errors,
+        "screenshot_bytes_per_session": screenshot_bytes // sessions,
+        "input_tokens_per_session": input_tokens // sessions,
+    }
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            check=True, cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(
+    script: str = "recipe",
+    levels: tuple[int, ...] = (1, 4, 16),
+    rounds: int = 1,
+    store: str = DEFAULT_STORE,
+    items: Optional[list[dict]] = None,
+    sites: str = str(FIXTURE_SITES),
+    timeout: float = 600,
+    warmup: bool = True,
+) -> dict:
+    """Benchmark the whole API at each concurrency level; returns the report."""
+    items = items or DEFAULT_ITEMS
+    agent = server.runner.agent
+    original = (agent.model, server.job_manager.concurrency, site_replay.mode, site_replay.root)
+    agent.model = ScriptedLlm(script=SCRIPTS[script])
+    site_replay.configure("replay", sites)
+    sampler = ChromiumSampler()
+    sampler.start()
+    results = []
+    try:
+        if warmup:
+            # One uncounted cart first: imports, model setup and first page loads
+            server.job_manager.concurrency = 1
+            with TestClient(server.app) as client:
+                run_level(client, 1, 1, store, items, timeout)
+        for concurrency in levels:
+            # Workers are created at startup, so each level gets its own lifespan
+            server.job_manager.concurrency = concurrency
+            with TestClient(server.app) as client:
+                results.append(run_level(
+                    client, concurrency, concurrency * rounds, store, items, timeout,
+                ))
+    finally:
+        sampler.stop()
+        agent.model, server.job_manager.concurrency = original[0], original[1]
+        site_replay.configure(original[2], original[3])
+
+    return {
+        "commit": _commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "script": script,
+        "store": store,
+        "items": len(items),
+        "levels": results,
+        "chromium_peak_rss_mb": round(sampler.peak_bytes / 2**20, 1),
+    }
+
+
+# Lower is better for all of these except throughput
+_COMPARED = (
+    "run_latency_p50", "run_latency_p95", "session_latency_p50", "session_latency_p95",
+    "throughput_per_minute", "tool_calls_per_item", "screenshot_bytes_per_session",
+    "input_tokens_per_session",
+)
+
+
+def compare(current: dict, baseline: dict) -> list[str]:
+    """One line per metric and level: baseline → current and the relative change."""
+    lines = []
+    before = {level["concurrency"]: level for level in baseline.get("levels", [])}
+    for level in current.get("levels", []):
+        old = before.get(level["concurrency"])
+        if old is None:
+            continue
+        for key in _COMPARED:
+            a, b = old.get(key), level.get(key)
+            if a is None or b is None:
+                continue
+            change = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+            lines.append(f"c={level['concurrency']:<3} {key:<30} {a:>12} → {b:<12} {change}")
+    a, b = baseline.get("chromium_peak_rss_mb"), current.get("chromium_peak_rss_mb")
+    if a is not None and b is not None:
+        lines.append(f"{'chromium_peak_rss_mb':<36} {a:>12} → {b}")
+    return lines
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--script", choices=sorted(SCRIPTS), default="recipe")
+    parser.add_argument("--concurrency", default="1,4,16",
+                        help="Comma-separated concurrency levels")
+    parser.add_argument("--rounds", type=int, default=1,
+                        help="Sessions per level = concurrency × rounds")
+    parser.add_argument("--store", default=DEFAULT_STORE)
+    parser.add_argument("--sites", default=str(FIXTURE_SITES),
+                        help="Directory of recorded HAR files to replay")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false",
+                        help="Skip the uncounted warm-up session")
+    parser.add_argument("--out", help="Write the JSON report here")
+    parser.add_argument("--compare", help="A previous JSON report to compare against")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(
+        script=args.script,
+        levels=tuple(int(c) for c in args.concurrency.split(",")),
+        rounds=args.rounds,
+        store=args.store,
+        sites=args.sites,
+        timeout=args.timeout,
+        warmup=args.warmup,
+    )
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    print(text)
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        print("\n".join(compare(report, baseline)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
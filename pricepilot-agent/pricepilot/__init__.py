@@ -1 +1,4 @@
 """PricePilot - Google ADK agent for autonomous online grocery shopping."""
+
+# The one version number: package metadata, the API, /health, traces and HAR files
+__version__ = "0.3.0"
@@ -7,21 +7,28 @@ the checkout URL.
 """
 
 from google.adk.agents import LlmAgent
-from google.adk.tools import FunctionTool
 
 from pricepilot.config import MODEL_ID
+from pricepilot.tools.budget import BudgetedTool, count_model_tokens, stop_when_spent
 from pricepilot.tools.browser_tools import (
+    add_candidate,
+    add_item_by_recipe,
+    add_items_parallel,
     click,
     close_browser,
     extract_products,
     get_page_info,
+    go_to_checkout,
     navigate,
     press_key,
+    save_store_setup,
     screenshot,
     scroll,
+    search_products,
     type_text,
     wait_for,
 )
+from pricepilot.tools.compaction import compact_history
 
 AGENT_INSTRUCTION = """\
 You are PricePilot, an autonomous browser agent that builds a shopping cart \
@@ -43,7 +50,10 @@ message with this structure:
 ## Your workflow
 
 ### Phase 1 — Navigate to the store
-1. Call `navigate` with the `store_url`.
+1. Call `navigate` with the `store_url`. If the result contains \
+   `"store_setup_restored": true`, the popups and delivery address were \
+   already handled by an earlier session: take one `screenshot` to confirm \
+   the store page looks ready, and if it does, go straight to Phase 2.
 2. Take a `screenshot` to see the landing page.
 3. Dismiss any cookie banners or popups — look for buttons with text like \
    "אישור", "סגור", "קיבלתי", "X", or "OK". Use `click` or `press_key("Escape")`.
@@ -52,34 +62,72 @@ message with this structure:
      autocomplete suggestions, then `click` the matching suggestion.
    - If prompted for a specific address or branch, pick the first reasonable option.
 5. Confirm you are on the store's main shopping page by checking `get_page_info`.
+6. Call `save_store_setup` so later sessions can skip this phase.
 
 ### Phase 2 — Add items to cart
-For each item in the `items` array:
+If there are more than 3 items, first call `add_items_parallel(items)` with \
+the whole `items` array. It adds items on several tabs at once and returns \
+the items `added` (name and quantity), the `fallback` items that still need work, and a `cart` \
+check. Announce how many were added. Then handle only the `fallback` items. \
+An item whose `failed_step` is "quantity" is already in the cart: skip \
+step 1 and do not add it again, only correct its quantity. Run every other \
+fallback item through the full steps below. If `cart.consistent` is \
+false or any item is listed under `unverified`, open the cart at the end \
+of Phase 2 and verify it before checkout; do not add `unverified` items \
+again unless the cart is missing them.
+
+For each item in the `items` array (or each remaining fallback item):
 1. Announce progress: "Adding item 3/8: חלב תנובה 3%..."
-2. Find the search bar — look for `input[type="search"]`, `input[name="q"]`, \
+   Then call `add_item_by_recipe(name, quantity, barcode, manufacturer)`. If \
+   it returns `"added": true` and no `"fallback"`, the item is done — move on \
+   to the next item (`"direct": true` means it was added from a known \
+   product page without searching; `"verified": false` means the cart \
+   badge did not change, so check the cart before adding it again). If it \
+   returns `"fallback": true`, \
+   continue with the steps below for this item (if `failed_step` is \
+   "quantity", the item is already in the cart and only the quantity needs \
+   fixing).
+2. Call `search_products(name, barcode, manufacturer)`. It searches, ranks \
+   the results against the item locally and returns the top products (with \
+   a `handle`, name, price and `score`) and a `match`. If \
+   `match.confident` is true, call \
+   `add_candidate(match.handle, quantity, barcode)` right away — no \
+   screenshot and no question to the user. Otherwise choose among the \
+   returned products using the rules in step 7 (ask the user if still \
+   unsure), then call `add_candidate(handle, quantity, barcode)`, which \
+   clicks add and "+" for you. If it returns `"added": true`, the item is \
+   done. Only if `search_products` returns an error or no products, or \
+   `add_candidate` fails, continue with the manual steps below.
+3. Find the search bar — look for `input[type="search"]`, `input[name="q"]`, \
    `input[placeholder*="חיפוש"]`, `input[placeholder*="חפש"]`, or similar. \
    Use `get_page_info` if you can't find it.
-3. Clear the search field, `type_text` the item name (use the Hebrew name), \
+4. Clear the search field, `type_text` the item name (use the Hebrew name), \
    then `press_key("Enter")`.
-4. Wait briefly (`wait_for(1500)`) for results to load.
-5. Take a `screenshot` to see the search results.
-6. Evaluate the results:
+5. Wait for results with `wait_for(5000, until="selector")` — it returns as \
+   soon as result cards appear. After clicking "add", use \
+   `wait_for(3000, until="cart_change")` rather than a fixed wait.
+6. Take a `screenshot(selector="results")` to see only the search results.
+7. Evaluate the results:
    - If a barcode was provided and you see a matching product, add it.
    - If multiple similar products appear, pick the one whose name is closest \
      to the requested item. Prefer matching brand/manufacturer if provided.
    - If results are ambiguous (e.g., different sizes or brands) and you're not \
      confident, ASK THE USER: describe the top 2-3 options and wait for their \
      reply. DO NOT continue until they respond.
-7. Click "Add to Cart" — look for buttons with text like "הוסף לסל", \
+8. Click "Add to Cart" — look for buttons with text like "הוסף לסל", \
    "הוספה לסל", "הוסף", "לסל", "+", or an add-to-cart icon.
-8. If `quantity` > 1, click the "+" button or quantity increment the required \
+9. If `quantity` > 1, click the "+" button or quantity increment the required \
    number of times.
-9. If adding fails after 2 attempts (element not found, timeout), SKIP the \
-   item. Tell the user: "Could not add [item name] — skipping."
-10. After adding, go back to the search bar for the next item (click the \
+10. If adding fails after 2 attempts (element not found, timeout), SKIP the \
+    item. Tell the user: "Could not add [item name] — skipping."
+11. After adding, go back to the search bar for the next item (click the \
     search icon or navigate to the main page if needed).
 
 ### Phase 3 — Checkout
+First call `go_to_checkout`. It opens the cart and clicks the checkout button \
+using the store's recipe. If it returns `"checkout": true`, take one \
+`screenshot` to confirm the cart total and the checkout page, then continue \
+from step 5. If it returns `"fallback": true`, do steps 1–4 yourself.
 1. After all items are processed, navigate to the cart — look for a cart icon, \
    "סל הקניות", "לסל", or similar link/button.
 2. Take a `screenshot` of the cart to verify items.
@@ -95,7 +143,14 @@ For each item in the `items` array:
 
 - **Screenshots**: Take a screenshot after navigation, after search results \
   load, and when something unexpected happens. Do NOT screenshot after every \
-  single click — that wastes tokens.
+  single click — that wastes tokens. Crop with `selector` (an element, or \
+  "results" for the result grid) and use `compact=True` when colors don't \
+  matter. If a screenshot returns `"unchanged": true`, the page looks the \
+  same as your previous screenshot of that region — reuse what you saw.
+- **Page info**: `get_page_info` lists visible elements as `{ref, role, name}`. \
+  Pass a `ref` (e.g. "12") to `click` or `type_text` instead of guessing a \
+  selector. Use `get_page_info(mode="diff")` to see only what changed since \
+  your previous call.
 - **Hebrew sites**: Most Israeli supermarket sites are in Hebrew (RTL). Button \
   text is Hebrew. Common patterns:
   - Search: "חיפוש", "חפש מוצרים"
@@ -109,7 +164,10 @@ For each item in the `items` array:
   login, OTP), STOP and WAIT for their reply. Do not continue on your own.
 - **Progress updates**: Always tell the user which item you're working on \
   (e.g., "Adding item 3/8: ביצים L 12 יחידות").
-- **Max actions**: You have a budget of ~100 browser actions. Be efficient.
+- **Budget**: Each session has a hard budget of tool calls, browser time and \
+  tokens. When a tool result contains a `budget` warning, finish the item \
+  you're on and go to Phase 3. Once it is exhausted, search and add tools are \
+  refused: go straight to the cart and checkout with the few actions left.
 - **Error recovery**: If a page fails to load, try refreshing once. If a \
   popup blocks you, try Escape or look for a close button. If you're truly \
   stuck, tell the user what happened.
@@ -119,16 +177,26 @@ root_agent = LlmAgent(
     name="cart_builder",
     model=MODEL_ID,
     instruction=AGENT_INSTRUCTION,
+    # Budget accounting: tokens per model call, and a final message instead
+    # of another call once the session has spent its budget
+    before_model_callback=[stop_when_spent, compact_history],
+    after_model_callback=count_model_tokens,
     tools=[
-        FunctionTool(navigate),
-        FunctionTool(screenshot),
-        FunctionTool(click),
-        FunctionTool(type_text),
-        FunctionTool(press_key),
-        FunctionTool(scroll),
-        FunctionTool(get_page_info),
-        FunctionTool(extract_products),
-        FunctionTool(wait_for),
-        FunctionTool(close_browser),
+        BudgetedTool(navigate),
+        BudgetedTool(screenshot),
+        BudgetedTool(click),
+        BudgetedTool(type_text),
+        BudgetedTool(press_key),
+        BudgetedTool(scroll),
+        BudgetedTool(get_page_info),
+        BudgetedTool(extract_products),
+        BudgetedTool(wait_for),
+        BudgetedTool(add_item_by_recipe),
+        BudgetedTool(add_items_parallel),
+        BudgetedTool(search_products),
+        BudgetedTool(add_candidate),
+        BudgetedTool(save_store_setup),
+        BudgetedTool(go_to_checkout),
+        BudgetedTool(close_browser),
     ],
 )
@@ -0,0 +1,141 @@
+"""Admission control: how many agent runs this process takes on, and who waits.
+
+Every running session drives a Chromium context and an LLM conversation, so
+running too many at once on a small instance (2 GiB / 2 vCPU on Vertex)
+exhausts memory and slows every session down together. ``detect_capacity``
+sizes the job workers from the memory and CPUs actually available to the
+process (cgroup limits first, then the host's totals). Runs beyond that
+wait in a ``FairQueue``: one FIFO per user, served round-robin, so one user
+submitting many carts cannot starve the others. The queue is bounded; when
+it is full, the API answers 429 with ``Retry-After``.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Generic, Hashable, Optional, TypeVar
+
+from pricepilot.config import (
+    ADMISSION_MEMORY_PER_SESSION_MB,
+    ADMISSION_RESERVED_MEMORY_MB,
+    ADMISSION_SESSIONS_PER_CPU,
+)
+
+_MB = 1024 * 1024
+
+T = TypeVar("T")
+
+
+class QueueFull(Exception):
+    """The admission queue has no room for another run."""
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        return Path(path).read_text().strip()
+    except OSError:
+        return None
+
+
+def available_memory() -> Optional[int]:
+    """Bytes of memory the process may use: cgroup limit, else the host total."""
+    limits = []
+    # cgroup v2, then v1 ("max" / huge numbers mean unlimited)
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        value = _read(path)
+        if value and value.isdigit() and int(value) < 1 << 60:
+            limits.append(int(value))
+    meminfo = _read("/proc/meminfo") or ""
+    for line in meminfo.splitlines():
+        if line.startswith("MemTotal:"):
+            limits.append(int(line.split()[1]) * 1024)
+            break
+    return min(limits) if limits else None
+
+
+def available_cpus() -> float:
+    """CPUs the process may use: cgroup quota, else its affinity mask."""
+    try:
+        cpus: float = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        cpus = os.cpu_count() or 1
+    quota = _read("/sys/fs/cgroup/cpu.max")
+    if quota:
+        limit, _, period = quota.partition(" ")
+        if limit.isdigit() and period.isdigit() and int(period):
+            cpus = min(cpus, int(limit) / int(period))
+    return cpus
+
+
+def detect_capacity(ceiling: int) -> int:
+    """Agent runs to execute at once, from available memory and CPUs (1..ceiling)."""
+    capacity = ceiling
+    memory = available_memory()
+    if memory is not None:
+        usable = memory - ADMISSION_RESERVED_MEMORY_MB * _MB
+        capacity = min(capacity, usable // (ADMISSION_MEMORY_PER_SESSION_MB * _MB))
+    capacity = min(capacity, math.floor(available_cpus() * ADMISSION_SESSIONS_PER_CPU))
+    return max(1, int(capacity))
+
+
+class FairQueue(Generic[T]):
+    """Bounded queue of per-key FIFOs, served round-robin across keys.
+
+    With ``fair=False`` every item shares one FIFO.
+    """
+
+    def __init__(self, maxsize: int, fair: bool = True) -> None:
+        self.maxsize = maxsize
+        self.fair = fair
+        self._queues: OrderedDict[Hashable, deque[T]] = OrderedDict()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def put(self, key: Hashable, item: T) -> None:
+        if self.maxsize and self._size >= self.maxsize:
+            raise QueueFull(f"Queue is full ({self.maxsize} waiting)")
+        self._queues.setdefault(key if self.fair else None, deque()).append(item)
+        self._size += 1
+
+    def pop(self) -> Optional[T]:
+        """Next item (the next key's oldest), or None if empty."""
+        if not self._queues:
+            return None
+        key, queue = next(iter(self._queues.items()))
+        item = queue.popleft()
+        self._size -= 1
+        # The served key goes to the back of the rotation
+        del self._queues[key]
+        if queue:
+            self._queues[key] = queue
+        return item
+
+    def remove(self, item: T) -> bool:
+        for key, queue in self._queues.items():
+            if item in queue:
+                queue.remove(item)
+                self._size -= 1
+                if not queue:
+                    del self._queues[key]
+                return True
+        return False
+
+    def order(self) -> list[T]:
+        """All items in the order ``pop`` would return them."""
+        queues = [list(q) for q in self._queues.values()]
+        result: list[T] = []
+        for depth in range(max(map(len, queues), default=0)):
+            result.extend(q[depth] for q in queues if depth < len(q))
+        return result
+
+    def position(self, item: T) -> Optional[int]:
+        """1-based position of ``item`` in pop order, or None if not queued."""
+        for idx, queued in enumerate(self.order(), start=1):
+            if queued is item:
+                return idx
+        return None
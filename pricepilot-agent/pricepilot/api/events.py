@@ -0,0 +1,95 @@
+"""Typed progress events derived from ADK runner events.
+
+The streaming endpoints forward what the agent does while it runs instead
+of answering after the whole cart is built. ``ProgressTracker`` turns each
+ADK event into zero or more typed events:
+
+- ``message``: model text for the user
+- ``tool_call`` / ``tool_result``: which tool ran and whether it worked
+- ``item_progress``: "3/8 added", counted from the add tools' results
+- ``question``: the run ended on a question the user must answer
+- ``checkout_ready``: the agent reached the store's checkout page
+
+The tracker lives as long as the session, so the item count carries over
+between the initial run and later message runs.
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from pricepilot.tools.tool_results import ADD_TOOLS, BATCH_ADD_TOOL, tool_payload
+
+# Max characters of tool arguments forwarded in tool_call events
+_MAX_ARGS_CHARS = 200
+
+
+def sse(event: dict) -> str:
+    """Format one typed event as a Server-Sent Events frame."""
+    data = json.dumps(event, ensure_ascii=False)
+    return f"event: {event['type']}\ndata: {data}\n\n"
+
+
+@dataclass
+class ProgressTracker:
+    """Item counts and checkout state for one session, fed with ADK events."""
+
+    total: int = 0
+    added: int = 0
+    checkout_url: Optional[str] = None
+    last_text: str = ""
+
+    def _item_progress(self, item: Optional[str]) -> dict:
+        return {"type": "item_progress", "added": self.added, "total": self.total,
+                "item": item}
+
+    def _tool_result(self, name: str, response: Any) -> list[dict]:
+        payload = tool_payload(response)
+        result = {"type": "tool_result", "name": name, "ok": "error" not in payload}
+        if "error" in payload:
+            result["error"] = str(payload["error"])[:200]
+        events = [result]
+
+        if name in ADD_TOOLS and payload.get("added"):
+            self.added += 1
+            events.append(self._item_progress(payload.get("item") or payload.get("name")))
+        elif name == BATCH_ADD_TOOL:
+            added = payload.get("added") or []
+            self.added += len(added)
+            if added:
+                events.append(self._item_progress(added[-1].get("item")))
+        return events
+
+    def events_for(self, event: Any) -> list[dict]:
+        """Typed events for one ADK event (also updates the counters)."""
+        content = getattr(event, "content", None)
+        if not content or not content.parts:
+            return []
+        events: list[dict] = []
+        for part in content.parts:
+            call = getattr(part, "function_call", None)
+            response = getattr(part, "function_response", None)
+            if call is not None:
+                args = json.dumps(call.args or {}, ensure_ascii=False)
+                events.append({"type": "tool_call", "name": call.name,
+                               "args": args[:_MAX_ARGS_CHARS]})
+            elif response is not None:
+                events.extend(self._tool_result(response.name, response.response))
+            elif getattr(part, "text", None) and content.role == "model":
+                self.last_text = part.text
+                events.append({"type": "message", "text": part.text})
+        return events
+
+    def finish(self, checkout_url: Optional[str]) -> list[dict]:
+        """Events closing a run: checkout reached, or a question for the user."""
+        events: list[dict] = []
+        if checkout_url and checkout_url != self.checkout_url:
+            self.checkout_url = checkout_url
+            events.append({"type": "checkout_ready", "url": checkout_url,
+                           "added": self.added, "total": self.total})
+        elif self.last_text.rstrip().endswith("?"):
+            events.append({"type": "question", "text": self.last_text})
+        self.last_text = ""
+        return events
@@ -0,0 +1,261 @@
+"""Background execution of agent runs with bounded concurrency.
+
+Endpoints no longer run the agent inline: they submit a ``Job`` and return
+the session id at once. A fixed number of worker tasks take jobs from the
+admission queue (``api/admission.py``) and run them, so only as many carts
+as the process can afford are built at a time and a client disconnect has
+no effect on the run. Each job
+keeps the typed progress events it published (see ``api/events.py``), so
+clients can poll the session or follow the events from any point. Jobs can
+be cancelled while queued or running.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+from pricepilot.api.admission import FairQueue, detect_capacity
+from pricepilot.config import (
+    ADMISSION_DEFAULT_RUN_SECONDS,
+    ADMISSION_FAIR_QUEUE,
+    ADMISSION_QUEUE_SIZE,
+    AGENT_RUN_CONCURRENCY,
+)
+
+# queued → running → done | error | cancelled
+ACTIVE_STATES = ("queued", "running")
+
+
+class JobConflict(Exception):
+    """The session already has a queued or running job."""
+
+
+@dataclass(eq=False)
+class Job:
+    """One agent run for a session, plus the events it published."""
+
+    session_id: str
+    user_id: str
+    content: Any
+    state: str = "queued"
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    events: list[dict] = field(default_factory=list)
+    task: Optional[asyncio.Task] = None
+    _followers: list[asyncio.Queue] = field(default_factory=list)
+
+    @property
+    def active(self) -> bool:
+        return self.state in ACTIVE_STATES
+
+    def publish(self, event: dict) -> None:
+        self.events.append(event)
+        for queue in self._followers:
+            queue.put_nowait(event)
+
+    def _finish(self, state: str, error: Optional[str] = None) -> None:
+        self.state = state
+        self.error = error
+        self.finished_at = time.time()
+        for queue in self._followers:
+            queue.put_nowait(None)
+        self._followers.clear()
+
+    async def follow(self, keepalive: Optional[float] = None) -> AsyncIterator[Optional[dict]]:
+        """Yield every event published so far, then new ones until the job ends.
+
+        With ``keepalive`` set, yields None after that many idle seconds.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        history = list(self.events)
+        live = self.active
+        if live:
+            self._followers.append(queue)
+        for event in history:
+            yield event
+        if not live:
+            return
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if event is None:
+                    return
+                yield event
+        finally:
+            if queue in self._followers:
+                self._followers.remove(queue)
+
+    def as_dict(self) -> dict:
+        return {
+            "state": self.state,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+Runner = Callable[[Job], Awaitable[None]]
+
+# Weight of the latest run in the average run time used for ETAs
+_RUN_TIME_SMOOTHING = 0.2
+
+
+class JobManager:
+    """Admission queue of agent runs drained by ``concurrency`` worker tasks.
+
+    ``concurrency`` defaults to what the process can afford (see
+    ``api/admission.py``). Waiting runs are served round-robin per user;
+    ``submit`` raises ``QueueFull`` once ``queue_size`` runs are waiting.
+    """
+
+    def __init__(
+        self,
+        run: Runner,
+        concurrency: Optional[int] = None,
+        queue_size: int = ADMISSION_QUEUE_SIZE,
+        fair: bool = ADMISSION_FAIR_QUEUE,
+    ) -> None:
+        self._run = run
+        self.concurrency = max(1, concurrency or detect_capacity(AGENT_RUN_CONCURRENCY))
+        self._pending: FairQueue[Job] = FairQueue(queue_size, fair=fair)
+        self._ready: Optional[asyncio.Semaphore] = None
+        self._workers: list[asyncio.Task] = []
+        self._jobs: dict[str, Job] = {}
+        self._closing = False
+        self.avg_run_seconds = float(ADMISSION_DEFAULT_RUN_SECONDS)
+
+    def start(self) -> None:
+        """Start the workers (also done lazily on the first submit)."""
+        if self._workers:
+            return
+        self._closing = False
+        self._ready = asyncio.Semaphore(len(self._pending))
+        self._workers = [
+            asyncio.create_task(self._worker()) for _ in range(self.concurrency)
+        ]
+
+    async def _worker(self) -> None:
+        while True:
+            await self._ready.acquire()
+            job = self._pending.pop()
+            if job is None:
+                continue  # Its job was cancelled while waiting
+            job.state = "running"
+            job.started_at = time.time()
+            job.task = asyncio.create_task(self._run(job))
+            try:
+                await job.task
+                job._finish("done")
+            except asyncio.CancelledError:
+                job.publish({"type": "cancelled"})
+                job._finish("cancelled")
+                if self._closing:
+                    raise  # The worker itself is shutting down
+            except Exception as e:
+                job.publish({"type": "error", "message": str(e)[:150]})
+                job._finish("error", str(e)[:200])
+            else:
+                elapsed = job.finished_at - job.started_at
+                self.avg_run_seconds += _RUN_TIME_SMOOTHING * (elapsed - self.avg_run_seconds)
+
+    def submit(self, session_id: str, user_id: str, content: Any) -> Job:
+        """Queue a run for a session.
+
+        Raises JobConflict if the session already has an active run, and
+        QueueFull if no more runs may wait.
+        """
+        current = self._jobs.get(session_id)
+        if current is not None and current.active:
+            raise JobConflict(f"Session {session_id} is already {current.state}")
+        self.start()
+        job = Job(session_id=session_id, user_id=user_id, content=content)
+        self._pending.put(user_id, job)
+        self._jobs[session_id] = job
+        self._ready.release()
+        return job
+
+    def has_room(self, runs: int = 1) -> bool:
+        """True if ``runs`` more runs can be queued right now."""
+        size = self._pending.maxsize
+        return not size or len(self._pending) + runs <= size
+
+    def get(self, session_id: str) -> Optional[Job]:
+        """The session's latest job."""
+        return self._jobs.get(session_id)
+
+    def eta_seconds(self, position: int) -> int:
+        """Estimated wait before the run at queue ``position`` (1-based) starts."""
+        rounds = math.ceil(position / self.concurrency)
+        return math.ceil(rounds * self.avg_run_seconds)
+
+    def retry_after(self) -> int:
+        """Seconds a rejected client should wait: until one queued run has started."""
+        return max(1, math.ceil(self.avg_run_seconds / self.concurrency))
+
+    def describe(self, job: Job) -> dict:
+        """The job's state, plus its queue position and ETA while it waits."""
+        info = job.as_dict()
+        if job.state == "queued":
+            position = self._pending.position(job)
+            if position is not None:
+                info["queue_position"] = position
+                info["eta_seconds"] = self.eta_seconds(position)
+        return info
+
+    async def cancel(self, session_id: str) -> bool:
+        """Cancel the session's queued or running job. Returns True if one was active."""
+        job = self._jobs.get(session_id)
+        if job is None or not job.active:
+            return False
+        if job.state == "queued":
+            self._pending.remove(job)
+            job.publish({"type": "cancelled"})
+            job._finish("cancelled")
+            return True
+        job.task.cancel()
+        try:
+            await job.task
+        except BaseException:
+            pass
+        # Let the worker record the outcome before the caller moves on
+        await asyncio.sleep(0)
+        return True
+
+    def forget(self, session_id: str) -> None:
+        self._jobs.pop(session_id, None)
+
+    def stats(self) -> dict:
+        states = [job.state for job in self._jobs.values()]
+        return {
+            "concurrency": self.concurrency,
+            "queued": len(self._pending),
+            "queue_size": self._pending.maxsize,
+            "running": states.count("running"),
+            "avg_run_seconds": round(self.avg_run_seconds, 1),
+        }
+
+    async def close(self) -> None:
+        """Cancel running and queued jobs and stop the workers."""
+        self._closing = True
+        while (job := self._pending.pop()) is not None:
+            job.publish({"type": "cancelled"})
+            job._finish("cancelled")
+        for job in self._jobs.values():
+            if job.task is not None and not job.task.done():
+                job.task.cancel()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._ready = None
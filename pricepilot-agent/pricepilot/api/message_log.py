@@ -0,0 +1,107 @@
+"""Per-session chat message logs, materialized as agent events arrive.
+
+``GET /sessions/{id}`` used to rebuild every chat message from the full
+event history on each poll, with fresh random ids and timestamps, so clients
+could not tell new messages from ones they already had. Messages now take
+their id and timestamp from the ADK event they came from (``<event id>:<part
+index>``), and each session's messages are kept in an append-only
+``MessageLog`` fed with events as the runner yields them. A poll passes the
+cursor from its previous response (``?since=``) and gets only the messages
+after it.
+
+Logs are cached for up to ``MESSAGE_LOG_CACHE_SESSIONS`` sessions (least
+recently used are dropped). A session without a cached log, e.g. after a
+restart, is rebuilt once from its stored events, which yields the same ids.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any, Iterable, Optional
+
+from pricepilot.config import MESSAGE_LOG_CACHE_SESSIONS
+from pricepilot.types import ChatMessageOut
+
+
+def event_messages(event: Any) -> list[ChatMessageOut]:
+    """Chat messages for the text parts of one ADK event, with stable ids."""
+    content = getattr(event, "content", None)
+    if not content or not content.parts:
+        return []
+    messages: list[ChatMessageOut] = []
+    for idx, part in enumerate(content.parts):
+        if getattr(part, "text", None):
+            messages.append(ChatMessageOut(
+                id=f"{event.id}:{idx}",
+                type="bot" if content.role == "model" else "user",
+                text=part.text,
+                timestamp=event.timestamp * 1000,
+            ))
+    return messages
+
+
+class MessageLog:
+    """Append-only chat messages of one session; the cursor is the message count."""
+
+    def __init__(self) -> None:
+        self.messages: list[ChatMessageOut] = []
+        self._event_ids: set[str] = set()
+
+    @property
+    def cursor(self) -> int:
+        return len(self.messages)
+
+    def append(self, event: Any) -> int:
+        """Add an event's messages (once per event id). Returns how many were added."""
+        if getattr(event, "partial", False) or event.id in self._event_ids:
+            return 0
+        self._event_ids.add(event.id)
+        new = event_messages(event)
+        self.messages.extend(new)
+        return len(new)
+
+    def since(self, cursor: Optional[int]) -> list[ChatMessageOut]:
+        """Messages after ``cursor`` (all of them for None)."""
+        if not cursor:
+            return list(self.messages)
+        return self.messages[max(0, cursor):]
+
+
+class MessageLogs:
+    """LRU cache of ``MessageLog`` per session id."""
+
+    def __init__(self, max_sessions: int = MESSAGE_LOG_CACHE_SESSIONS) -> None:
+        self.max_sessions = max_sessions
+        self._logs: OrderedDict[str, MessageLog] = OrderedDict()
+
+    def get(self, session_id: str) -> Optional[MessageLog]:
+        log = self._logs.get(session_id)
+        if log is not None:
+            self._logs.move_to_end(session_id)
+        return log
+
+    def create(self, session_id: str, events: Iterable[Any] = ()) -> MessageLog:
+        """Start (or rebuild from stored ``events``) a session's log."""
+        log = MessageLog()
+        for event in events:
+            log.append(event)
+        self._logs[session_id] = log
+        self._logs.move_to_end(session_id)
+        while len(self._logs) > self.max_sessions:
+            self._logs.popitem(last=False)
+        return log
+
+    def append(self, session_id: str, event: Any) -> None:
+        """Feed a new event; ignored if the session's log is not cached."""
+        log = self._logs.get(session_id)
+        if log is not None:
+            log.append(event)
+
+    def drop(self, session_id: str) -> None:
+        self._logs.pop(session_id, None)
+
+    def __len__(self) -> int:
+        return len(self._logs)
+
+
+message_logs = MessageLogs()
@@ -7,34 +7,50 @@ and manage the PricePilot browser agent.
 from __future__ import annotations
 
 import json
+import re
 import time
 import uuid
 from contextlib import asynccontextmanager
-from typing import Any
+from typing import AsyncIterator, Optional
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
+from google.adk.sessions.base_session_service import GetSessionConfig
 from google.genai import types
 
+from pricepilot import __version__, metrics
 from pricepilot.agent import root_agent
-from pricepilot.config import HOST, PORT, STORE_URLS
-from pricepilot.tools.browser_tools import close_browser
+from pricepilot.api.admission import QueueFull
+from pricepilot.api.events import ProgressTracker, sse
+from pricepilot.api.jobs import Job, JobConflict, JobManager
+from pricepilot.api.message_log import MessageLog, message_logs
+from pricepilot.api.session_store import SessionSweeper, make_session_service
+from pricepilot.config import HOST, PORT, SESSION_BACKEND, STORE_URLS
+from pricepilot.tools.barcode_index import barcode_index
+from pricepilot.tools.budget import budget_ledger
+from pricepilot.tools.browser_pool import browser_pool
+from pricepilot.tools.storage_state import storage_state_cache
+from pricepilot.tracing import flush_tracing, session_spans, setup_tracing, tracer
 from pricepilot.types import (
+    BatchBuildCartRequest,
+    BatchStatusResponse,
     BuildCartRequest,
-    ChatMessageOut,
+    CartItem,
     MessageRequest,
     MessageResponse,
     SessionCreatedResponse,
     SessionStatusResponse,
+    StoreSessionStatus,
 )
 
 # ---------------------------------------------------------------------------
 # Session service & runner
 # ---------------------------------------------------------------------------
 
-session_service = InMemorySessionService()
+# SQLite-backed by default, so sessions survive restarts (see api/session_store.py)
+session_service = make_session_service()
 
 runner = Runner(
     agent=root_agent,
@@ -42,34 +58,104 @@ runner = Runner(
     session_service=session_service,
 )
 
-# Track user_id per session for lookups without requiring user_id in query
-_session_user_map: dict[str, str] = {}
+# Multi-store batches: batch_id → (user_id, [(store_name, session_id), ...])
+_batches: dict[str, tuple[str, list[tuple[str, str]]]] = {}
+
+# Item progress and checkout state per session, fed by every agent run
+_progress: dict[str, ProgressTracker] = {}
+
+# Seconds between SSE keep-alive comments while a long tool call runs
+SSE_KEEPALIVE_SECONDS = 15
+
+# Page URLs that mean the agent has reached the store's checkout
+_CHECKOUT_URL_RE = re.compile(r"checkout|payment|קופה", re.IGNORECASE)
 
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
 
 
-def _make_chat_message(role: str, text: str) -> ChatMessageOut:
-    return ChatMessageOut(
-        id=str(uuid.uuid4()),
-        type="bot" if role == "model" else "user",
-        text=text,
-        timestamp=time.time() * 1000,
+# Session lookups that only need state skip loading the event history
+_STATE_ONLY = GetSessionConfig(num_recent_events=0)
+
+
+async def _load_session(user_id: str, session_id: str, events: bool = False):
+    return await session_service.get_session(
+        app_name="pricepilot",
+        user_id=user_id,
+        session_id=session_id,
+        config=None if events else _STATE_ONLY,
     )
 
 
-def _extract_response_messages(events: list) -> list[ChatMessageOut]:
-    """Extract chat messages from ADK runner events."""
-    messages: list[ChatMessageOut] = []
-    for event in events:
-        if hasattr(event, "content") and event.content:
-            for part in event.content.parts:
-                if hasattr(part, "text") and part.text:
-                    messages.append(
-                        _make_chat_message(event.content.role, part.text)
-                    )
-    return messages
+async def _message_log(user_id: str, session_id: str) -> MessageLog:
+    """The session's cached message log, rebuilt from stored events on a miss."""
+    log = message_logs.get(session_id)
+    if log is None:
+        session = await _load_session(user_id, session_id, events=True)
+        log = message_logs.create(session_id, session.events if session else [])
+    return log
+
+
+def _checkout_url(session_id: str, state: dict) -> str | None:
+    """Checkout URL from session state, else the session's page if it is on checkout."""
+    if state.get("checkout_url"):
+        return state["checkout_url"]
+    browser_session = browser_pool.get(session_id)
+    if browser_session is None:
+        return None
+    url = browser_session.page.url
+    return url if _CHECKOUT_URL_RE.search(url) else None
+
+
+def _session_status(session_id: str, state: dict) -> str:
+    """Status of a session: checkout reached, its last run failed, or the state's status."""
+    tracker = _progress.get(session_id)
+    if tracker is not None and tracker.checkout_url:
+        return "checkout_ready"
+    job = job_manager.get(session_id)
+    if job is not None and job.state == "error":
+        return "error"
+    return state.get("status", "in_progress")
+
+
+def _job_info(session_id: str) -> dict | None:
+    job = job_manager.get(session_id)
+    return job_manager.describe(job) if job else None
+
+
+def _usage(session_id: str) -> dict | None:
+    """Budget counters of the session's tool calls and model calls so far."""
+    usage = budget_ledger.get(session_id)
+    return usage.as_dict() if usage else None
+
+
+def _metrics(session_id: str) -> dict | None:
+    """Per-tool latency and payload bytes, LLM latency and tokens, run times."""
+    session_metrics = metrics.session_metrics.get(session_id)
+    return session_metrics.as_dict() if session_metrics else None
+
+
+def _queue_fields(job: Job) -> dict:
+    """``queue_position`` / ``eta_seconds`` of a job still waiting for a slot."""
+    info = job_manager.describe(job)
+    return {key: info[key] for key in ("queue_position", "eta_seconds") if key in info}
+
+
+def _network_stats(session_id: str) -> dict | None:
+    """Requests blocked and bytes saved so far by the session's network filter."""
+    browser_session = browser_pool.get(session_id)
+    if browser_session is None or browser_session.network is None:
+        return None
+    return browser_session.network.stats.as_dict()
+
+
+def _screenshot_stats(session_id: str) -> dict | None:
+    """Screenshots sent or skipped as unchanged, and bytes saved, for a session."""
+    browser_session = browser_pool.get(session_id)
+    if browser_session is None:
+        return None
+    return browser_session.screenshots.as_dict()
 
 
 def _resolve_store_url(store_name: str, store_url: str | None) -> str:
@@ -87,6 +173,141 @@ def _resolve_store_url(store_name: str, store_url: str | None) -> str:
     raise ValueError(f"Unknown store: {store_name}")
 
 
+async def _run_job(job: Job) -> None:
+    """Run the agent for one queued job, publishing typed progress events."""
+    tracker = _progress.setdefault(job.session_id, ProgressTracker())
+    await _message_log(job.user_id, job.session_id)
+    start = time.monotonic()
+    outcome = "cancelled"
+    with tracer.start_as_current_span(
+        "agent_turn",
+        context=session_spans.context(job.session_id),
+        attributes={"pricepilot.session_id": job.session_id},
+    ) as span:
+        try:
+            async for event in runner.run_async(
+                user_id=job.user_id,
+                session_id=job.session_id,
+                new_message=job.content,
+                yield_user_message=True,
+            ):
+                message_logs.append(job.session_id, event)
+                for typed in tracker.events_for(event):
+                    job.publish(typed)
+            outcome = "done"
+        except Exception as e:
+            outcome = "error"
+            print(f"Agent error in session {job.session_id}: {str(e)[:200]}")
+            raise
+        finally:
+            metrics.record_run(job.session_id, time.monotonic() - start, outcome)
+            span.set_attribute("pricepilot.outcome", outcome)
+            span.set_attribute("pricepilot.items_added", tracker.added)
+
+    session = await _load_session(job.user_id, job.session_id)
+    state = session.state if session else {}
+    for typed in tracker.finish(_checkout_url(job.session_id, state)):
+        job.publish(typed)
+    job.publish({
+        "type": "done",
+        "status": _session_status(job.session_id, state),
+        "added": tracker.added,
+        "total": tracker.total,
+    })
+
+
+# Agent runs execute here, off the request handlers
+job_manager = JobManager(_run_job)
+
+
+def _run_counts() -> dict:
+    stats = job_manager.stats()
+    return {("running",): stats["running"], ("queued",): stats["queued"]}
+
+
+# Live values, read when /metrics is scraped
+metrics.registry.register(metrics.Gauge(
+    "pricepilot_runs", "Agent runs by state.", _run_counts, ("state",),
+))
+metrics.registry.register(metrics.Gauge(
+    "pricepilot_browser_contexts", "Browser contexts held by sessions.",
+    lambda: browser_pool.active_sessions,
+))
+metrics.registry.register(metrics.Gauge(
+    "pricepilot_browser_capacity", "Browser contexts the pool can hold.",
+    lambda: browser_pool.capacity,
+))
+
+
+def _queue_full(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=detail,
+        headers={"Retry-After": str(job_manager.retry_after())},
+    )
+
+
+def _admit(runs: int = 1) -> None:
+    """Reject with 429 before creating sessions if the queue has no room."""
+    if not job_manager.has_room(runs):
+        raise _queue_full("Too many carts are being built; try again later")
+
+
+async def _wait_for_run(job: Job, user_id: str, cursor: int) -> tuple[list, str]:
+    """Block until ``job`` ends; the agent's messages since ``cursor`` and the status."""
+    async for _ in job.follow():
+        pass
+    log = await _message_log(user_id, job.session_id)
+    messages = [m for m in log.since(cursor) if m.type != "user"]
+    session = await _load_session(user_id, job.session_id)
+    return messages, _session_status(job.session_id, session.state if session else {})
+
+
+def _submit(session_id: str, user_id: str, content: types.Content) -> Job:
+    try:
+        return job_manager.submit(session_id, user_id, content)
+    except JobConflict as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    except QueueFull as exc:
+        raise _queue_full(str(exc))
+
+
+async def _end_session(user_id: str, session_id: str) -> None:
+    """Cancel the session's run, release its browser context and delete it."""
+    # Stop the run first so it does not touch the released browser context
+    await job_manager.cancel(session_id)
+
+    # Release only this session's context; other sessions keep their pages
+    try:
+        await browser_pool.release(session_id)
+    except Exception:
+        pass
+
+    await session_service.delete_session(
+        app_name="pricepilot",
+        user_id=user_id,
+        session_id=session_id,
+    )
+    _progress.pop(session_id, None)
+    message_logs.drop(session_id)
+    budget_ledger.drop(session_id)
+    metrics.session_metrics.drop(session_id)
+    session_spans.end(session_id)
+    job_manager.forget(session_id)
+
+
+async def _expire_session(user_id: str, session_id: str) -> None:
+    """Sweeper callback: end an idle session and drop batches with none left."""
+    await _end_session(user_id, session_id)
+    for batch_id, (_, sessions) in list(_batches.items()):
+        if not any(sid in _progress for _, sid in sessions):
+            _batches.pop(batch_id, None)
+
+
+# Deletes sessions idle for longer than SESSION_TTL
+session_sweeper = SessionSweeper(session_service, "pricepilot", _expire_session)
+
+
 # ---------------------------------------------------------------------------
 # App
 # ---------------------------------------------------------------------------
@@ -94,18 +315,52 @@ def _resolve_store_url(store_name: str, store_url: str | None) -> str:
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Span export (TRACE_EXPORTER); spans are dropped when it is off
+    try:
+        setup_tracing()
+    except Exception as e:
+        print(f"Tracing setup failed: {str(e)[:200]}")
+    # Pre-warm browser contexts so the first session skips the Chromium launch
+    try:
+        await browser_pool.start()
+    except Exception as e:
+        print(f"Browser pool warm-up failed: {str(e)[:200]}")
+    # Drop product-index entries nobody has confirmed within the TTL
+    try:
+        barcode_index.purge_expired()
+    except Exception as e:
+        print(f"Barcode index purge failed: {str(e)[:200]}")
+    # Same for store-setup snapshots past STORAGE_STATE_TTL
+    try:
+        storage_state_cache.purge_expired()
+    except Exception as e:
+        print(f"Storage state purge failed: {str(e)[:200]}")
+    # Sessions left idle past their TTL before a restart go right away
+    try:
+        await session_sweeper.sweep()
+    except Exception as e:
+        print(f"Session sweep failed: {str(e)[:200]}")
+    session_sweeper.start()
+    job_manager.start()
     yield
-    # Cleanup browser on shutdown
+    await session_sweeper.close()
+    # Stop agent runs before their browsers go away
+    await job_manager.close()
+    # Close every pooled browser on shutdown
     try:
-        await close_browser()
+        await browser_pool.close()
     except Exception:
         pass
+    barcode_index.close()
+    # End the open session spans and export what is still buffered
+    session_spans.close()
+    flush_tracing()
 
 
 app = FastAPI(
     title="PricePilot Agent API",
     description="REST API for the PricePilot cart-building agent",
-    version="0.2.0",
+    version=__version__,
     lifespan=lifespan,
 )
 
@@ -123,166 +378,355 @@ app.add_middleware(
 # ---------------------------------------------------------------------------
 
 
-@app.post("/sessions", response_model=SessionCreatedResponse)
-async def create_session(body: BuildCartRequest):
-    """Start a new cart-building session.
-
-    Resolves the store URL from STORE_URLS (or uses the provided override),
-    then sends the full payload as the first user message to the agent.
-    """
-    # Resolve store URL
-    try:
-        store_url = _resolve_store_url(body.store_name, body.store_url)
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail=str(exc))
-
+async def _prepare_session(
+    user_id: str,
+    store_name: str,
+    store_url: str,
+    city: str | None,
+    items: list[CartItem],
+) -> tuple[str, types.Content]:
+    """Create an ADK session and build the initial payload message for the agent."""
     session_id = str(uuid.uuid4())
 
     # Create ADK session
     await session_service.create_session(
         app_name="pricepilot",
-        user_id=body.user_id,
+        user_id=user_id,
         session_id=session_id,
         state={
-            "store_name": body.store_name,
+            "store_name": store_name,
             "store_url": store_url,
+            "city": city,
             "status": "in_progress",
+            "item_names": [item.name for item in items],
         },
     )
 
-    _session_user_map[session_id] = body.user_id
+    _progress[session_id] = ProgressTracker(total=len(items))
+    message_logs.create(session_id)
+    session_spans.start(session_id, store_url, len(items))
 
     # Build the JSON payload the agent expects
     payload = {
-        "store_name": body.store_name,
+        "store_name": store_name,
         "store_url": store_url,
-        "city": body.city,
-        "items": [item.model_dump(exclude_none=True) for item in body.items],
+        "city": city,
+        "items": [item.model_dump(exclude_none=True) for item in items],
     }
 
     content = types.Content(
         role="user",
         parts=[types.Part(text=json.dumps(payload, ensure_ascii=False))],
     )
+    return session_id, content
+
+
+async def _start_session(
+    user_id: str,
+    store_name: str,
+    store_url: str,
+    city: str | None,
+    items: list[CartItem],
+) -> SessionCreatedResponse:
+    """Create an ADK session and queue the agent run on the initial payload."""
+    session_id, content = await _prepare_session(user_id, store_name, store_url, city, items)
+    try:
+        job = _submit(session_id, user_id, content)
+    except HTTPException:
+        # Rejected by admission control; don't leave an orphaned session
+        await _end_session(user_id, session_id)
+        raise
+    return SessionCreatedResponse(session_id=session_id, status=job.state, **_queue_fields(job))
+
+
+def _sse_response(first: dict, events: AsyncIterator[Optional[dict]]) -> StreamingResponse:
+    async def body():
+        yield sse(first)
+        async for typed in events:
+            yield sse(typed) if typed is not None else ": keep-alive\n\n"
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        # Disable proxy buffering so each event reaches the client immediately
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _items_added(session_id: str, state: dict) -> int:
+    tracker = _progress.get(session_id)
+    return tracker.added if tracker else state.get("items_added", 0)
+
+
+async def _store_status(user_id: str, store_name: str, session_id: str) -> StoreSessionStatus:
+    """Status and message history of one batch sub-session."""
+    session = await _load_session(user_id, session_id)
+    if not session:
+        return StoreSessionStatus(store_name=store_name, session_id=session_id, status="error")
+    return StoreSessionStatus(
+        store_name=store_name,
+        session_id=session_id,
+        status=_session_status(session_id, session.state),
+        checkout_url=_checkout_url(session_id, session.state),
+        items_added=_items_added(session_id, session.state),
+        items_failed=session.state.get("items_failed", []),
+        messages=(await _message_log(user_id, session_id)).since(None),
+        job=_job_info(session_id),
+    )
+
+
+def _combined_status(stores: list[StoreSessionStatus]) -> str:
+    statuses = {store.status for store in stores}
+    if len(statuses) == 1:
+        return statuses.pop()
+    if "in_progress" in statuses:
+        return "in_progress"
+    return "partial"
 
-    events: list[Any] = []
+
+@app.post("/sessions", response_model=SessionCreatedResponse)
+async def create_session(body: BuildCartRequest, wait: bool = False):
+    """Start a new cart-building session.
+
+    Resolves the store URL from STORE_URLS (or uses the provided override),
+    then queues the full payload as the first user message to the agent and
+    returns the session id at once. Poll ``GET /sessions/{id}`` or follow
+    ``GET /sessions/{id}/events`` for progress. With ``?wait=true`` the
+    response is sent when the run ends and carries the agent's messages and
+    the session status, as in API 0.2.
+    """
+    # Resolve store URL
     try:
-        async for event in runner.run_async(
-            user_id=body.user_id,
-            session_id=session_id,
-            new_message=content,
-        ):
-            events.append(event)
-    except Exception as e:
-        error_msg = str(e)
-        print(f"Agent error during session creation: {error_msg[:200]}")
-        messages = _extract_response_messages(events)
-        messages.append(_make_chat_message("model", f"Sorry, I encountered an error: {error_msg[:150]}"))
-        return SessionCreatedResponse(session_id=session_id, messages=messages)
+        store_url = _resolve_store_url(body.store_name, body.store_url)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    _admit()
+    created = await _start_session(
+        body.user_id, body.store_name, store_url, body.city, body.items,
+    )
+    if not wait:
+        return created
+    messages, status = await _wait_for_run(
+        job_manager.get(created.session_id), body.user_id, 0,
+    )
+    return SessionCreatedResponse(session_id=created.session_id, messages=messages, status=status)
+
 
-    messages = _extract_response_messages(events)
-    return SessionCreatedResponse(session_id=session_id, messages=messages)
+@app.post("/sessions/batch", response_model=BatchStatusResponse)
+async def create_batch(body: BatchBuildCartRequest):
+    """Build carts at several stores at once, one concurrent sub-session per store.
+
+    Each sub-session has its own browser context from the pool and its own
+    background run, so stores no longer wait for each other. Returns at once
+    with each store's session id (usable with the single-session endpoints
+    for disambiguation replies); poll ``GET /sessions/batch/{id}`` for the
+    combined status and checkout URLs.
+    """
+    try:
+        store_urls = [
+            _resolve_store_url(store.store_name, store.store_url) for store in body.stores
+        ]
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    _admit(len(body.stores))
+    created: list[SessionCreatedResponse] = []
+    try:
+        for store, url in zip(body.stores, store_urls):
+            created.append(await _start_session(
+                body.user_id, store.store_name, url, body.city, store.items,
+            ))
+    except HTTPException:
+        # All stores or none: drop the sub-sessions already queued
+        for result in created:
+            await delete_session(result.session_id, body.user_id)
+        raise
+
+    batch_id = str(uuid.uuid4())
+    _batches[batch_id] = (body.user_id, [
+        (store.store_name, result.session_id) for store, result in zip(body.stores, created)
+    ])
+    stores = [
+        await _store_status(body.user_id, store.store_name, result.session_id)
+        for store, result in zip(body.stores, created)
+    ]
+    return BatchStatusResponse(batch_id=batch_id, status=_combined_status(stores), stores=stores)
 
 
 @app.post("/sessions/{session_id}/message", response_model=MessageResponse)
-async def send_message(session_id: str, body: MessageRequest):
-    """Send a user message (disambiguation reply, OTP, etc.) to the agent."""
+async def send_message(session_id: str, body: MessageRequest, wait: bool = False):
+    """Queue a user message (disambiguation reply, OTP, etc.) for the agent.
+
+    Returns at once; the agent's replies appear in ``GET /sessions/{id}``.
+    With ``?wait=true`` the response is sent when the run ends and carries
+    the replies and the session status. Answers 409 while the session's
+    previous run is still queued or running.
+    """
+    session = await _load_session(body.user_id, session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
     content = types.Content(
         role="user",
         parts=[types.Part(text=body.text)],
     )
-
-    events: list[Any] = []
+    cursor = (await _message_log(body.user_id, session_id)).cursor
+    job = _submit(session_id, body.user_id, content)
+    if wait:
+        messages, status = await _wait_for_run(job, body.user_id, cursor)
+        return MessageResponse(messages=messages, status=status)
+    return MessageResponse(status=job.state, **_queue_fields(job))
+
+
+@app.post("/sessions/stream")
+async def create_session_stream(body: BuildCartRequest):
+    """Start a cart-building session and stream its progress as Server-Sent Events.
+
+    The first event (``session``) carries the session id and is sent before
+    the agent starts, followed by ``message``, ``tool_call``,
+    ``tool_result``, ``item_progress``, and finally ``question`` or
+    ``checkout_ready`` and ``done`` (``error`` / ``cancelled`` if the run
+    fails or is deleted). The run continues if the client disconnects.
+    """
     try:
-        async for event in runner.run_async(
-            user_id=body.user_id,
-            session_id=session_id,
-            new_message=content,
-        ):
-            events.append(event)
-    except Exception as e:
-        error_msg = str(e)
-        print(f"Agent error during message: {error_msg[:200]}")
-        messages = _extract_response_messages(events)
-        messages.append(_make_chat_message("model", f"Sorry, I encountered an error: {error_msg[:150]}"))
-        return MessageResponse(messages=messages, status="error")
+        store_url = _resolve_store_url(body.store_name, body.store_url)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    _admit()
+    created = await _start_session(
+        body.user_id, body.store_name, store_url, body.city, body.items,
+    )
+    job = job_manager.get(created.session_id)
+    return _sse_response(
+        {"type": "session", "session_id": created.session_id, "total": len(body.items),
+         **_queue_fields(job)},
+        job.follow(SSE_KEEPALIVE_SECONDS),
+    )
 
-    messages = _extract_response_messages(events)
 
-    # Determine status from session state
-    session = await session_service.get_session(
-        app_name="pricepilot",
-        user_id=body.user_id,
-        session_id=session_id,
+@app.post("/sessions/{session_id}/message/stream")
+async def send_message_stream(session_id: str, body: MessageRequest):
+    """Send a user message and stream the agent's progress as Server-Sent Events."""
+    session = await _load_session(body.user_id, session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    content = types.Content(
+        role="user",
+        parts=[types.Part(text=body.text)],
+    )
+    job = _submit(session_id, body.user_id, content)
+    return _sse_response(
+        {"type": "session", "session_id": session_id, **_queue_fields(job)},
+        job.follow(SSE_KEEPALIVE_SECONDS),
     )
-    status = session.state.get("status", "in_progress") if session else "in_progress"
 
-    return MessageResponse(messages=messages, status=status)
 
+@app.get("/sessions/{session_id}/events")
+async def session_events(session_id: str, user_id: str):
+    """Follow the session's latest agent run as Server-Sent Events.
 
-@app.get("/sessions/{session_id}", response_model=SessionStatusResponse)
-async def get_session(session_id: str, user_id: str):
-    """Get the current session status and message history."""
-    session = await session_service.get_session(
-        app_name="pricepilot",
-        user_id=user_id,
-        session_id=session_id,
+    Replays the run's events so far, then streams new ones until it ends;
+    for a finished run the stream closes after the replay.
+    """
+    session = await _load_session(user_id, session_id)
+    job = job_manager.get(session_id)
+    if not session or job is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return _sse_response(
+        {"type": "session", "session_id": session_id, "state": job.state,
+         **_queue_fields(job)},
+        job.follow(SSE_KEEPALIVE_SECONDS),
     )
+
+
+@app.get("/sessions/{session_id}", response_model=SessionStatusResponse)
+async def get_session(session_id: str, user_id: str, since: Optional[int] = None):
+    """Get the current session status and message history.
+
+    Pass the ``cursor`` of a previous response as ``since`` to get only the
+    messages added after it.
+    """
+    session = await _load_session(user_id, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
-
-    # Extract messages from session events
-    messages: list[ChatMessageOut] = []
-    if hasattr(session, "events"):
-        for event in session.events:
-            if hasattr(event, "content") and event.content:
-                for part in event.content.parts:
-                    if hasattr(part, "text") and part.text:
-                        messages.append(
-                            _make_chat_message(event.content.role, part.text)
-                        )
+    log = await _message_log(user_id, session_id)
 
     return SessionStatusResponse(
         session_id=session_id,
-        status=session.state.get("status", "in_progress"),
-        messages=messages,
-        checkout_url=session.state.get("checkout_url"),
-        items_added=session.state.get("items_added", 0),
+        status=_session_status(session_id, session.state),
+        messages=log.since(since),
+        cursor=log.cursor,
+        checkout_url=_checkout_url(session_id, session.state),
+        items_added=_items_added(session_id, session.state),
         items_failed=session.state.get("items_failed", []),
+        network=_network_stats(session_id),
+        screenshots=_screenshot_stats(session_id),
+        job=_job_info(session_id),
+        usage=_usage(session_id),
+        metrics=_metrics(session_id),
     )
 
 
 @app.delete("/sessions/{session_id}")
 async def delete_session(session_id: str, user_id: str):
-    """End a session, close the browser, and clean up resources."""
-    session = await session_service.get_session(
-        app_name="pricepilot",
-        user_id=user_id,
-        session_id=session_id,
-    )
+    """End a session: cancel its agent run, release its browser context, clean up."""
+    session = await _load_session(user_id, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    # Close browser to free resources
-    try:
-        await close_browser()
-    except Exception:
-        pass
+    await _end_session(user_id, session_id)
+    return {"status": "deleted", "session_id": session_id}
 
-    await session_service.delete_session(
-        app_name="pricepilot",
-        user_id=user_id,
-        session_id=session_id,
-    )
 
-    _session_user_map.pop(session_id, None)
-    return {"status": "deleted", "session_id": session_id}
+@app.get("/sessions/batch/{batch_id}", response_model=BatchStatusResponse)
+async def get_batch(batch_id: str, user_id: str):
+    """Combined status of a multi-store batch, with each store's checkout URL."""
+    record = _batches.get(batch_id)
+    if record is None or record[0] != user_id:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    stores = [
+        await _store_status(user_id, store_name, session_id)
+        for store_name, session_id in record[1]
+    ]
+    return BatchStatusResponse(batch_id=batch_id, status=_combined_status(stores), stores=stores)
+
+
+@app.delete("/sessions/batch/{batch_id}")
+async def delete_batch(batch_id: str, user_id: str):
+    """End every sub-session of a batch and release their browser contexts."""
+    record = _batches.get(batch_id)
+    if record is None or record[0] != user_id:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    for _, session_id in record[1]:
+        try:
+            await delete_session(session_id, user_id)
+        except HTTPException:
+            pass  # Already deleted on its own
+    _batches.pop(batch_id, None)
+    return {"status": "deleted", "batch_id": batch_id}
 
 
 @app.get("/health")
 async def health():
-    """Health check endpoint."""
-    return {"status": "ok", "version": "0.2.0"}
+    """Health check endpoint, including browser pool and job queue counters."""
+    return {
+        "status": "ok",
+        "version": __version__,
+        "browser_pool": browser_pool.stats(),
+        "jobs": job_manager.stats(),
+        "sessions": {"backend": SESSION_BACKEND, "expired": session_sweeper.swept},
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Tool, LLM and run metrics in the Prometheus text format."""
+    return PlainTextResponse(
+        metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
 
 
 # ---------------------------------------------------------------------------
@@ -0,0 +1,138 @@
+"""Durable ADK session storage with TTL eviction.
+
+Sessions used to live in ``InMemorySessionService``: abandoned ones were
+never freed and a restart lost every cart in progress. ``make_session_service``
+returns the backend named by ``SESSION_BACKEND``:
+
+- ``sqlite`` (default): ADK's ``SqliteSessionService`` on a local file, in
+  WAL mode so concurrent runs don't block each other's reads, with an index
+  on ``update_time`` for expiry scans. Lookups use the primary key, so
+  ``get_session`` costs the same with thousands of stored sessions.
+- ``memory``: ADK's in-memory service, for tests and throwaway runs.
+
+Both expose ``expired_sessions(app_name, before)``. ``SessionSweeper`` calls
+it every ``SESSION_SWEEP_INTERVAL`` seconds and hands each session idle for
+more than ``SESSION_TTL`` seconds to a callback, which cancels its run,
+releases its browser context and deletes it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from google.adk.sessions import BaseSessionService, InMemorySessionService
+from google.adk.sessions.sqlite_session_service import CREATE_SCHEMA_SQL, SqliteSessionService
+
+from pricepilot.config import (
+    SESSION_BACKEND,
+    SESSION_DB_PATH,
+    SESSION_SWEEP_INTERVAL,
+    SESSION_TTL,
+)
+
+_UPDATE_TIME_INDEX = (
+    "CREATE INDEX IF NOT EXISTS sessions_update_time ON sessions (app_name, update_time)"
+)
+
+
+class SqliteSessionStore(SqliteSessionService):
+    """ADK's SQLite session service, plus WAL mode and expiry queries."""
+
+    def __init__(self, path: str = SESSION_DB_PATH) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        super().__init__(path)
+        with sqlite3.connect(path) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(CREATE_SCHEMA_SQL)
+            conn.execute(_UPDATE_TIME_INDEX)
+
+    async def expired_sessions(self, app_name: str, before: float) -> list[tuple[str, str]]:
+        """(user_id, session_id) of sessions not updated since ``before``."""
+        async with self._get_db_connection() as db:
+            rows = await db.execute_fetchall(
+                "SELECT user_id, id FROM sessions WHERE app_name = ? AND update_time < ?",
+                (app_name, before),
+            )
+        return [(row["user_id"], row["id"]) for row in rows]
+
+
+class MemorySessionStore(InMemorySessionService):
+    """ADK's in-memory session service, plus expiry queries."""
+
+    async def expired_sessions(self, app_name: str, before: float) -> list[tuple[str, str]]:
+        listed = await self.list_sessions(app_name=app_name)
+        return [
+            (session.user_id, session.id)
+            for session in listed.sessions
+            if session.last_update_time < before
+        ]
+
+
+def make_session_service(
+    backend: str = SESSION_BACKEND, path: str = SESSION_DB_PATH,
+) -> BaseSessionService:
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "sqlite":
+        return SqliteSessionStore(path)
+    raise ValueError(f"Unknown SESSION_BACKEND: {backend}")
+
+
+Expire = Callable[[str, str], Awaitable[None]]
+
+
+class SessionSweeper:
+    """Periodically hands sessions idle for longer than ``ttl`` to ``expire``."""
+
+    def __init__(
+        self,
+        store: BaseSessionService,
+        app_name: str,
+        expire: Expire,
+        ttl: int = SESSION_TTL,
+        interval: int = SESSION_SWEEP_INTERVAL,
+    ) -> None:
+        self.store = store
+        self.app_name = app_name
+        self.expire = expire
+        self.ttl = ttl
+        self.interval = interval
+        self.swept = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def sweep(self) -> int:
+        """Expire every idle session now. Returns how many were expired."""
+        expired = await self.store.expired_sessions(self.app_name, time.time() - self.ttl)
+        for user_id, session_id in expired:
+            try:
+                await self.expire(user_id, session_id)
+            except Exception as e:
+                print(f"Session expiry failed for {session_id}: {str(e)[:200]}")
+                continue
+            self.swept += 1
+        return len(expired)
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"Session sweep failed: {str(e)[:200]}")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
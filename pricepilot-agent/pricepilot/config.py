@@ -31,11 +31,72 @@ BROWSER_TIMEOUT = int(os.getenv("BROWSER_TIMEOUT", "30000"))
 BROWSER_VIEWPORT_WIDTH = 1280
 BROWSER_VIEWPORT_HEIGHT = 720
 
+# Browser pool — a few long-lived Chromium processes shared by all sessions,
+# each session gets its own isolated BrowserContext + Page.
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+BROWSER_MAX_CONTEXTS_PER_BROWSER = int(os.getenv("BROWSER_MAX_CONTEXTS_PER_BROWSER", "8"))
+# How long a new session waits for a free context when the pool is full
+BROWSER_ACQUIRE_TIMEOUT = float(os.getenv("BROWSER_ACQUIRE_TIMEOUT", "120"))  # seconds
+# Ready-to-use contexts created at server startup and replenished in the background
+BROWSER_WARM_CONTEXTS = int(os.getenv("BROWSER_WARM_CONTEXTS", "2"))
+# Block fonts, video and third-party trackers on store pages (see tools/network_filter.py)
+NETWORK_FILTER_ENABLED = os.getenv("NETWORK_FILTER_ENABLED", "true").lower() == "true"
+# Offline store sites (see tools/site_replay.py): "" (live), "record" saves every
+# response to HAR files in SITE_REPLAY_DIR, "replay" serves only those files
+SITE_REPLAY_MODE = os.getenv("SITE_REPLAY_MODE", "").lower()
+SITE_REPLAY_DIR = os.getenv("SITE_REPLAY_DIR", "/tmp/pricepilot/sites")
+
+# Cookies/localStorage saved after Phase 1, reused per (store, city) to skip it
+STORAGE_STATE_ENABLED = os.getenv("STORAGE_STATE_ENABLED", "true").lower() == "true"
+STORAGE_STATE_DIR = os.getenv("STORAGE_STATE_DIR", "/tmp/pricepilot/storage_state")
+STORAGE_STATE_TTL = int(os.getenv("STORAGE_STATE_TTL", "21600"))  # seconds
+
+# (store, barcode) → product page index learned from successful adds, so
+# repeat items skip the search (see tools/barcode_index.py)
+BARCODE_INDEX_ENABLED = os.getenv("BARCODE_INDEX_ENABLED", "true").lower() == "true"
+BARCODE_INDEX_PATH = os.getenv("BARCODE_INDEX_PATH", "/tmp/pricepilot/barcode_index.sqlite3")
+BARCODE_INDEX_TTL = int(os.getenv("BARCODE_INDEX_TTL", "1209600"))  # seconds (14 days)
+
+# Tabs used by add_items_parallel to search and add items concurrently
+PARALLEL_TABS = int(os.getenv("PARALLEL_TABS", "3"))
+
 # ---------------------------------------------------------------------------
 # Agent limits
 # ---------------------------------------------------------------------------
 
+# Per-session budgets enforced by tools/budget.py: tool calls, seconds spent
+# in tools, and LLM tokens (prompt + completion)
 MAX_BROWSER_ACTIONS = int(os.getenv("MAX_BROWSER_ACTIONS", "100"))
+MAX_SESSION_TOOL_SECONDS = int(os.getenv("MAX_SESSION_TOOL_SECONDS", "900"))
+MAX_SESSION_TOKENS = int(os.getenv("MAX_SESSION_TOKENS", "1500000"))
+# Budget fraction at which tool results start warning the agent to wrap up
+BUDGET_SOFT_RATIO = float(os.getenv("BUDGET_SOFT_RATIO", "0.8"))
+# Tool calls still allowed after the budget is spent, to reach checkout
+BUDGET_CHECKOUT_ACTIONS = int(os.getenv("BUDGET_CHECKOUT_ACTIONS", "15"))
+# Agent runs executed at once by the background job workers (see api/jobs.py);
+# defaults to the number of browser contexts the pool can hold
+AGENT_RUN_CONCURRENCY = int(os.getenv(
+    "AGENT_RUN_CONCURRENCY", str(BROWSER_POOL_SIZE * BROWSER_MAX_CONTEXTS_PER_BROWSER),
+))
+# Admission control (see api/admission.py): runs at once are further capped
+# by memory and CPUs available to the process
+ADMISSION_MEMORY_PER_SESSION_MB = int(os.getenv("ADMISSION_MEMORY_PER_SESSION_MB", "250"))
+ADMISSION_RESERVED_MEMORY_MB = int(os.getenv("ADMISSION_RESERVED_MEMORY_MB", "512"))
+ADMISSION_SESSIONS_PER_CPU = float(os.getenv("ADMISSION_SESSIONS_PER_CPU", "3"))
+# Runs allowed to wait for a slot; beyond this the API answers 429
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "50"))
+# Serve waiting runs round-robin per user instead of strictly first-come
+ADMISSION_FAIR_QUEUE = os.getenv("ADMISSION_FAIR_QUEUE", "true").lower() == "true"
+# Run duration assumed for queue ETAs until real runs have been timed
+ADMISSION_DEFAULT_RUN_SECONDS = int(os.getenv("ADMISSION_DEFAULT_RUN_SECONDS", "120"))
+
+# History compaction before each model call (see tools/compaction.py):
+# older screenshots become placeholders, turns of items already added
+# collapse into a one-line-per-item ledger, and long tool results outside the
+# last HISTORY_KEEP_RECENT contents are cut to HISTORY_MAX_TOOL_CHARS
+HISTORY_COMPACTION = os.getenv("HISTORY_COMPACTION", "true").lower() == "true"
+HISTORY_KEEP_RECENT = int(os.getenv("HISTORY_KEEP_RECENT", "6"))  # contents
+HISTORY_MAX_TOOL_CHARS = int(os.getenv("HISTORY_MAX_TOOL_CHARS", "2000"))
 
 # ---------------------------------------------------------------------------
 # Server
@@ -44,6 +105,21 @@ MAX_BROWSER_ACTIONS = int(os.getenv("MAX_BROWSER_ACTIONS", "100"))
 HOST = os.getenv("HOST", "0.0.0.0")
 PORT = int(os.getenv("PORT", "8000"))
 
+# Session storage (see api/session_store.py): "sqlite" survives restarts,
+# "memory" is for tests and throwaway runs
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "sqlite")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "/tmp/pricepilot/sessions.sqlite3")
+# Sessions idle this long are deleted and their browser context released
+SESSION_TTL = int(os.getenv("SESSION_TTL", "3600"))  # seconds
+SESSION_SWEEP_INTERVAL = int(os.getenv("SESSION_SWEEP_INTERVAL", "60"))  # seconds
+# Sessions whose chat message log is kept in memory (see api/message_log.py)
+MESSAGE_LOG_CACHE_SESSIONS = int(os.getenv("MESSAGE_LOG_CACHE_SESSIONS", "2000"))
+
+# OpenTelemetry spans (see tracing.py): "" (off), "console" or "file".
+# "file" appends one JSON span per line to TRACE_FILE; no collector needed
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", "/tmp/pricepilot/traces.jsonl")
+
 # ---------------------------------------------------------------------------
 # Store URL mapping — Hebrew store name → online shopping URL
 # ---------------------------------------------------------------------------
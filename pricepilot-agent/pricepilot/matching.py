@@ -0,0 +1,298 @@
+"""Local fuzzy matcher: scores store products against a requested cart item.
+
+Picking the right search result used to need a screenshot and a model call
+per item. This module does it locally: an exact barcode wins outright;
+otherwise names are compared after Hebrew normalization (niqqud, final
+letters, geresh/gershayim, attached prefixes like ה/ו/ב), sizes are parsed
+and compared in base units ("1 ליטר" == "1L" == "1000 מ"ל"), and the
+manufacturer is checked against the product name. Variant words (זירו,
+דיאט, לייט, ללא ...) and fat percentages on one side only are a different
+product, not a near match: such candidates are heavily discounted and never
+confident. The result carries a confidence, so only close calls go to the
+model or the user.
+
+Item features are computed once and each candidate costs a few regex passes,
+so ranking hundreds of candidates takes milliseconds.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+# Weights of the name / size / brand components; components that can't be
+# compared (no size on one side, no manufacturer given) are left out and
+# the rest renormalized.
+NAME_WEIGHT = 0.6
+SIZE_WEIGHT = 0.25
+BRAND_WEIGHT = 0.15
+
+# A best match is "confident" at or above this confidence
+CONFIDENT_THRESHOLD = 0.75
+# Best must beat the runner-up by this much to keep its full confidence
+MIN_MARGIN = 0.15
+# Products whose barcode differs from the requested one are discounted
+BARCODE_MISMATCH_FACTOR = 0.85
+# Products that differ in a variant word or fat percentage are discounted
+VARIANT_MISMATCH_FACTOR = 0.6
+
+# Normalized words that make a different variant of the same product
+VARIANT_WORDS = {
+    "זירו", "zero", "דיאט", "diet", "לייט", "light",
+    "ללא", "נטול", "נטולת", "דל", "דלת", "מופחת", "מופחתת", "אורגני", "אורגנית",
+}
+
+_NIQQUD_RE = re.compile(r"[\u0591-\u05BD\u05BF\u05C1\u05C2\u05C4\u05C5\u05C7]")
+_GERESH_RE = re.compile(r"['\"`׳״‘’“”]")
+_FINAL_LETTERS = str.maketrans("ךםןףץ", "כמנפצ")
+# "1L" → "1 l", "ליטר1" → "ליטר 1"
+_DIGIT_LETTER_RE = re.compile(r"(?<=\d)(?=[^\W\d_])|(?<=[^\W\d_])(?=\d)")
+_SEPARATOR_RE = re.compile(r"[^\w%.]+|(?<!\d)\.|\.(?!\d)")
+
+# Normalized unit word → (dimension, factor to the base unit)
+_UNITS = {
+    "מל": ("ml", 1), "מיליליטר": ("ml", 1), "ml": ("ml", 1),
+    "ליטר": ("ml", 1000), "ליטרימ": ("ml", 1000), "ל": ("ml", 1000),
+    "l": ("ml", 1000), "lt": ("ml", 1000), "ltr": ("ml", 1000),
+    "גרמ": ("g", 1), "גר": ("g", 1), "ג": ("g", 1), "g": ("g", 1), "gr": ("g", 1),
+    "קג": ("g", 1000), "קילו": ("g", 1000), "קילוגרמ": ("g", 1000), "kg": ("g", 1000),
+    "יחידות": ("unit", 1), "יחידה": ("unit", 1), "יח": ("unit", 1),
+    "units": ("unit", 1), "unit": ("unit", 1), "pcs": ("unit", 1),
+}
+_PERCENT_RE = re.compile(r"\d+(?:\.\d+)?%")
+_SIZE_RE = re.compile(
+    r"(?<![\w.])(\d+(?:\.\d+)?) ("
+    + "|".join(sorted(map(re.escape, _UNITS), key=len, reverse=True))
+    + r")(?!\w)"
+)
+# Single-letter prefixes (the, and, in, to, from, that) attached to words
+_PREFIXES = "הובלמש"
+# Company suffixes ignored when matching the manufacturer
+_BRAND_NOISE = {"בעמ", "ltd", "inc", "מ", "בע", "ישראל", "israel"}
+
+
+def normalize_hebrew(text: str) -> str:
+    """Lowercase, strip niqqud and geresh, unify final letters, split "1L"."""
+    text = _NIQQUD_RE.sub("", (text or "").lower())
+    text = _GERESH_RE.sub("", text).replace("\u05BE", " ").translate(_FINAL_LETTERS)
+    text = _DIGIT_LETTER_RE.sub(" ", text.replace(",", "."))
+    return " ".join(_SEPARATOR_RE.sub(" ", text).split())
+
+
+@dataclass(frozen=True)
+class Size:
+    """A size in base units: ml, g or unit (count)."""
+
+    amount: float
+    dimension: str
+
+
+def parse_size(normalized: str) -> tuple[Optional[Size], str]:
+    """First size in a normalized string, and the string without its sizes."""
+    size = None
+    for match in _SIZE_RE.finditer(normalized):
+        dimension, factor = _UNITS[match.group(2)]
+        size = Size(float(match.group(1)) * factor, dimension)
+        break
+    return size, " ".join(_SIZE_RE.sub(" ", normalized).split())
+
+
+def _variants(token: str) -> set[str]:
+    """A token plus its forms with / without one attached prefix letter."""
+    forms = {token}
+    if len(token) > 2:
+        forms.update(p + token for p in _PREFIXES)
+        if token[0] in _PREFIXES:
+            forms.add(token[1:])
+    return forms
+
+
+def _one_edit_apart(a: str, b: str) -> bool:
+    """True if ``a`` and ``b`` differ by one substitution, insertion or deletion."""
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i + (len(a) == len(b)):] == b[i + 1:]
+
+
+def _variant_words(tokens: list[str]) -> set[str]:
+    """Variant words among ``tokens`` (also with one attached prefix letter)."""
+    found = set()
+    for token in tokens:
+        if token in VARIANT_WORDS:
+            found.add(token)
+        elif len(token) > 2 and token[0] in _PREFIXES and token[1:] in VARIANT_WORDS:
+            found.add(token[1:])
+    return found
+
+
+def _variant_conflict(wanted: list[str], have: list[str]) -> bool:
+    """True if the two names are different variants of a product."""
+    if _variant_words(wanted) != _variant_words(have):
+        return True
+    wanted_fat = {t for t in wanted if _PERCENT_RE.fullmatch(t)}
+    have_fat = {t for t in have if _PERCENT_RE.fullmatch(t)}
+    # A percentage on only one side can't be told apart from the default
+    return bool(wanted_fat and have_fat and not wanted_fat & have_fat)
+
+
+@dataclass
+class _Features:
+    tokens: list[str]
+    size: Optional[Size]
+
+
+def _features(text: str) -> _Features:
+    size, rest = parse_size(normalize_hebrew(text))
+    return _Features(tokens=rest.split(), size=size)
+
+
+def _token_score(
+    wanted: list[set[str]], wanted_tokens: list[str], have: set[str], fuzzy: bool = True,
+) -> float:
+    """Fraction of wanted tokens present (exact / prefixed / one typo away)."""
+    if not wanted:
+        return 0.0
+    hits = 0.0
+    for token, forms in zip(wanted_tokens, wanted):
+        if forms & have:
+            hits += 1
+        elif fuzzy and len(token) >= 4 and any(_one_edit_apart(token, h) for h in have):
+            hits += 0.8
+    return hits / len(wanted)
+
+
+def _size_score(wanted: Optional[Size], have: Optional[Size]) -> Optional[float]:
+    if wanted is None or have is None:
+        return None
+    if wanted.dimension != have.dimension:
+        return 0.3
+    larger = max(wanted.amount, have.amount) or 1.0
+    return 1.0 if abs(wanted.amount - have.amount) / larger <= 0.02 else 0.0
+
+
+@dataclass
+class Match:
+    """Score of one candidate (``index`` into the candidate list)."""
+
+    index: int
+    score: float
+    reasons: list[str] = field(default_factory=list)
+
+
+@dataclass
+class MatchResult:
+    """Ranked candidates plus how sure the matcher is about the best one."""
+
+    ranked: list[Match]
+    confidence: float
+    confident: bool
+
+    @property
+    def best(self) -> Optional[Match]:
+        return self.ranked[0] if self.ranked else None
+
+    def as_dict(self) -> dict:
+        best = self.best
+        return {
+            "index": best.index if best else None,
+            "score": round(best.score, 3) if best else 0.0,
+            "confidence": round(self.confidence, 3),
+            "confident": self.confident,
+            "reasons": best.reasons if best else [],
+        }
+
+
+class ItemMatcher:
+    """Pre-processed cart item that scores candidate products against it."""
+
+    def __init__(
+        self, name: str, barcode: Optional[str] = None, manufacturer: Optional[str] = None,
+    ):
+        features = _features(name)
+        self.tokens = features.tokens
+        self.forms = [_variants(t) for t in self.tokens]
+        self.size = features.size
+        self.barcode = (barcode or "").strip() or None
+        brand = [t for t in normalize_hebrew(manufacturer or "").split() if t not in _BRAND_NOISE]
+        self.brand_tokens = brand
+        self.brand_forms = [_variants(t) for t in brand]
+
+    def score(self, name: str, barcode: Optional[str] = None) -> Match:
+        """Score one candidate; ``index`` is left at -1 for the caller to set."""
+        if self.barcode and barcode and barcode.strip() == self.barcode:
+            return Match(-1, 1.0, ["barcode"])
+
+        features = _features(name)
+        have = set(features.tokens)
+        reasons: list[str] = []
+
+        recall = _token_score(self.forms, self.tokens, have)
+        precision = (
+            _token_score([_variants(t) for t in features.tokens], features.tokens,
+                         set(self.tokens) | set(self.brand_tokens), fuzzy=False)
+            if features.tokens else 0.0
+        )
+        parts = [(NAME_WEIGHT, 0.8 * recall + 0.2 * precision)]
+
+        size = _size_score(self.size, features.size)
+        if size is not None:
+            parts.append((SIZE_WEIGHT, size))
+            reasons.append("size" if size == 1.0 else "size_mismatch")
+        if self.brand_tokens:
+            brand = _token_score(self.brand_forms, self.brand_tokens, have)
+            parts.append((BRAND_WEIGHT, brand))
+            if brand >= 0.99:
+                reasons.append("brand")
+
+        total = sum(w * s for w, s in parts) / sum(w for w, _ in parts)
+        if _variant_conflict(self.tokens + self.brand_tokens, features.tokens):
+            total *= VARIANT_MISMATCH_FACTOR
+            reasons.append("variant_mismatch")
+        if self.barcode and barcode:
+            total *= BARCODE_MISMATCH_FACTOR
+            reasons.append("barcode_mismatch")
+        return Match(-1, total, reasons)
+
+    def rank(self, candidates: list[dict]) -> MatchResult:
+        """Score and rank ``candidates`` (dicts with ``name`` and optional ``barcode``)."""
+        ranked: list[Match] = []
+        for idx, candidate in enumerate(candidates):
+            match = self.score(candidate.get("name") or "", candidate.get("barcode"))
+            match.index = idx
+            ranked.append(match)
+        ranked.sort(key=lambda m: m.score, reverse=True)
+        if not ranked:
+            return MatchResult([], 0.0, False)
+
+        best = ranked[0]
+        confidence = best.score
+        if "barcode" not in best.reasons:
+            # The same product listed twice is not a competing option
+            best_name = normalize_hebrew(candidates[best.index].get("name") or "")
+            runner_up = next(
+                (m.score for m in ranked[1:]
+                 if normalize_hebrew(candidates[m.index].get("name") or "") != best_name),
+                0.0,
+            )
+            margin = best.score - runner_up
+            if margin < MIN_MARGIN:
+                # A near tie between different products halves the confidence
+                confidence *= 0.5 + 0.5 * margin / MIN_MARGIN
+        confident = confidence >= CONFIDENT_THRESHOLD and "variant_mismatch" not in best.reasons
+        return MatchResult(ranked, confidence, confident)
+
+
+def match_candidates(
+    name: str,
+    candidates: list[dict],
+    barcode: Optional[str] = None,
+    manufacturer: Optional[str] = None,
+) -> MatchResult:
+    """Rank store products against one cart item."""
+    return ItemMatcher(name, barcode, manufacturer).rank(candidates)
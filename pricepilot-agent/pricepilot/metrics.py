@@ -0,0 +1,311 @@
+"""Process metrics in Prometheus text format, plus a per-session breakdown.
+
+Records where a cart's time goes: every tool call (latency, bytes returned
+to the model, outcome, per store), every LLM call (latency, input/output
+tokens) and every agent run. ``render()`` produces the Prometheus text
+exposition served at ``GET /metrics``; gauges read live values (running
+sessions, browser contexts) through callbacks when scraped.
+``session_metrics`` keeps the same numbers per session for
+``GET /sessions/{id}``.
+
+A small in-process registry instead of ``prometheus_client``: the server
+needs a handful of counters and histograms and no other client features.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional, Union
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+# Rough characters per token, for estimating tokens saved by history compaction
+CHARS_PER_TOKEN = 4
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.label_names = labels
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(lines + self.samples())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        super().__init__(name, help, labels)
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0.0) + amount
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_labels(self.label_names, key)} {_number(value)}"
+            for key, value in sorted(self.values.items())
+        ]
+
+
+@dataclass
+class _Series:
+    counts: list[int]
+    total: float = 0.0
+    count: int = 0
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help: str, labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self.series: dict[tuple[str, ...], _Series] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        series = self.series.setdefault(key, _Series([0] * len(self.buckets)))
+        for idx, bound in enumerate(self.buckets):
+            if value <= bound:
+                series.counts[idx] += 1
+                break
+        series.total += value
+        series.count += 1
+
+    def samples(self) -> list[str]:
+        lines: list[str] = []
+        for key, series in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series.counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}"
+                )
+            labels = _labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_number(series.total)}")
+            lines.append(f"{self.name}_count{labels} {series.count}")
+        return lines
+
+
+GaugeValue = Union[float, dict[tuple[str, ...], float]]
+
+
+class Gauge(_Metric):
+    """A value read from ``read()`` at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(
+        self, name: str, help: str, read: Callable[[], GaugeValue],
+        labels: tuple[str, ...] = (),
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.read = read
+
+    def samples(self) -> list[str]:
+        value = self.read()
+        if not isinstance(value, dict):
+            value = {(): value}
+        return [
+            f"{self.name}{_labels(self.label_names, key)} {_number(v)}"
+            for key, v in sorted(value.items())
+        ]
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        blocks = []
+        for metric in self._metrics.values():
+            try:
+                blocks.append(metric.render())
+            except Exception as e:
+                print(f"Metric {metric.name} failed: {str(e)[:200]}")
+        return "\n".join(blocks) + "\n"
+
+
+registry = Registry()
+
+tool_seconds = registry.register(Histogram(
+    "pricepilot_tool_duration_seconds", "Tool call latency.", ("tool", "store"),
+))
+tool_calls = registry.register(Counter(
+    "pricepilot_tool_calls_total", "Tool calls by outcome (ok, error, refused).",
+    ("tool", "store", "outcome"),
+))
+tool_payload = registry.register(Histogram(
+    "pricepilot_tool_payload_bytes", "Bytes of tool results returned to the model.",
+    ("tool",), BYTES_BUCKETS,
+))
+llm_seconds = registry.register(Histogram(
+    "pricepilot_llm_call_duration_seconds", "LLM call latency.",
+))
+llm_tokens = registry.register(Counter(
+    "pricepilot_llm_tokens_total", "LLM tokens by direction (input, output).", ("direction",),
+))
+run_seconds = registry.register(Histogram(
+    "pricepilot_agent_run_duration_seconds",
+    "Agent run (runner.run_async turn) latency by outcome.", ("outcome",),
+))
+history_chars = registry.register(Counter(
+    "pricepilot_history_chars_total",
+    "Characters of conversation history sent to the model, before and after compaction.",
+    ("stage",),
+))
+
+
+@dataclass
+class ToolStats:
+    calls: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+    payload_bytes: int = 0
+
+    def as_dict(self) -> dict:
+        return {"calls": self.calls, "errors": self.errors,
+                "seconds": round(self.seconds, 3), "payload_bytes": self.payload_bytes}
+
+
+@dataclass
+class SessionMetrics:
+    """The same measurements as the registry, for one session."""
+
+    tools: dict[str, ToolStats] = field(default_factory=dict)
+    llm_calls: int = 0
+    llm_seconds: float = 0.0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    runs: int = 0
+    run_seconds: float = 0.0
+    compactions: int = 0
+    history_chars_before: int = 0
+    history_chars_after: int = 0
+    _llm_started: Optional[float] = None
+
+    def as_dict(self) -> dict:
+        tool_seconds_total = sum(t.seconds for t in self.tools.values())
+        return {
+            "tools": {name: stats.as_dict() for name, stats in sorted(self.tools.items())},
+            "tool_seconds": round(tool_seconds_total, 3),
+            "llm": {"calls": self.llm_calls, "seconds": round(self.llm_seconds, 3),
+                    "input_tokens": self.input_tokens, "output_tokens": self.output_tokens},
+            "runs": self.runs,
+            "run_seconds": round(self.run_seconds, 3),
+            "compaction": {
+                "calls": self.compactions,
+                "chars_before": self.history_chars_before,
+                "chars_after": self.history_chars_after,
+                "tokens_saved": (self.history_chars_before - self.history_chars_after)
+                // CHARS_PER_TOKEN,
+            },
+        }
+
+
+class SessionMetricsStore:
+    def __init__(self) -> None:
+        self._sessions: dict[str, SessionMetrics] = {}
+
+    def of(self, session_id: str) -> SessionMetrics:
+        return self._sessions.setdefault(session_id, SessionMetrics())
+
+    def get(self, session_id: str) -> Optional[SessionMetrics]:
+        return self._sessions.get(session_id)
+
+    def drop(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+
+
+session_metrics = SessionMetricsStore()
+
+
+def record_tool(
+    session_id: str, tool: str, store: str, seconds: float, payload_bytes: int, outcome: str,
+) -> None:
+    tool_calls.inc(tool=tool, store=store, outcome=outcome)
+    stats = session_metrics.of(session_id).tools.setdefault(tool, ToolStats())
+    stats.calls += 1
+    if outcome != "ok":
+        stats.errors += 1
+    if outcome == "refused":
+        return  # The tool did not run
+    tool_seconds.observe(seconds, tool=tool, store=store)
+    tool_payload.observe(payload_bytes, tool=tool)
+    stats.seconds += seconds
+    stats.payload_bytes += payload_bytes
+
+
+def llm_call_started(session_id: str) -> None:
+    session_metrics.of(session_id)._llm_started = time.monotonic()
+
+
+def record_llm_call(session_id: str, input_tokens: int, output_tokens: int) -> None:
+    metrics = session_metrics.of(session_id)
+    metrics.llm_calls += 1
+    metrics.input_tokens += input_tokens
+    metrics.output_tokens += output_tokens
+    llm_tokens.inc(input_tokens, direction="input")
+    llm_tokens.inc(output_tokens, direction="output")
+    if metrics._llm_started is not None:
+        seconds = time.monotonic() - metrics._llm_started
+        metrics._llm_started = None
+        metrics.llm_seconds += seconds
+        llm_seconds.observe(seconds)
+
+
+def record_run(session_id: str, seconds: float, outcome: str) -> None:
+    metrics = session_metrics.of(session_id)
+    metrics.runs += 1
+    metrics.run_seconds += seconds
+    run_seconds.observe(seconds, outcome=outcome)
+
+
+def record_compaction(session_id: str, chars_before: int, chars_after: int) -> None:
+    metrics = session_metrics.of(session_id)
+    metrics.compactions += 1
+    metrics.history_chars_before += chars_before
+    metrics.history_chars_after += chars_after
+    history_chars.inc(chars_before, stage="before")
+    history_chars.inc(chars_after, stage="after")
@@ -0,0 +1,125 @@
+"""Store adapter registry — declarative selector recipes per store.
+
+Each recipe lists the CSS / Playwright selectors needed to search for an
+item, pick a result card, add it to the cart and reach checkout. The
+``add_item_by_recipe`` tool runs a recipe directly in Playwright and only
+hands control back to the LLM when a step fails.
+
+Selectors may be comma-separated lists; the first match wins. Stores are
+keyed by the hostname of their ``STORE_URLS`` entry (without ``www.``).
+Stores without a dedicated recipe use ``GENERIC_RECIPE``, which relies on the
+common Hebrew button texts.
+
+Mahsanei HaShuk, H. Cohen, Yochananof and Osher Ad use the generic recipe
+on purpose. Their live markup has not been recorded yet, and selectors
+guessed without it would be no better than the generic ones. Those cover
+the common product-card markup: ``data-product-id`` / ``.product-card``
+cards, "הוסף לסל" buttons and a ``cart``/``count`` badge. When a step
+misses, only that step fails and the agent takes over for the item.
+``tests/test_stores.py`` runs every recipe against its store's fixture
+search page. A store gets its own recipe once a recording shows markup the
+generic one misses, as the Victory fixture's ``ProductCard`` grid did.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+from typing import Optional
+
+from pricepilot.tools.network_filter import store_host
+
+
+@dataclass(frozen=True)
+class StoreRecipe:
+    """Selectors for the search → add → checkout flow of one store."""
+
+    search_input: str
+    result_card: str
+    card_name: str
+    add_button: str
+    quantity_plus: str
+    cart_link: str
+    checkout_button: str
+    # None → submit the search with Enter
+    search_submit: Optional[str] = None
+    # Cart item-count badge, watched to confirm an add landed
+    cart_count: Optional[str] = None
+    # Attribute on the result card holding the product barcode, if any
+    barcode_attr: Optional[str] = None
+    # Whether the store's search box accepts a barcode as the query
+    search_by_barcode: bool = False
+    results_timeout_ms: int = 8000
+
+
+GENERIC_RECIPE = StoreRecipe(
+    search_input=(
+        'input[type="search"], input[name="q"], '
+        'input[placeholder*="חיפוש"], input[placeholder*="חפש"]'
+    ),
+    result_card=(
+        '[data-product-code], [data-product-id], [data-product], '
+        '.product-card, .product-item, li[class*="product"]'
+    ),
+    card_name='[class*="name"], [class*="title"], h2, h3, h4',
+    add_button=(
+        'button:has-text("הוסף לסל"), button:has-text("הוספה לסל"), '
+        'button:has-text("הוסף"), [aria-label*="הוסף"]'
+    ),
+    quantity_plus=(
+        'button[aria-label*="הוסף יחידה"], button[aria-label*="הגדל"], '
+        'button[class*="plus"], button:has-text("+")'
+    ),
+    cart_link=(
+        'a:has-text("סל הקניות"), a:has-text("העגלה שלי"), '
+        '[aria-label*="סל"], a[href*="cart"]'
+    ),
+    checkout_button=(
+        'button:has-text("לקופה"), a:has-text("לקופה"), '
+        'button:has-text("המשך לתשלום"), a:has-text("המשך לתשלום")'
+    ),
+    cart_count=(
+        '[class*="cart"] [class*="count"], [class*="cart"] [class*="badge"], '
+        '[class*="Cart"] [class*="Count"], [class*="basket"] [class*="count"]'
+    ),
+)
+
+STORE_RECIPES: dict[str, StoreRecipe] = {
+    "shufersal.co.il": replace(
+        GENERIC_RECIPE,
+        search_input="#js-site-search-input, " + GENERIC_RECIPE.search_input,
+        search_submit="button.js_search_button",
+        result_card="li.miglog-prod, " + GENERIC_RECIPE.result_card,
+        card_name=".description strong, .miglog-prod-name, " + GENERIC_RECIPE.card_name,
+        add_button="button.js-add-to-cart, " + GENERIC_RECIPE.add_button,
+        quantity_plus="button.js-qty-selector-plus, " + GENERIC_RECIPE.quantity_plus,
+        barcode_attr="data-product-code",
+        search_by_barcode=True,
+    ),
+    "rami-levy.co.il": replace(
+        GENERIC_RECIPE,
+        search_input="#destination, " + GENERIC_RECIPE.search_input,
+        result_card='[id^="product-"], ' + GENERIC_RECIPE.result_card,
+        add_button='[aria-label*="הוספה לסל"], ' + GENERIC_RECIPE.add_button,
+        search_by_barcode=True,
+    ),
+    "victoryonline.co.il": replace(
+        GENERIC_RECIPE,
+        result_card="article.ProductCard, " + GENERIC_RECIPE.result_card,
+        card_name=".ProductCard__title, " + GENERIC_RECIPE.card_name,
+        add_button="button.ProductCard__add, " + GENERIC_RECIPE.add_button,
+    ),
+    # Generic markup, see the module docstring
+    "mh-hashuk.co.il": GENERIC_RECIPE,
+    "hcohen.co.il": GENERIC_RECIPE,
+    "yochananof.co.il": GENERIC_RECIPE,
+    "osherad.co.il": GENERIC_RECIPE,
+}
+
+
+def recipe_for_url(url: str) -> StoreRecipe:
+    """Return the recipe for the store serving ``url`` (generic if unknown)."""
+    host = store_host(url)
+    for store, recipe in STORE_RECIPES.items():
+        if host == store or host.endswith("." + store):
+            return recipe
+    return GENERIC_RECIPE
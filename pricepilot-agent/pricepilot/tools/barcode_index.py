@@ -0,0 +1,172 @@
+"""Persistent (store, barcode) → product index, learned from successful adds.
+
+Every time an item is added to a cart, the product's page URL, store
+product id and name are recorded under its barcode. A later session asked
+for the same barcode at the same store can open the product page directly
+and click add, instead of searching and matching results. The add-button
+selector that worked on the product page is stored too, so the direct path
+does not have to guess it again. Entries not confirmed within
+``BARCODE_INDEX_TTL`` seconds are treated as stale and removed, and a
+direct add that fails drops its entry.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from pricepilot.config import BARCODE_INDEX_PATH, BARCODE_INDEX_TTL
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    store TEXT NOT NULL,
+    barcode TEXT NOT NULL,
+    product_url TEXT,
+    product_id TEXT,
+    add_selector TEXT,
+    name TEXT,
+    hits INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (store, barcode)
+)
+"""
+
+# Keeps values already learned when a later add only knows some fields
+_UPSERT = """
+INSERT INTO products (store, barcode, product_url, product_id, add_selector, name, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (store, barcode) DO UPDATE SET
+    product_url = COALESCE(excluded.product_url, product_url),
+    product_id = COALESCE(excluded.product_id, product_id),
+    add_selector = COALESCE(excluded.add_selector, add_selector),
+    name = COALESCE(excluded.name, name),
+    updated_at = excluded.updated_at
+"""
+
+
+@dataclass
+class IndexedProduct:
+    store: str
+    barcode: str
+    product_url: Optional[str]
+    product_id: Optional[str]
+    add_selector: Optional[str]
+    name: Optional[str]
+    hits: int
+    updated_at: float
+
+
+def normalize_barcode(barcode: Optional[str]) -> Optional[str]:
+    """Digits only; None for empty or non-numeric barcodes."""
+    digits = "".join(ch for ch in (barcode or "") if ch.isdigit())
+    return digits or None
+
+
+class BarcodeIndex:
+    """SQLite table keyed by (store host, barcode)."""
+
+    def __init__(self, path: str = BARCODE_INDEX_PATH, ttl: int = BARCODE_INDEX_TTL) -> None:
+        self.path = Path(path)
+        self.ttl = ttl
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def lookup(self, store: str, barcode: Optional[str]) -> Optional[IndexedProduct]:
+        """Return the indexed product, or None if unknown or stale."""
+        barcode = normalize_barcode(barcode)
+        if not barcode:
+            return None
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT store, barcode, product_url, product_id, add_selector, name, hits,"
+                " updated_at FROM products WHERE store = ? AND barcode = ?",
+                (store.lower(), barcode),
+            ).fetchone()
+            if row is None:
+                return None
+            entry = IndexedProduct(*row)
+            if time.time() - entry.updated_at > self.ttl:
+                conn.execute(
+                    "DELETE FROM products WHERE store = ? AND barcode = ?",
+                    (store.lower(), barcode),
+                )
+                return None
+        return entry
+
+    def record(
+        self,
+        store: str,
+        barcode: Optional[str],
+        product_url: Optional[str] = None,
+        product_id: Optional[str] = None,
+        add_selector: Optional[str] = None,
+        name: Optional[str] = None,
+    ) -> bool:
+        """Insert or refresh an entry after a successful add. Returns False if skipped."""
+        barcode = normalize_barcode(barcode)
+        if not store or not barcode or not (product_url or product_id):
+            return False
+        with self._lock:
+            self._connect().execute(_UPSERT, (
+                store.lower(), barcode, product_url, product_id, add_selector, name, time.time(),
+            ))
+        return True
+
+    def record_hit(self, store: str, barcode: str, add_selector: Optional[str] = None) -> None:
+        """Count a successful direct add.
+
+        The entry's age is left alone: only ``record`` (an add whose card
+        carried this barcode) renews it, so every entry still expires.
+        """
+        with self._lock:
+            self._connect().execute(
+                "UPDATE products SET hits = hits + 1,"
+                " add_selector = COALESCE(?, add_selector)"
+                " WHERE store = ? AND barcode = ?",
+                (add_selector, store.lower(), normalize_barcode(barcode)),
+            )
+
+    def invalidate(self, store: str, barcode: Optional[str]) -> None:
+        with self._lock:
+            self._connect().execute(
+                "DELETE FROM products WHERE store = ? AND barcode = ?",
+                (store.lower(), normalize_barcode(barcode)),
+            )
+
+    def purge_expired(self) -> int:
+        """Delete stale entries. Returns how many were removed."""
+        with self._lock:
+            cursor = self._connect().execute(
+                "DELETE FROM products WHERE updated_at < ?", (time.time() - self.ttl,),
+            )
+        return cursor.rowcount
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, hits = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM products",
+            ).fetchone()
+        return {"entries": entries, "direct_hits": hits}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+barcode_index = BarcodeIndex()
@@ -0,0 +1,439 @@
+"""Shared Chromium pool with an isolated BrowserContext per agent session.
+
+A handful of long-lived Chromium processes are launched on demand and shared
+by every session. Each ADK session gets its own BrowserContext + Page (own
+cookies, cart and storage), looked up by session_id. Contexts are capped per
+browser process; when every process is full and the pool is at its size
+limit, new sessions wait until another session is released, up to
+``BROWSER_ACQUIRE_TIMEOUT`` seconds. Chromium is launched and contexts are
+created outside the pool lock, so one slow launch never blocks other
+sessions' acquire/release.
+
+A configurable number of contexts can be pre-warmed at server startup so the
+first tool call of a session skips the Chromium launch and context creation;
+the warm pool is topped up in the background as sessions take from it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+from playwright.async_api import Browser, BrowserContext, Page, async_playwright
+
+from pricepilot.config import (
+    BROWSER_ACQUIRE_TIMEOUT,
+    BROWSER_HEADLESS,
+    BROWSER_MAX_CONTEXTS_PER_BROWSER,
+    BROWSER_POOL_SIZE,
+    BROWSER_TIMEOUT,
+    BROWSER_VIEWPORT_HEIGHT,
+    BROWSER_VIEWPORT_WIDTH,
+    BROWSER_WARM_CONTEXTS,
+    NETWORK_FILTER_ENABLED,
+)
+from pricepilot.tools.dom_snapshot import SnapshotState
+from pricepilot.tools.network_filter import NetworkFilter
+from pricepilot.tools.screenshots import ScreenshotCache
+from pricepilot.tools.site_replay import site_replay
+
+
+class BrowserPoolTimeout(TimeoutError):
+    """Every context slot stayed taken for the whole acquire timeout."""
+
+
+@dataclass
+class BrowserSlot:
+    """One Chromium process and the number of contexts it currently hosts."""
+
+    browser: Browser
+    contexts: int = 0
+
+
+@dataclass
+class BrowserSession:
+    """The isolated browser state owned by a single agent session."""
+
+    session_id: str
+    context: BrowserContext
+    page: Page
+    slot: BrowserSlot
+    network: Optional[NetworkFilter] = None
+    # Whether a cached (store, city) storage state was checked for this context
+    storage_seeded: bool = False
+    # Product cards tagged by search_products/extract_products, keyed by handle
+    candidates: dict[str, dict] = field(default_factory=dict)
+    next_handle: int = 1
+    # Cart badge text seen before the last click, for wait_for(until="cart_change")
+    cart_badge: Optional[str] = None
+    screenshots: ScreenshotCache = field(default_factory=ScreenshotCache)
+    snapshot: SnapshotState = field(default_factory=SnapshotState)
+    created_at: float = field(default_factory=time.time)
+
+
+@dataclass
+class _WarmContext:
+    context: BrowserContext
+    page: Page
+    slot: BrowserSlot
+    network: Optional[NetworkFilter] = None
+
+
+@dataclass
+class PoolMetrics:
+    """Counters for how sessions obtained their context."""
+
+    warm_hits: int = 0
+    warm_misses: int = 0
+    warm_created: int = 0
+    replenish_errors: int = 0
+
+
+class BrowserPool:
+    """Hands out per-session contexts backed by a small set of browsers."""
+
+    def __init__(
+        self,
+        size: int = BROWSER_POOL_SIZE,
+        max_contexts_per_browser: int = BROWSER_MAX_CONTEXTS_PER_BROWSER,
+        warm_contexts: int = BROWSER_WARM_CONTEXTS,
+        network_filter: bool = NETWORK_FILTER_ENABLED,
+    ) -> None:
+        self.size = max(1, size)
+        self.network_filter = network_filter
+        self.max_contexts_per_browser = max(1, max_contexts_per_browser)
+        self.warm_target = max(0, min(warm_contexts, self.capacity))
+        self.metrics = PoolMetrics()
+        self._playwright = None
+        self._slots: list[BrowserSlot] = []
+        self._sessions: dict[str, BrowserSession] = {}
+        self._warm: deque[_WarmContext] = deque()
+        self._replenish_task: Optional[asyncio.Task] = None
+        self._warming = False
+        self._waiters = 0
+        # Browsers being launched outside the lock; they count toward ``size``
+        self._launching = 0
+        self._cond = asyncio.Condition()
+        self._playwright_lock = asyncio.Lock()
+        # Serializes context creation per session id (concurrent tool calls)
+        self._session_locks: dict[str, asyncio.Lock] = {}
+
+    # ------------------------------------------------------------------
+    # Introspection
+    # ------------------------------------------------------------------
+
+    @property
+    def capacity(self) -> int:
+        return self.size * self.max_contexts_per_browser
+
+    @property
+    def active_sessions(self) -> int:
+        return len(self._sessions)
+
+    @property
+    def browser_count(self) -> int:
+        return len(self._slots)
+
+    @property
+    def warm_available(self) -> int:
+        return len(self._warm)
+
+    def get(self, session_id: str) -> Optional[BrowserSession]:
+        return self._sessions.get(session_id)
+
+    # ------------------------------------------------------------------
+    # Browser / context lifecycle
+    # ------------------------------------------------------------------
+
+    async def _launch_browser(self) -> Browser:
+        async with self._playwright_lock:
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+        return await self._playwright.chromium.launch(headless=BROWSER_HEADLESS)
+
+    async def _new_context(self, browser: Browser) -> BrowserContext:
+        context = await browser.new_context(
+            viewport={"width": BROWSER_VIEWPORT_WIDTH, "height": BROWSER_VIEWPORT_HEIGHT},
+            locale="he-IL",
+        )
+        context.set_default_timeout(BROWSER_TIMEOUT)
+        return context
+
+    def _drop_dead_slots(self) -> None:
+        self._slots = [
+            s for s in self._slots if s.browser.is_connected() or s.contexts > 0
+        ]
+
+    def _try_reserve_live_slot(self) -> Optional[BrowserSlot]:
+        """Reserve a context on the least-loaded running browser, if any has room."""
+        self._drop_dead_slots()
+        live = [
+            s for s in self._slots
+            if s.browser.is_connected() and s.contexts < self.max_contexts_per_browser
+        ]
+        if not live:
+            return None
+        slot = min(live, key=lambda s: s.contexts)
+        slot.contexts += 1
+        return slot
+
+    async def _reserve_slot(
+        self, wait: bool = True, timeout: Optional[float] = None,
+    ) -> Optional[BrowserSlot]:
+        """Pick (or launch) a browser with a free context slot.
+
+        Takes ``self._cond`` itself; a new browser is launched after the lock
+        is released. With ``wait=False`` returns None instead of waiting when
+        the pool is full; otherwise raises ``BrowserPoolTimeout`` after
+        ``timeout`` seconds (None waits forever).
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        async with self._cond:
+            while True:
+                slot = self._try_reserve_live_slot()
+                if slot is not None:
+                    return slot
+                if len(self._slots) + self._launching < self.size:
+                    self._launching += 1
+                    break
+                if not wait:
+                    return None
+                remaining = None if deadline is None else deadline - loop.time()
+                if remaining is not None and remaining <= 0:
+                    raise BrowserPoolTimeout(
+                        f"No browser context free after {timeout:g}s "
+                        f"({self.capacity} contexts, all in use)"
+                    )
+                self._waiters += 1
+                try:
+                    await asyncio.wait_for(self._cond.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass  # Raised on the next pass through the loop
+                finally:
+                    self._waiters -= 1
+
+        try:
+            browser = await self._launch_browser()
+        except Exception:
+            async with self._cond:
+                self._launching -= 1
+                self._cond.notify()
+            raise
+        async with self._cond:
+            self._launching -= 1
+            slot = BrowserSlot(browser=browser, contexts=1)
+            self._slots.append(slot)
+            # The new browser has room for more than this one context
+            self._cond.notify_all()
+        return slot
+
+    async def _open_context(
+        self, slot: BrowserSlot,
+    ) -> tuple[BrowserContext, Page, Optional[NetworkFilter]]:
+        """Create a context + page on a reserved slot (without the lock)."""
+        try:
+            context = await self._new_context(slot.browser)
+            # Before the network filter: routes registered later run first
+            await site_replay.attach(context)
+            network = None
+            if self.network_filter:
+                network = NetworkFilter()
+                await network.attach(context)
+            page = await context.new_page()
+        except Exception:
+            async with self._cond:
+                slot.contexts -= 1
+                self._cond.notify()
+            raise
+        return context, page, network
+
+    async def _take_warm(self) -> Optional[_WarmContext]:
+        """Pop a live warm context, closing dead ones. Caller holds the lock."""
+        while self._warm:
+            warm = self._warm.popleft()
+            if warm.slot.browser.is_connected() and not warm.page.is_closed():
+                return warm
+            try:
+                await warm.context.close()
+            except Exception:
+                pass
+            warm.slot.contexts = max(0, warm.slot.contexts - 1)
+            self._cond.notify_all()
+        return None
+
+    def _drop_session_lock(self, session_id: str) -> None:
+        """Forget a session's acquire lock unless a call still holds it."""
+        lock = self._session_locks.get(session_id)
+        if lock is not None and not lock.locked():
+            del self._session_locks[session_id]
+
+    async def acquire(
+        self, session_id: str, timeout: Optional[float] = BROWSER_ACQUIRE_TIMEOUT,
+    ) -> BrowserSession:
+        """Return the session's browser state, creating a context if needed.
+
+        A pre-warmed context is used when available (a pool hit); otherwise a
+        context is created on demand (a miss). Raises ``BrowserPoolTimeout``
+        when no slot frees up within ``timeout`` seconds.
+        """
+        existing = self._sessions.get(session_id)
+        if existing is not None and not existing.page.is_closed():
+            return existing
+
+        lock = self._session_locks.setdefault(session_id, asyncio.Lock())
+        try:
+            async with lock:
+                async with self._cond:
+                    # Re-check: a concurrent tool call may have created it meanwhile
+                    existing = self._sessions.get(session_id)
+                    if existing is not None:
+                        if not existing.page.is_closed():
+                            return existing
+                        await self._discard(existing)
+                    warm = await self._take_warm()
+
+                if warm is not None:
+                    self.metrics.warm_hits += 1
+                    context, page, slot = warm.context, warm.page, warm.slot
+                    network = warm.network
+                else:
+                    self.metrics.warm_misses += 1
+                    slot = await self._reserve_slot(timeout=timeout)
+                    context, page, network = await self._open_context(slot)
+
+                session = BrowserSession(
+                    session_id=session_id, context=context, page=page, slot=slot,
+                    network=network,
+                )
+                async with self._cond:
+                    self._sessions[session_id] = session
+        finally:
+            # A failed acquire leaves no session for release() to clean up
+            if session_id not in self._sessions:
+                self._drop_session_lock(session_id)
+
+        if warm is not None:
+            self._schedule_replenish()
+        return session
+
+    # ------------------------------------------------------------------
+    # Warm pool
+    # ------------------------------------------------------------------
+
+    async def start(self, warm: Optional[int] = None) -> None:
+        """Launch the first browser and fill the warm pool (server startup)."""
+        if warm is not None:
+            self.warm_target = max(0, min(warm, self.capacity))
+        self._warming = True
+        await self._replenish()
+
+    async def _replenish(self) -> None:
+        """Create warm contexts until the target is met or the pool is full."""
+        while self._warming:
+            async with self._cond:
+                # Never take capacity a session is already queued for
+                if len(self._warm) >= self.warm_target or self._waiters:
+                    return
+            slot = await self._reserve_slot(wait=False)
+            if slot is None:
+                return
+            context, page, network = await self._open_context(slot)
+            async with self._cond:
+                self._warm.append(_WarmContext(
+                    context=context, page=page, slot=slot, network=network,
+                ))
+                self.metrics.warm_created += 1
+
+    async def _replenish_in_background(self) -> None:
+        try:
+            await self._replenish()
+        except Exception:
+            self.metrics.replenish_errors += 1
+
+    def _schedule_replenish(self) -> None:
+        if not self._warming or self.warm_target == 0:
+            return
+        if self._replenish_task is not None and not self._replenish_task.done():
+            return
+        self._replenish_task = asyncio.get_running_loop().create_task(
+            self._replenish_in_background()
+        )
+
+    async def page(self, session_id: str) -> Page:
+        return (await self.acquire(session_id)).page
+
+    async def _discard(self, session: BrowserSession) -> None:
+        """Close a session's context and free its slot. Caller holds the lock."""
+        self._sessions.pop(session.session_id, None)
+        try:
+            await session.context.close()
+        except Exception:
+            pass
+        session.slot.contexts = max(0, session.slot.contexts - 1)
+        self._cond.notify()
+
+    async def release(self, session_id: str) -> bool:
+        """Close the session's context. Returns False if it had none."""
+        async with self._cond:
+            self._drop_session_lock(session_id)
+            session = self._sessions.get(session_id)
+            if session is None:
+                return False
+            await self._discard(session)
+        # Outside the lock: recorded traffic is written in a worker thread
+        await site_replay.flush()
+        self._schedule_replenish()
+        return True
+
+    async def close(self) -> None:
+        """Close every context, browser and the Playwright driver."""
+        self._warming = False
+        if self._replenish_task is not None:
+            self._replenish_task.cancel()
+            self._replenish_task = None
+        async with self._cond:
+            for session in list(self._sessions.values()):
+                await self._discard(session)
+            self._session_locks.clear()
+            while self._warm:
+                warm = self._warm.popleft()
+                try:
+                    await warm.context.close()
+                except Exception:
+                    pass
+            for slot in self._slots:
+                try:
+                    await slot.browser.close()
+                except Exception:
+                    pass
+            self._slots = []
+            if self._playwright is not None:
+                try:
+                    await self._playwright.stop()
+                finally:
+                    self._playwright = None
+            self._cond.notify_all()
+        await site_replay.flush()
+        site_replay.close()
+
+    def stats(self) -> dict:
+        return {
+            "browsers": self.browser_count,
+            "active_sessions": self.active_sessions,
+            "capacity": self.capacity,
+            "contexts_per_browser": [s.contexts for s in self._slots],
+            "warm_available": self.warm_available,
+            "warm_target": self.warm_target,
+            "warm_hits": self.metrics.warm_hits,
+            "warm_misses": self.metrics.warm_misses,
+            "warm_created": self.metrics.warm_created,
+            "replenish_errors": self.metrics.replenish_errors,
+        }
+
+
+# Process-wide pool shared by the tools and the API server
+browser_pool = BrowserPool()
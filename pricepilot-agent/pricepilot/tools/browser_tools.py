@@ -1,7 +1,9 @@
 """Playwright-based browser automation tools for the Browser Agent.
 
 Each public async function is registered as an ADK FunctionTool.
-The module maintains a per-session browser/page that is lazily initialized.
+ADK injects the ``tool_context`` argument; the tools use its session id to
+look up that session's isolated page in the shared browser pool, so
+concurrent sessions never drive the same page.
 
 All tools catch Playwright exceptions and return error strings so the agent
 can recover instead of crashing the session.
@@ -9,121 +11,307 @@ can recover instead of crashing the session.
 
 from __future__ import annotations
 
+import asyncio
 import base64
 import json
+import re
 from typing import Optional
 
-from playwright.async_api import Browser, Page, async_playwright
+from google.adk.tools import ToolContext
+from playwright.async_api import Page
 
 from pricepilot.config import (
-    BROWSER_HEADLESS,
+    BARCODE_INDEX_ENABLED,
     BROWSER_TIMEOUT,
-    BROWSER_VIEWPORT_HEIGHT,
-    BROWSER_VIEWPORT_WIDTH,
+    PARALLEL_TABS,
+    STORAGE_STATE_ENABLED,
 )
+from pricepilot.matching import match_candidates
+from pricepilot.stores import GENERIC_RECIPE, recipe_for_url
+from pricepilot.tools.barcode_index import barcode_index
+from pricepilot.tools.browser_pool import BrowserSession, browser_pool
+from pricepilot.tools.dom_snapshot import MAX_ELEMENTS, SNAPSHOT_JS, diff_snapshots, ref_selector
+from pricepilot.tools.network_filter import store_host
+from pricepilot.tools.parallel_tabs import run_on_tabs
+from pricepilot.tools.product_extraction import (
+    EXTRACT_PRODUCTS_JS,
+    MIN_CARD_SCORE,
+    normalize_product,
+)
+from pricepilot.tools.recipe_runner import (
+    RecipeStepError,
+    add_item,
+    add_on_product_page,
+    add_to_cart,
+    card_link,
+    checkout,
+    search,
+)
+from pricepilot.tools.screenshots import encode_screenshot, estimate_tokens
+from pricepilot.tools.smart_wait import (
+    CONDITIONS,
+    read_text,
+    settle,
+    wait_for_dom_quiet,
+    wait_for_network_idle,
+    wait_for_selector,
+    wait_for_text_change,
+)
+from pricepilot.tools.storage_state import (
+    apply_storage_state,
+    setup_only,
+    storage_state_cache,
+)
+from pricepilot.tracing import goto
 
-# Module-level browser state (one browser session at a time)
-_playwright = None
-_browser: Optional[Browser] = None
-_page: Optional[Page] = None
+# Session id used when a tool is called outside of an ADK run (scripts, tests)
+DEFAULT_SESSION_ID = "default"
 
+# search_products ranks this many result cards locally and returns the top few
+SEARCH_MATCH_POOL = 100
+SEARCH_RESULTS_RETURNED = 8
+# Handles assigned by EXTRACT_PRODUCTS_JS; anything else never reaches a selector
+_HANDLE_RE = re.compile(r"p\d+")
+
+
+def _session_id(tool_context: Optional[ToolContext]) -> str:
+    if tool_context is None:
+        return DEFAULT_SESSION_ID
+    try:
+        return tool_context.session.id
+    except Exception:
+        return DEFAULT_SESSION_ID
+
+
+async def _ensure_session(tool_context: Optional[ToolContext] = None) -> BrowserSession:
+    """Return the calling session's browser state, creating it on first use."""
+    return await browser_pool.acquire(_session_id(tool_context))
+
+
+def _session_city(tool_context: Optional[ToolContext]) -> Optional[str]:
+    if tool_context is None:
+        return None
+    try:
+        return tool_context.state.get("city")
+    except Exception:
+        return None
+
+
+async def _seed_storage_state(
+    session: BrowserSession, url: str, tool_context: Optional[ToolContext],
+) -> bool:
+    """Seed a fresh context with the cached Phase 1 state for this store/city."""
+    if session.storage_seeded or not STORAGE_STATE_ENABLED:
+        return False
+    session.storage_seeded = True
+    store, city = store_host(url), _session_city(tool_context)
+    state = storage_state_cache.load(store, city)
+    if not state or not (state["cookies"] or state["origins"]):
+        return False
+    try:
+        await apply_storage_state(session.context, state)
+    except Exception:
+        # A snapshot the browser rejects would fail every later session too
+        storage_state_cache.invalidate(store, city)
+        return False
+    return True
 
-async def _ensure_browser() -> Page:
-    """Lazily launch browser and return the active page."""
-    global _playwright, _browser, _page
-    if _page is not None:
-        return _page
 
-    _playwright = await async_playwright().start()
-    _browser = await _playwright.chromium.launch(
-        headless=BROWSER_HEADLESS,
-    )
-    context = await _browser.new_context(
-        viewport={"width": BROWSER_VIEWPORT_WIDTH, "height": BROWSER_VIEWPORT_HEIGHT},
-        locale="he-IL",
-    )
-    context.set_default_timeout(BROWSER_TIMEOUT)
-    _page = await context.new_page()
-    return _page
+async def _ensure_browser(tool_context: Optional[ToolContext] = None) -> Page:
+    """Return the calling session's page, creating its context on first use."""
+    return (await _ensure_session(tool_context)).page
 
 
-async def navigate(url: str) -> str:
-    """Navigate to a URL. Returns the page title and current URL."""
+def _indexed_product(store: str, barcode: Optional[str]):
+    """The barcode index entry for this store, or None (also if the index is unusable)."""
+    if not BARCODE_INDEX_ENABLED or not barcode:
+        return None
     try:
-        page = await _ensure_browser()
-        response = await page.goto(url, wait_until="domcontentloaded")
+        return barcode_index.lookup(store, barcode)
+    except Exception:
+        return None
+
+
+def _remember_product(
+    store: str, barcode: Optional[str], link: dict, name: Optional[str],
+) -> None:
+    """Record a successful add in the barcode index (no-op without a barcode).
+
+    ``barcode`` must be the added product's own barcode (from its card), never
+    just the requested one: a name match or a substitute would otherwise be
+    served for that barcode by every later direct add.
+    """
+    if not BARCODE_INDEX_ENABLED or not barcode:
+        return
+    try:
+        barcode_index.record(
+            store, barcode, link.get("product_url"), link.get("product_id"), name=name,
+        )
+    except Exception:
+        pass  # The index only saves time; never fail an add over it
+
+
+async def navigate(url: str, tool_context: Optional[ToolContext] = None) -> str:
+    """Navigate to a URL. Returns the page title and current URL.
+
+    On the first navigation of a session, cookies and delivery settings saved
+    by an earlier session for the same store and city are restored; the result
+    then includes ``"store_setup_restored": true``.
+    """
+    try:
+        session = await _ensure_session(tool_context)
+        page = session.page
+        if session.network is not None:
+            session.network.set_store_url(url)
+        restored = await _seed_storage_state(session, url, tool_context)
+        response = await goto(page, url, wait_until="domcontentloaded")
         status = response.status if response else "unknown"
         title = await page.title()
-        return json.dumps({"title": title, "url": page.url, "status": status})
+        result = {"title": title, "url": page.url, "status": status}
+        if restored:
+            result["store_setup_restored"] = True
+        return json.dumps(result)
     except Exception as e:
         return json.dumps({"error": str(e)[:200]})
 
 
-async def screenshot() -> str:
-    """Take a screenshot of the current page. Returns base64-encoded JPEG image.
+# Viewport-relative bounding box of the visible search-result cards
+_RESULTS_CLIP_JS = """(sel) => {
+    let els;
+    try { els = Array.from(document.querySelectorAll(sel)); } catch (e) { return null; }
+    const vw = window.innerWidth, vh = window.innerHeight;
+    let x1 = vw, y1 = vh, x2 = 0, y2 = 0;
+    for (const el of els) {
+        const r = el.getBoundingClientRect();
+        if (r.width === 0 || r.height === 0 || r.bottom <= 0 || r.top >= vh) continue;
+        x1 = Math.min(x1, r.left); y1 = Math.min(y1, r.top);
+        x2 = Math.max(x2, r.right); y2 = Math.max(y2, r.bottom);
+    }
+    x1 = Math.max(0, x1); y1 = Math.max(0, y1);
+    x2 = Math.min(vw, x2); y2 = Math.min(vh, y2);
+    if (x2 - x1 < 10 || y2 - y1 < 10) return null;
+    return {x: x1, y: y1, width: x2 - x1, height: y2 - y1};
+}"""
+
+
+async def screenshot(
+    selector: Optional[str] = None,
+    compact: bool = False,
+    force: bool = False,
+    tool_context: Optional[ToolContext] = None,
+) -> str:
+    """Take a screenshot of the current page. Returns a base64-encoded WebP image.
+
+    If the region looks exactly as in the last screenshot of it, returns ``"unchanged": true`` instead of the image — look at the
+    previous screenshot. Each result reports bytes and estimated tokens saved.
 
-    The image is compressed to keep token usage low (~10K tokens per screenshot).
+    Args:
+        selector: Crop to this element (CSS selector), or "results" to crop to
+            the search-result grid. Omit for the full viewport.
+        compact: Half-size grayscale image — enough to read layout and text.
+        force: Always return the image, even if unchanged.
     """
     try:
-        page = await _ensure_browser()
-        image_bytes = await page.screenshot(
-            full_page=False, type="jpeg", quality=40,
-        )
-        b64 = base64.b64encode(image_bytes).decode("utf-8")
+        session = await _ensure_session(tool_context)
+        page = session.page
+        region = selector or "viewport"
+        if selector == "results":
+            clip = await page.evaluate(_RESULTS_CLIP_JS, recipe_for_url(page.url).result_card)
+            if clip is None:
+                region = "viewport"
+            raw = await page.screenshot(type="jpeg", quality=80, clip=clip)
+        elif selector:
+            raw = await page.locator(selector).first.screenshot(
+                type="jpeg", quality=80, timeout=BROWSER_TIMEOUT,
+            )
+        else:
+            raw = await page.screenshot(full_page=False, type="jpeg", quality=80)
+
+        shot = await asyncio.to_thread(encode_screenshot, raw, compact)
+        cache = session.screenshots
+        key = f"{region}:{'compact' if compact else 'full'}"
+        if not force and cache.is_unchanged(key, shot.fingerprint):
+            saved = cache.record_unchanged(key)
+            return json.dumps({
+                "unchanged": True,
+                "region": region,
+                "bytes_saved": saved,
+                "tokens_saved": estimate_tokens(saved),
+            })
+
+        saved = cache.record_sent(key, shot)
+        b64 = base64.b64encode(shot.data).decode("utf-8")
         return json.dumps({
-            "screenshot": f"data:image/jpeg;base64,{b64}",
-            "size_bytes": len(image_bytes),
+            "screenshot": f"data:{shot.mime};base64,{b64}",
+            "region": region,
+            "compact": compact,
+            "width": shot.width,
+            "height": shot.height,
+            "size_bytes": len(shot.data),
+            "bytes_saved": saved,
+            "tokens_saved": estimate_tokens(saved),
         })
     except Exception as e:
         return json.dumps({"error": str(e)[:200]})
 
 
-async def click(selector: str) -> str:
-    """Click an element on the page using a CSS selector.
+async def click(selector: str, tool_context: Optional[ToolContext] = None) -> str:
+    """Click an element on the page using a CSS selector or snapshot ref.
 
     Args:
-        selector: CSS selector or text selector (e.g. 'text=Add to cart').
+        selector: CSS selector, text selector (e.g. 'text=Add to cart'), or a
+            numeric ref from get_page_info (e.g. '12').
     """
     try:
-        page = await _ensure_browser()
-        await page.click(selector, timeout=BROWSER_TIMEOUT)
-        await page.wait_for_load_state("domcontentloaded")
+        session = await _ensure_session(tool_context)
+        page = session.page
+        session.cart_badge = await read_text(page, recipe_for_url(page.url).cart_count)
+        await page.click(ref_selector(selector), timeout=BROWSER_TIMEOUT)
+        # SPA carts re-render without navigating; wait for the DOM to settle
+        await settle(page)
         title = await page.title()
         return json.dumps({"clicked": selector, "url": page.url, "title": title})
     except Exception as e:
         return json.dumps({"error": str(e)[:200], "selector": selector})
 
 
-async def type_text(selector: str, text: str) -> str:
-    """Type text into an input field identified by CSS selector.
+async def type_text(
+    selector: str, text: str, tool_context: Optional[ToolContext] = None,
+) -> str:
+    """Type text into an input field identified by CSS selector or snapshot ref.
 
     Args:
-        selector: CSS selector of the input element.
+        selector: CSS selector of the input element, or its numeric ref from
+            get_page_info.
         text: The text to type.
     """
     try:
-        page = await _ensure_browser()
-        await page.fill(selector, text)
+        page = await _ensure_browser(tool_context)
+        await page.fill(ref_selector(selector), text)
         return json.dumps({"typed": text, "into": selector})
     except Exception as e:
         return json.dumps({"error": str(e)[:200], "selector": selector})
 
 
-async def press_key(key: str) -> str:
+async def press_key(key: str, tool_context: Optional[ToolContext] = None) -> str:
     """Press a keyboard key (e.g. 'Enter', 'Escape', 'Tab').
 
     Args:
         key: The key to press.
     """
     try:
-        page = await _ensure_browser()
+        page = await _ensure_browser(tool_context)
         await page.keyboard.press(key)
         return json.dumps({"pressed": key})
     except Exception as e:
         return json.dumps({"error": str(e)[:200]})
 
 
-async def scroll(direction: str = "down", amount: int = 500) -> str:
+async def scroll(
+    direction: str = "down",
+    amount: int = 500,
+    tool_context: Optional[ToolContext] = None,
+) -> str:
     """Scroll the page in a given direction.
 
     Args:
@@ -131,118 +319,504 @@ async def scroll(direction: str = "down", amount: int = 500) -> str:
         amount: Pixels to scroll.
     """
     try:
-        page = await _ensure_browser()
+        page = await _ensure_browser(tool_context)
         delta = amount if direction == "down" else -amount
         await page.mouse.wheel(0, delta)
-        await page.wait_for_timeout(500)
+        # Lazy-loaded grids append cards after a scroll; stop once they're in
+        await wait_for_dom_quiet(page, 1000, quiet_ms=150)
         return json.dumps({"scrolled": direction, "pixels": amount})
     except Exception as e:
         return json.dumps({"error": str(e)[:200]})
 
 
-async def get_page_info() -> str:
-    """Get current page information: URL, title, and a summary of visible elements."""
+async def get_page_info(
+    mode: str = "compact", tool_context: Optional[ToolContext] = None,
+) -> str:
+    """Get current page information: URL, title, and the interactive elements.
+
+    Args:
+        mode: "compact" (default) lists only visible, in-viewport, enabled
+            elements as {ref, role, name}; pass a ref to click/type_text
+            instead of a selector. "diff" returns only elements added,
+            changed or removed since the previous call (a full compact list
+            if the URL changed). "full" is the legacy raw element dump.
+    """
     try:
-        page = await _ensure_browser()
+        session = await _ensure_session(tool_context)
+        page = session.page
         title = await page.title()
         url = page.url
 
-        # Extract a DOM summary: interactive elements
-        summary = await page.evaluate("""() => {
-            const elements = [];
-            const interactable = document.querySelectorAll(
-                'a, button, input, select, textarea, [role="button"], [onclick]'
-            );
-            for (const el of Array.from(interactable).slice(0, 50)) {
-                const tag = el.tagName.toLowerCase();
-                const text = (el.textContent || '').trim().slice(0, 80);
-                const type = el.getAttribute('type') || '';
-                const placeholder = el.getAttribute('placeholder') || '';
-                const href = el.getAttribute('href') || '';
-                const id = el.id || '';
-                const cls = el.className ? String(el.className).slice(0, 40) : '';
-                elements.push({tag, text, type, placeholder, href, id, cls});
-            }
-            return elements;
-        }""")
-
-        return json.dumps({"title": title, "url": url, "elements": summary})
+        if mode == "full":
+            elements = await _legacy_elements(page)
+            return json.dumps({"title": title, "url": url, "elements": elements})
+
+        state = session.snapshot
+        found = await page.evaluate(SNAPSHOT_JS, {"start": state.next_ref, "max": MAX_ELEMENTS})
+        elements = found["elements"]
+        previous, previous_url = state.elements, state.url
+        state.update(url, elements, found["next"])
+
+        if mode == "diff" and previous_url == url:
+            diff = diff_snapshots(previous, elements)
+            return json.dumps(
+                {"title": title, "url": url, "diff": True, **diff}, ensure_ascii=False,
+            )
+        return json.dumps({"title": title, "url": url, "elements": elements}, ensure_ascii=False)
     except Exception as e:
         return json.dumps({"error": str(e)[:200]})
 
 
-async def extract_products() -> str:
-    """Extract visible product data from the current page.
-
-    Looks for common product card patterns and extracts name, price, and image.
-    """
-    try:
-        page = await _ensure_browser()
-        products = await page.evaluate("""() => {
-            const results = [];
-            // Try common product card selectors
-            const selectors = [
-                '[data-product]', '.product-card', '.product-item',
-                '[class*="product"]', '[class*="Product"]',
-                '.item-card', '.grocery-item'
-            ];
-
-            for (const sel of selectors) {
-                const cards = document.querySelectorAll(sel);
-                for (const card of Array.from(cards).slice(0, 20)) {
-                    const name = (
-                        card.querySelector('[class*="name"], [class*="title"], h2, h3, h4')
-                        ?.textContent || ''
-                    ).trim();
-                    const price = (
-                        card.querySelector('[class*="price"], [class*="Price"]')
-                        ?.textContent || ''
-                    ).trim();
-                    const img = card.querySelector('img')?.src || '';
-                    if (name) {
-                        results.push({name, price, image_url: img});
-                    }
-                }
-                if (results.length > 0) break;
-            }
-            return results;
-        }""")
+async def _legacy_elements(page: Page) -> list[dict]:
+    """The first 50 interactive elements in document order, unfiltered."""
+    return await page.evaluate("""() => {
+        const elements = [];
+        const interactable = document.querySelectorAll(
+            'a, button, input, select, textarea, [role="button"], [onclick]'
+        );
+        for (const el of Array.from(interactable).slice(0, 50)) {
+            const tag = el.tagName.toLowerCase();
+            const text = (el.textContent || '').trim().slice(0, 80);
+            const type = el.getAttribute('type') || '';
+            const placeholder = el.getAttribute('placeholder') || '';
+            const href = el.getAttribute('href') || '';
+            const id = el.id || '';
+            const cls = el.className ? String(el.className).slice(0, 40) : '';
+            elements.push({tag, text, type, placeholder, href, id, cls});
+        }
+        return elements;
+    }""")
+
+
+async def _extract_cards(
+    session: BrowserSession,
+    hint: Optional[str] = None,
+    offset: int = 0,
+    limit: int = 20,
+) -> dict:
+    """Run the extraction engine and remember the tagged cards on the session.
+
+    Each card found is tagged with a stable ``data-pp-handle`` attribute so a
+    later add_candidate call can find it again without a selector.
+    """
+    found = await session.page.evaluate(EXTRACT_PRODUCTS_JS, {
+        "hint": hint,
+        "start": session.next_handle,
+        "offset": max(0, offset),
+        "limit": max(1, limit),
+        "minScore": MIN_CARD_SCORE,
+    })
+    session.next_handle = found["next"]
+    products = [normalize_product(raw) for raw in found["products"]]
+    if offset == 0:
+        # A new result set; later pages (offset > 0) add to it
+        session.candidates = {}
+    session.candidates.update({p["handle"]: p for p in products})
+    return {
+        "products": products,
+        "count": len(products),
+        "total": found["total"],
+        "offset": offset,
+        "has_more": offset + len(products) < found["total"] or found["more_below"],
+    }
+
+
+async def extract_products(
+    offset: int = 0, limit: int = 20, tool_context: Optional[ToolContext] = None,
+) -> str:
+    """Extract product cards from the current page, best-structured first in page order.
+
+    Returns name, parsed price (and per-unit price), image, barcode when the
+    page exposes one, and a ``handle`` that can be passed to ``add_candidate``.
+    If ``has_more`` is true, call again with a higher ``offset`` (scroll first
+    if the grid lazy-loads).
 
-        return json.dumps({"products": products, "count": len(products)})
+    Args:
+        offset: Index of the first product to return.
+        limit: Max products to return.
+    """
+    try:
+        session = await _ensure_session(tool_context)
+        result = await _extract_cards(session, offset=offset, limit=limit)
+        return json.dumps(result, ensure_ascii=False)
     except Exception as e:
         return json.dumps({"error": str(e)[:200]})
 
 
-async def wait_for(milliseconds: int = 1000) -> str:
-    """Wait for a specified number of milliseconds.
+async def search_products(
+    query: str,
+    barcode: Optional[str] = None,
+    manufacturer: Optional[str] = None,
+    tool_context: Optional[ToolContext] = None,
+) -> str:
+    """Search the store and return the best-matching products in one step.
+
+    Fills the store's search box, submits, waits for results to settle and
+    ranks the result cards against the item locally (barcode, Hebrew name,
+    size, brand). Returns the top candidates (handle, name, price,
+    unit_price, barcode, image_url, score) and a ``match`` with the best
+    handle and its ``confidence``. If ``match.confident`` is true, pass
+    ``match.handle`` straight to ``add_candidate``.
 
     Args:
-        milliseconds: Time to wait in ms.
+        query: Search text, usually the item's Hebrew name.
+        barcode: Product barcode, if known.
+        manufacturer: Brand / manufacturer, if known.
     """
     try:
-        page = await _ensure_browser()
-        await page.wait_for_timeout(milliseconds)
-        return json.dumps({"waited_ms": milliseconds})
+        session = await _ensure_session(tool_context)
+        page = session.page
+        recipe = recipe_for_url(page.url)
+        await search(page, recipe, query)
+        # Dedicated recipes know their card selector; otherwise go structural
+        hint = recipe.result_card if recipe is not GENERIC_RECIPE else None
+        result = await _extract_cards(session, hint=hint, limit=SEARCH_MATCH_POOL)
+
+        products = result["products"]
+        match = match_candidates(query, products, barcode=barcode, manufacturer=manufacturer)
+        ranked = [
+            {**products[m.index], "score": round(m.score, 2)}
+            for m in match.ranked[:SEARCH_RESULTS_RETURNED]
+        ]
+        best = match.as_dict()
+        index = best.pop("index")
+        best["handle"] = products[index]["handle"] if index is not None else None
+        result.update(products=ranked, count=len(ranked), match=best)
+        return json.dumps({"query": query, **result}, ensure_ascii=False)
+    except RecipeStepError as e:
+        return json.dumps({"error": str(e)[:200], "failed_step": e.step, "query": query})
+    except Exception as e:
+        return json.dumps({"error": str(e)[:200], "query": query})
+
+
+async def add_candidate(
+    handle: str,
+    quantity: int = 1,
+    barcode: Optional[str] = None,
+    tool_context: Optional[ToolContext] = None,
+) -> str:
+    """Add a product returned by search_products/extract_products to the cart.
+
+    Clicks the product's add button, then "+" until the quantity is reached.
+    ``"verified": false`` means the cart badge did not change after the
+    click: check the cart before adding the item again.
+
+    Args:
+        handle: The product's ``handle`` (e.g. 'p3').
+        quantity: How many units to add.
+        barcode: The requested item's barcode, if known, so later sessions
+            can add this product without searching.
+    """
+    try:
+        session = await _ensure_session(tool_context)
+        page = session.page
+        info = session.candidates.get(handle)
+        if info is None or not _HANDLE_RE.fullmatch(handle):
+            return json.dumps({
+                "error": "Unknown handle — call search_products again",
+                "handle": str(handle)[:20],
+            }, ensure_ascii=False)
+        recipe = recipe_for_url(page.url)
+        card = page.locator(f'[data-pp-handle="{handle}"]')
+        if not await card.count():
+            # The results were re-rendered; find the card again by its name
+            card = page.locator(recipe.result_card).filter(has_text=info["name"])
+        verified = await add_to_cart(card.first, recipe, quantity)
+        # Only under the card's own barcode, never a picked substitute's
+        own_barcode = info.get("barcode")
+        if own_barcode and (not barcode or own_barcode == barcode):
+            _remember_product(
+                store_host(page.url), own_barcode, await card_link(card.first), info["name"],
+            )
+        return json.dumps({
+            "added": True,
+            "verified": verified,
+            "handle": handle,
+            "name": info["name"],
+            "quantity": quantity,
+        }, ensure_ascii=False)
+    except RecipeStepError as e:
+        return json.dumps({
+            "added": e.step == "quantity",
+            "error": str(e)[:200],
+            "failed_step": e.step,
+            "handle": handle,
+        })
+    except Exception as e:
+        return json.dumps({"error": str(e)[:200], "handle": handle})
+
+
+async def wait_for(
+    milliseconds: int = 1000,
+    until: Optional[str] = None,
+    selector: Optional[str] = None,
+    tool_context: Optional[ToolContext] = None,
+) -> str:
+    """Wait for a condition, or for a fixed time if no condition is given.
+
+    With ``until`` set, returns as soon as the condition holds and uses
+    ``milliseconds`` only as the maximum wait:
+    - "networkidle": no network activity for 500 ms.
+    - "selector": an element matching ``selector`` is visible (defaults to the
+      store's search-result card).
+    - "dom_quiet": the page has stopped changing.
+    - "cart_change": the cart-count badge changed since the last click.
+
+    Args:
+        milliseconds: Time to wait in ms (max wait when ``until`` is set).
+        until: Optional condition: networkidle, selector, dom_quiet, cart_change.
+        selector: CSS selector for the "selector" / "cart_change" conditions.
+    """
+    try:
+        session = await _ensure_session(tool_context)
+        page = session.page
+        if until is None:
+            await page.wait_for_timeout(milliseconds)
+            return json.dumps({"waited_ms": milliseconds})
+        if until not in CONDITIONS:
+            return json.dumps({
+                "error": f"Unknown condition '{until}'", "valid": list(CONDITIONS),
+            })
+
+        recipe = recipe_for_url(page.url)
+        if until == "networkidle":
+            result = await wait_for_network_idle(page, milliseconds)
+        elif until == "selector":
+            result = await wait_for_selector(page, selector or recipe.result_card, milliseconds)
+        elif until == "dom_quiet":
+            result = await wait_for_dom_quiet(page, milliseconds)
+        else:
+            badge = selector or recipe.cart_count
+            if not badge:
+                return json.dumps({"error": "No cart badge selector for this store"})
+            result = await wait_for_text_change(page, badge, session.cart_badge, milliseconds)
+        return json.dumps(result.as_dict())
     except Exception as e:
         return json.dumps({"error": str(e)[:200]})
 
 
-async def close_browser() -> str:
-    """Close the browser and clean up resources."""
-    global _playwright, _browser, _page
-    try:
-        if _page:
-            await _page.close()
-            _page = None
-        if _browser:
-            await _browser.close()
-            _browser = None
-        if _playwright:
-            await _playwright.stop()
-            _playwright = None
-        return json.dumps({"status": "browser_closed"})
-    except Exception as e:
-        _page = None
-        _browser = None
-        _playwright = None
+async def _add_with_recipe(
+    page: Page,
+    name: str,
+    quantity: int = 1,
+    barcode: Optional[str] = None,
+    manufacturer: Optional[str] = None,
+) -> dict:
+    """Direct add from the barcode index, else recipe search + add, on ``page``.
+
+    Never raises: failures come back as ``"fallback": true`` results.
+    """
+    try:
+        recipe = recipe_for_url(page.url)
+        store = store_host(page.url)
+        entry = _indexed_product(store, barcode)
+        if entry is not None and entry.product_url:
+            try:
+                selector, verified = await add_on_product_page(
+                    page, recipe, entry.product_url, quantity, entry.add_selector,
+                    barcode=entry.barcode,
+                )
+                if verified is not False:
+                    barcode_index.record_hit(store, entry.barcode, selector)
+                return {
+                    "added": True,
+                    "direct": True,
+                    "verified": verified,
+                    "item": name,
+                    "matched": entry.name,
+                    "quantity": quantity,
+                    "store": store,
+                }
+            except RecipeStepError as e:
+                if e.step == "quantity":
+                    raise
+                # Product moved or page changed; forget it and search instead
+                barcode_index.invalidate(store, entry.barcode)
+
+        result = await add_item(page, recipe, name, quantity, barcode, manufacturer)
+        link = {"product_url": result.pop("product_url", None),
+                "product_id": result.pop("product_id", None)}
+        if result.pop("barcode_match", False):
+            # The card's own barcode attribute equals the requested barcode
+            _remember_product(store, barcode, link, result.get("matched"))
+        result["store"] = store
+        return result
+    except RecipeStepError as e:
+        return {
+            "added": e.step == "quantity",
+            "fallback": True,
+            "item": name,
+            "quantity": quantity,
+            "failed_step": e.step,
+            "error": str(e)[:200],
+            "candidates": e.candidates,
+        }
+    except Exception as e:
+        return {"added": False, "fallback": True, "item": name, "quantity": quantity,
+                "error": str(e)[:200]}
+
+
+async def add_item_by_recipe(
+    name: str,
+    quantity: int = 1,
+    barcode: Optional[str] = None,
+    manufacturer: Optional[str] = None,
+    tool_context: Optional[ToolContext] = None,
+) -> str:
+    """Search for an item and add it to the cart in one step using the store's recipe.
+
+    If the barcode was added at this store before, the product page is
+    opened directly and no search is made (``"direct": true``). Returns
+    ``"added": true`` on success; ``"verified": false`` means the cart badge
+    did not change after the click, so check the cart before adding the item
+    again. On failure returns ``"fallback": true``
+    with the step that failed (search, results, match, add, quantity) and any
+    candidate names seen — then handle this item with the manual tools. The
+    "match" step fails when no result is a confident local match.
+
+    Args:
+        name: Item name as given in the request (Hebrew).
+        quantity: How many units to add.
+        barcode: Product barcode, if known.
+        manufacturer: Brand / manufacturer, if known.
+    """
+    try:
+        page = await _ensure_browser(tool_context)
+    except Exception as e:
+        return json.dumps({"added": False, "fallback": True, "error": str(e)[:200]})
+    result = await _add_with_recipe(page, name, quantity, barcode, manufacturer)
+    return json.dumps(result, ensure_ascii=False)
+
+
+def _badge_number(text: Optional[str]) -> Optional[int]:
+    match = re.search(r"\d+", text or "")
+    return int(match.group(0)) if match else None
+
+
+async def add_items_parallel(
+    items: list[dict],
+    concurrency: Optional[int] = None,
+    tool_context: Optional[ToolContext] = None,
+) -> str:
+    """Add many items at once, searching and adding on several tabs in parallel.
+
+    Use this in Phase 2 for lists of more than a few items. Each item is
+    handled like ``add_item_by_recipe`` on its own tab; tabs share the
+    session's cart. Afterwards the main page is reloaded and the cart badge
+    is checked against what was added (``cart.consistent``). Items in
+    ``fallback`` still need the one-at-a-time flow; items in ``unverified``
+    were clicked but the badge did not change, so check them in the cart.
+
+    Args:
+        items: The request's items, each with name, quantity, and optional
+            barcode and manufacturer.
+        concurrency: Number of tabs (default and max PARALLEL_TABS).
+    """
+    try:
+        session = await _ensure_session(tool_context)
+        page = session.page
+        recipe = recipe_for_url(page.url)
+        tabs = max(1, min(concurrency or PARALLEL_TABS, PARALLEL_TABS))
+        before = _badge_number(await read_text(page, recipe.cart_count))
+
+        async def add_on_tab(tab: Page, item: dict) -> dict:
+            return await _add_with_recipe(
+                tab,
+                item.get("name", ""),
+                int(item.get("quantity") or 1),
+                item.get("barcode"),
+                item.get("manufacturer"),
+            )
+
+        results, stats = await run_on_tabs(session.context, page.url, items, add_on_tab, tabs)
+
+        # Reconcile: the main page picks up the other tabs' adds on reload
+        await page.reload(wait_until="domcontentloaded")
+        await settle(page)
+        after = _badge_number(await read_text(page, recipe.cart_count))
+        added = [r for r in results if r.get("added")]
+        lines = len(added)
+        units = sum(int(r.get("quantity") or 1) for r in added)
+        consistent = None
+        if before is not None and after is not None:
+            # Stores count either cart lines or units in the badge
+            consistent = after - before in (lines, units)
+
+        return json.dumps({
+            "added": [{"item": r.get("item"), "quantity": r.get("quantity") or 1}
+                      for r in added],
+            "unverified": [r.get("item") for r in added if r.get("verified") is False],
+            "fallback": [r for r in results if not r.get("added") or r.get("fallback")],
+            "cart": {"before": before, "after": after, "added_lines": lines,
+                     "added_units": units, "consistent": consistent},
+            **stats,
+        }, ensure_ascii=False)
+    except Exception as e:
+        return json.dumps({"error": str(e)[:200]})
+
+
+async def save_store_setup(tool_context: Optional[ToolContext] = None) -> str:
+    """Save cookies and delivery settings once Phase 1 is done.
+
+    Call this after popups are dismissed and the delivery city is set, and
+    before adding any item, so the next session for the same store and city
+    can skip Phase 1. Only consent and delivery-location cookies and
+    localStorage keys are saved; session, login and cart state never are.
+    """
+    try:
+        session = await _ensure_session(tool_context)
+        page = session.page
+        store = store_host(page.url)
+        if not store:
+            return json.dumps({"error": "No store page is open"})
+        if _badge_number(await read_text(page, recipe_for_url(page.url).cart_count)):
+            return json.dumps({
+                "error": "The cart already has items; store setup is only saved before Phase 2",
+            })
+        state = setup_only(await session.context.storage_state())
+        storage_state_cache.save(store, _session_city(tool_context), state)
+        return json.dumps({
+            "saved": True,
+            "store": store,
+            "cookies": len(state["cookies"]),
+            "local_storage": sum(len(o["localStorage"]) for o in state["origins"]),
+        })
+    except Exception as e:
+        return json.dumps({"error": str(e)[:200]})
+
+
+async def go_to_checkout(tool_context: Optional[ToolContext] = None) -> str:
+    """Open the cart and click through to the store's checkout page (Phase 3).
+
+    Uses the store recipe's cart link and checkout button. Returns the cart
+    and checkout URLs and the page title, or ``"fallback": true`` with the
+    step that failed ("cart" or "checkout") — then do Phase 3 manually.
+    """
+    try:
+        page = await _ensure_browser(tool_context)
+        result = await checkout(page, recipe_for_url(page.url))
+        return json.dumps({"checkout": True, **result, "title": await page.title()},
+                          ensure_ascii=False)
+    except RecipeStepError as e:
+        return json.dumps({"fallback": True, "failed_step": e.step, "error": str(e)[:200]})
+    except Exception as e:
+        return json.dumps({"fallback": True, "error": str(e)[:200]})
+
+
+async def close_browser(tool_context: Optional[ToolContext] = None) -> str:
+    """Close this session's browser context and release it back to the pool."""
+    try:
+        session_id = _session_id(tool_context)
+        session = browser_pool.get(session_id)
+        network = session.network.stats.as_dict() if session and session.network else None
+        screenshots = session.screenshots.as_dict() if session else None
+        released = await browser_pool.release(session_id)
+        return json.dumps({
+            "status": "browser_closed",
+            "released": released,
+            "network": network,
+            "screenshots": screenshots,
+        })
+    except Exception as e:
         return json.dumps({"status": "browser_closed", "warning": str(e)[:200]})
+
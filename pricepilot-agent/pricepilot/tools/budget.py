@@ -0,0 +1,255 @@
+"""Per-session budgets for browser actions, tool time and LLM tokens.
+
+``MAX_BROWSER_ACTIONS`` used to be a hint in the prompt only, so a looping
+model could keep a browser and the LLM busy without limit. Every tool in
+``agent.py`` is now a ``BudgetedTool``, which counts each call and the time
+it takes against the session's ``SessionUsage``; the agent's model callbacks
+add the tokens of each LLM call. The session's budget use is the largest of
+actions / ``MAX_BROWSER_ACTIONS``, tool seconds / ``MAX_SESSION_TOOL_SECONDS``
+and tokens / ``MAX_SESSION_TOKENS``:
+
+- from ``BUDGET_SOFT_RATIO``: tool results carry a ``budget`` warning telling
+  the agent to finish the current item and go to Phase 3
+- at 1.0 (exhausted): search and add tools are refused; other tools get
+  ``BUDGET_CHECKOUT_ACTIONS`` more calls to reach checkout
+- after those: every tool but ``close_browser`` is refused and the next
+  model call is replaced by a final message, ending the run
+
+The same wrapper and callbacks feed ``pricepilot.metrics`` (latency, payload
+bytes and outcome per tool and store; latency and tokens per LLM call), and
+the wrapper opens a ``pricepilot.tracing`` span per tool call.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from google.adk.models import LlmResponse
+from google.adk.tools import FunctionTool
+from google.genai import types
+
+from pricepilot import metrics
+from pricepilot.config import (
+    BUDGET_CHECKOUT_ACTIONS,
+    BUDGET_SOFT_RATIO,
+    MAX_BROWSER_ACTIONS,
+    MAX_SESSION_TOKENS,
+    MAX_SESSION_TOOL_SECONDS,
+)
+from pricepilot.tools.network_filter import store_host
+from pricepilot.tracing import tool_span
+
+# Tools that find or add items; refused once the budget is exhausted
+ITEM_TOOLS = {
+    "search_products", "extract_products", "add_item_by_recipe",
+    "add_items_parallel", "add_candidate",
+}
+# Always allowed, so the browser context can be released
+FREE_TOOLS = {"close_browser"}
+# Argument naming the list item a single-item tool works on; add_candidate
+# works on the item of the last search
+ITEM_ARGS = {"add_item_by_recipe": "name", "search_products": "query"}
+_CURRENT_ITEM = "temp:current_item"
+
+_WARNING = (
+    "{used}% of this session's budget is used. Finish the current item, then "
+    "go to Phase 3 (cart and checkout)."
+)
+_EXHAUSTED = (
+    "This session's budget is exhausted. Do not search or add more items: go "
+    "to the cart and checkout now (Phase 3)."
+)
+_STOPPED = (
+    "I've reached this session's budget and had to stop here. The items added "
+    "so far are in the cart; you can finish the checkout from the store's site."
+)
+
+
+@dataclass
+class SessionUsage:
+    """Counters for one session, plus what its budget still allows."""
+
+    actions: int = 0
+    tool_seconds: float = 0.0
+    llm_tokens: int = 0
+    llm_calls: int = 0
+    refused: int = 0
+    checkout_actions: int = 0
+    started_at: float = field(default_factory=time.time)
+
+    def fraction(self) -> float:
+        return max(
+            self.actions / MAX_BROWSER_ACTIONS,
+            self.tool_seconds / MAX_SESSION_TOOL_SECONDS,
+            self.llm_tokens / MAX_SESSION_TOKENS,
+        )
+
+    @property
+    def state(self) -> str:
+        """ok | warning | exhausted | stopped."""
+        fraction = self.fraction()
+        if fraction < BUDGET_SOFT_RATIO:
+            return "ok"
+        if fraction < 1.0:
+            return "warning"
+        if self.checkout_actions < BUDGET_CHECKOUT_ACTIONS:
+            return "exhausted"
+        return "stopped"
+
+    def allows(self, tool: str) -> bool:
+        state = self.state
+        if tool in FREE_TOOLS or state in ("ok", "warning"):
+            return True
+        return state == "exhausted" and tool not in ITEM_TOOLS
+
+    def as_dict(self) -> dict:
+        return {
+            "state": self.state,
+            "actions": self.actions,
+            "max_actions": MAX_BROWSER_ACTIONS,
+            "tool_seconds": round(self.tool_seconds, 1),
+            "max_tool_seconds": MAX_SESSION_TOOL_SECONDS,
+            "llm_tokens": self.llm_tokens,
+            "max_tokens": MAX_SESSION_TOKENS,
+            "llm_calls": self.llm_calls,
+            "refused": self.refused,
+            "elapsed_seconds": round(time.time() - self.started_at, 1),
+        }
+
+
+class BudgetLedger:
+    """``SessionUsage`` per session id."""
+
+    def __init__(self) -> None:
+        self._usage: dict[str, SessionUsage] = {}
+
+    def usage(self, session_id: str) -> SessionUsage:
+        return self._usage.setdefault(session_id, SessionUsage())
+
+    def get(self, session_id: str) -> Optional[SessionUsage]:
+        return self._usage.get(session_id)
+
+    def drop(self, session_id: str) -> None:
+        self._usage.pop(session_id, None)
+
+
+budget_ledger = BudgetLedger()
+
+
+def _with_budget(result: Any, notice: dict) -> Any:
+    """Attach a budget notice to a tool's JSON string result."""
+    if not isinstance(result, str):
+        return result
+    try:
+        payload = json.loads(result)
+    except ValueError:
+        return result
+    if not isinstance(payload, dict):
+        return result
+    payload["budget"] = notice
+    return json.dumps(payload, ensure_ascii=False)
+
+
+def _outcome(result: Any) -> str:
+    """ok, or error when the tool returned an ``{"error": ...}`` result."""
+    if isinstance(result, str):
+        try:
+            result = json.loads(result)
+        except ValueError:
+            return "ok"
+    return "error" if isinstance(result, dict) and "error" in result else "ok"
+
+
+def _payload_bytes(result: Any) -> int:
+    if isinstance(result, str):
+        return len(result.encode("utf-8"))
+    try:
+        return len(json.dumps(result, ensure_ascii=False).encode("utf-8"))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _span_item(tool: str, args: dict[str, Any], state) -> tuple[Optional[str], Optional[int]]:
+    """The list item a tool call works on and its index in the payload."""
+    arg = ITEM_ARGS.get(tool)
+    if arg and args.get(arg):
+        item = str(args[arg])
+        state[_CURRENT_ITEM] = item
+    elif tool == "add_candidate":
+        item = state.get(_CURRENT_ITEM)
+    else:
+        return None, None
+    names = state.get("item_names") or []
+    return item, names.index(item) if item in names else None
+
+
+class BudgetedTool(FunctionTool):
+    """FunctionTool that counts its calls and time against the session budget."""
+
+    async def run_async(self, *, args: dict[str, Any], tool_context) -> Any:
+        session_id = tool_context.session.id
+        store = store_host(tool_context.state.get("store_url") or "")
+        usage = budget_ledger.usage(session_id)
+        if not usage.allows(self.name):
+            usage.refused += 1
+            metrics.record_tool(session_id, self.name, store, 0.0, 0, "refused")
+            return json.dumps({
+                "error": f"{self.name} refused: {_EXHAUSTED}",
+                "budget": usage.as_dict(),
+            }, ensure_ascii=False)
+
+        exhausted = usage.state == "exhausted"
+        start = time.monotonic()
+        result: Any = None
+        outcome = "error"
+        item, item_index = _span_item(self.name, args, tool_context.state)
+        with tool_span(self.name, session_id, store, args, item, item_index) as span:
+            try:
+                result = await super().run_async(args=args, tool_context=tool_context)
+                outcome = _outcome(result)
+            finally:
+                seconds = time.monotonic() - start
+                payload_bytes = _payload_bytes(result)
+                usage.actions += 1
+                usage.tool_seconds += seconds
+                if exhausted:
+                    usage.checkout_actions += 1
+                metrics.record_tool(session_id, self.name, store, seconds, payload_bytes, outcome)
+                span.set_attribute("pricepilot.tool.result_bytes", payload_bytes)
+                span.set_attribute("pricepilot.tool.outcome", outcome)
+
+        state = usage.state
+        if state == "warning":
+            used = int(usage.fraction() * 100)
+            return _with_budget(result, {"state": state, "message": _WARNING.format(used=used)})
+        if state in ("exhausted", "stopped"):
+            return _with_budget(result, {"state": state, "message": _EXHAUSTED})
+        return result
+
+
+def count_model_tokens(callback_context, llm_response: LlmResponse) -> None:
+    """after_model_callback: add the call's tokens to the session's usage."""
+    session_id = callback_context.session.id
+    usage = budget_ledger.usage(session_id)
+    usage.llm_calls += 1
+    metadata = llm_response.usage_metadata
+    input_tokens = output_tokens = 0
+    if metadata is not None:
+        input_tokens = metadata.prompt_token_count or 0
+        output_tokens = metadata.candidates_token_count or 0
+        usage.llm_tokens += metadata.total_token_count or (input_tokens + output_tokens)
+    metrics.record_llm_call(session_id, input_tokens, output_tokens)
+    return None
+
+
+def stop_when_spent(callback_context, llm_request) -> Optional[LlmResponse]:
+    """before_model_callback: end the run once even the checkout allowance is spent."""
+    session_id = callback_context.session.id
+    usage = budget_ledger.get(session_id)
+    if usage is None or usage.state != "stopped":
+        metrics.llm_call_started(session_id)
+        return None
+    return LlmResponse(content=types.Content(role="model", parts=[types.Part(text=_STOPPED)]))
@@ -0,0 +1,221 @@
+"""Compact the conversation history sent with each model call.
+
+Every tool result stays in the ADK session, so by item 20 each LLM call
+re-sends every screenshot (base64 in the tool result) and every page dump.
+``compact_history`` runs as a ``before_model_callback`` and rewrites only
+the outgoing request; the session keeps the full history.
+
+- A screenshot becomes a short placeholder once a newer one of the same
+  region exists, so the image behind every ``"unchanged"`` answer stays.
+- Items already added are collapsed: the turns from the previous added item
+  up to this item's successful add are dropped, and a ledger line
+  ("✓ חלב תנובה x2") is appended to the first message instead. Items an
+  ``add_items_parallel`` call left in ``fallback`` and a failed cart check
+  stay in the ledger, so nothing unresolved disappears with its turn.
+- Tool results longer than ``HISTORY_MAX_TOOL_CHARS`` are truncated.
+
+The last ``HISTORY_KEEP_RECENT`` contents are never collapsed or truncated,
+so the model always sees its latest steps in full. Characters before and
+after compaction are recorded in ``pricepilot.metrics``.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Optional
+
+from google.genai import types
+
+from pricepilot import metrics
+from pricepilot.config import HISTORY_COMPACTION, HISTORY_KEEP_RECENT, HISTORY_MAX_TOOL_CHARS
+from pricepilot.tools.tool_results import ADD_TOOLS, BATCH_ADD_TOOL, tool_payload
+
+_OLD_SCREENSHOT = "[older screenshot removed; see the latest screenshot of this region]"
+_LEDGER_HEADER = "Cart progress so far (earlier steps omitted):"
+
+
+def _responses(content: types.Content) -> list[types.FunctionResponse]:
+    return [p.function_response for p in content.parts or [] if p.function_response is not None]
+
+
+def part_chars(part: types.Part) -> int:
+    """Rough size of a part as sent to the model."""
+    if part.text:
+        return len(part.text)
+    if part.function_call is not None:
+        return len(json.dumps(part.function_call.args or {}, ensure_ascii=False))
+    if part.function_response is not None:
+        return len(json.dumps(part.function_response.response, ensure_ascii=False, default=str))
+    if part.inline_data is not None and part.inline_data.data:
+        return len(part.inline_data.data) * 4 // 3
+    return 0
+
+
+def content_chars(contents: list[types.Content]) -> int:
+    return sum(part_chars(p) for c in contents for p in c.parts or [])
+
+
+def _done_line(name: str, result: dict) -> str:
+    line = f"✓ {name} x{result.get('quantity') or 1}"
+    if result.get("failed_step") == "quantity":
+        return f"{line} (in the cart, quantity still to set)"
+    if result.get("verified") is False:
+        return f"{line} (not confirmed by the cart badge)"
+    return line
+
+
+def _pending_line(result: dict) -> str:
+    """A batch fallback item that still needs the one-at-a-time flow."""
+    name = f"{result.get('item') or '?'} x{result.get('quantity') or 1}"
+    if result.get("added"):
+        return f"✗ {name}: in the cart, quantity still to set"
+    line = f"✗ {name}: not added ({result.get('failed_step') or 'error'})"
+    if result.get("candidates"):
+        line += "; candidates: " + ", ".join(result["candidates"][:5])
+    return line
+
+
+def _added_items(content: types.Content) -> list[str]:
+    """Ledger lines for what this content's tool results added or left pending."""
+    lines = []
+    for response in _responses(content):
+        payload = tool_payload(response.response)
+        if response.name in ADD_TOOLS and payload.get("added") is True:
+            name = payload.get("item") or payload.get("name") or payload.get("matched") or "?"
+            lines.append(_done_line(name, payload))
+        elif response.name == BATCH_ADD_TOOL and isinstance(payload.get("added"), list):
+            unverified = set(payload.get("unverified") or [])
+            for added in payload["added"]:
+                if isinstance(added, dict) and added.get("item"):
+                    verified = False if added["item"] in unverified else None
+                    lines.append(_done_line(added["item"], {**added, "verified": verified}))
+            lines.extend(
+                _pending_line(r) for r in payload.get("fallback") or [] if isinstance(r, dict)
+            )
+            if (payload.get("cart") or {}).get("consistent") is False:
+                lines.append("! The cart badge did not match the items added; "
+                             "verify the cart before checkout")
+    return lines
+
+
+def _payload_index(contents: list[types.Content]) -> Optional[int]:
+    """Index of the first user message (the cart payload)."""
+    for idx, content in enumerate(contents):
+        if content.role == "user" and any(p.text for p in content.parts or []):
+            return idx
+    return None
+
+
+def _collapse_items(contents: list[types.Content], keep_from: int) -> list[types.Content]:
+    """Drop the turns of items added before ``keep_from``; the ledger replaces them."""
+    start = _payload_index(contents)
+    if start is None:
+        return contents
+    dropped: set[int] = set()
+    ledger: list[str] = []
+    segment_start = start + 1
+    for idx in range(start + 1, min(keep_from, len(contents))):
+        lines = _added_items(contents[idx])
+        if not lines:
+            continue
+        # Segments run model → user, so the roles still alternate without them
+        if contents[segment_start].role == "model" and contents[idx].role == "user":
+            dropped.update(range(segment_start, idx + 1))
+            ledger.extend(lines)
+        segment_start = idx + 1
+    if not ledger:
+        return contents
+    payload = contents[start]
+    kept = []
+    for idx, content in enumerate(contents):
+        if idx == start:
+            ledger_part = types.Part(text="\n".join([_LEDGER_HEADER, *ledger]))
+            content = types.Content(role=payload.role, parts=[*payload.parts, ledger_part])
+        if idx not in dropped:
+            kept.append(content)
+    return kept
+
+
+def _screenshot_key(payload: dict) -> tuple:
+    return payload.get("region") or "viewport", bool(payload.get("compact"))
+
+
+def _with_response(part: types.Part, response: dict) -> types.Part:
+    """A new part with the same call but ``response`` (session parts are shared)."""
+    original = part.function_response
+    return types.Part(function_response=types.FunctionResponse(
+        id=original.id, name=original.name, response=response,
+    ))
+
+
+def _shrink_results(
+    contents: list[types.Content], keep_from: int, max_chars: int,
+) -> list[types.Content]:
+    """Placeholder for superseded screenshots, truncation for long results before ``keep_from``."""
+    # The newest screenshot per region (and size), as keyed by the screenshot cache
+    latest: dict[tuple, tuple[int, int]] = {}
+    for idx, content in enumerate(contents):
+        for part_idx, part in enumerate(content.parts or []):
+            response = part.function_response
+            if response is not None and response.name == "screenshot":
+                payload = tool_payload(response.response)
+                if "screenshot" in payload:
+                    latest[_screenshot_key(payload)] = (idx, part_idx)
+    kept_screenshots = set(latest.values())
+
+    compacted = []
+    for idx, content in enumerate(contents):
+        parts = []
+        changed = False
+        for part_idx, part in enumerate(content.parts or []):
+            response = part.function_response
+            if response is None:
+                parts.append(part)
+                continue
+            payload = tool_payload(response.response)
+            if (response.name == "screenshot" and "screenshot" in payload
+                    and (idx, part_idx) not in kept_screenshots):
+                payload["screenshot"] = _OLD_SCREENSHOT
+                part = _with_response(part, {"result": json.dumps(payload, ensure_ascii=False)})
+                changed = True
+            elif idx < keep_from:
+                text = json.dumps(response.response, ensure_ascii=False, default=str)
+                if len(text) > max_chars:
+                    removed = len(text) - max_chars
+                    part = _with_response(part, {
+                        "result": f"{text[:max_chars]}… [{removed} characters removed]",
+                    })
+                    changed = True
+            parts.append(part)
+        compacted.append(types.Content(role=content.role, parts=parts) if changed else content)
+    return compacted
+
+
+def compact_contents(
+    contents: list[types.Content],
+    keep_recent: Optional[int] = None,
+    max_tool_chars: Optional[int] = None,
+) -> list[types.Content]:
+    """The compacted copy of ``contents``; the input is not modified.
+
+    ``keep_recent`` and ``max_tool_chars`` default to ``HISTORY_KEEP_RECENT``
+    and ``HISTORY_MAX_TOOL_CHARS``.
+    """
+    keep_recent = HISTORY_KEEP_RECENT if keep_recent is None else keep_recent
+    max_tool_chars = HISTORY_MAX_TOOL_CHARS if max_tool_chars is None else max_tool_chars
+    keep_from = max(0, len(contents) - keep_recent)
+    collapsed = _collapse_items(contents, keep_from)
+    keep_from -= len(contents) - len(collapsed)
+    return _shrink_results(collapsed, keep_from, max_tool_chars)
+
+
+def compact_history(callback_context, llm_request) -> None:
+    """before_model_callback: send a compacted history to the model."""
+    if not HISTORY_COMPACTION or not llm_request.contents:
+        return None
+    before = content_chars(llm_request.contents)
+    llm_request.contents = compact_contents(llm_request.contents)
+    metrics.record_compaction(
+        callback_context.session.id, before, content_chars(llm_request.contents),
+    )
+    return None
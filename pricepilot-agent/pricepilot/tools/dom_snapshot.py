@@ -0,0 +1,113 @@
+"""Compact, incremental accessibility-style snapshot of the current page.
+
+Instead of the first 50 interactive elements in document order (mostly
+header and nav links), the snapshot keeps only elements that are visible,
+inside the viewport and enabled, and describes each by role and accessible
+name. Every element gets a short numeric ``ref`` (stored as a
+``data-pp-ref`` attribute) that ``click`` and ``type_text`` accept in place
+of a CSS selector. A diff against the session's previous snapshot returns
+only what was added, removed or changed.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+# Max elements per snapshot
+MAX_ELEMENTS = 100
+
+SNAPSHOT_JS = """({start, max}) => {
+    const query = 'a[href], button, input, select, textarea, [role="button"], '
+        + '[role="link"], [role="tab"], [role="menuitem"], [role="checkbox"], '
+        + '[role="option"], [onclick], [contenteditable="true"]';
+    const vw = window.innerWidth, vh = window.innerHeight;
+    const roleOf = (el) => {
+        const explicit = el.getAttribute('role');
+        if (explicit) return explicit;
+        const tag = el.tagName.toLowerCase();
+        if (tag === 'a') return 'link';
+        if (tag === 'select') return 'combobox';
+        if (tag === 'textarea') return 'textbox';
+        if (tag === 'input') {
+            const t = (el.getAttribute('type') || 'text').toLowerCase();
+            if (t === 'search') return 'searchbox';
+            if (t === 'checkbox' || t === 'radio') return t;
+            if (t === 'submit' || t === 'button') return 'button';
+            return 'textbox';
+        }
+        return tag === 'button' ? 'button' : 'generic';
+    };
+    const nameOf = (el) => {
+        const label = el.getAttribute('aria-label') || el.getAttribute('title');
+        if (label) return label;
+        const text = (el.innerText || '').replace(/\\s+/g, ' ').trim();
+        if (text) return text;
+        return el.getAttribute('placeholder') || el.querySelector('img')?.alt
+            || el.getAttribute('name') || '';
+    };
+    let next = start;
+    const elements = [];
+    for (const el of document.querySelectorAll(query)) {
+        if (elements.length >= max) break;
+        if (el.disabled || el.getAttribute('aria-disabled') === 'true') continue;
+        const r = el.getBoundingClientRect();
+        if (r.width < 2 || r.height < 2) continue;
+        if (r.bottom <= 0 || r.right <= 0 || r.top >= vh || r.left >= vw) continue;
+        const style = getComputedStyle(el);
+        if (style.visibility === 'hidden' || style.display === 'none'
+            || Number(style.opacity) === 0) continue;
+        let ref = el.getAttribute('data-pp-ref');
+        if (!ref) {
+            ref = String(next++);
+            el.setAttribute('data-pp-ref', ref);
+        }
+        const item = {ref: Number(ref), role: roleOf(el), name: nameOf(el).slice(0, 60)};
+        if ('value' in el && el.value && el.tagName !== 'BUTTON') {
+            item.value = String(el.value).slice(0, 40);
+        }
+        if (el.checked) item.checked = true;
+        elements.push(item);
+    }
+    return {elements, next};
+}"""
+
+_REF_RE = re.compile(r"^(?:ref=)?(\d+)$")
+
+
+def ref_selector(selector: str) -> str:
+    """Turn a snapshot ref ("12" or "ref=12") into a CSS selector.
+
+    Anything else is returned unchanged, so real selectors still work.
+    """
+    match = _REF_RE.match(selector.strip())
+    if match:
+        return f'[data-pp-ref="{match.group(1)}"]'
+    return selector
+
+
+def diff_snapshots(previous: dict[int, dict], current: list[dict]) -> dict:
+    """Elements added, removed or changed between two snapshots, keyed by ref."""
+    current_by_ref = {el["ref"]: el for el in current}
+    added = [el for ref, el in current_by_ref.items() if ref not in previous]
+    changed = [
+        el for ref, el in current_by_ref.items()
+        if ref in previous and previous[ref] != el
+    ]
+    removed = [ref for ref in previous if ref not in current_by_ref]
+    return {"added": added, "changed": changed, "removed": removed}
+
+
+@dataclass
+class SnapshotState:
+    """Refs and last snapshot for one session."""
+
+    next_ref: int = 1
+    url: Optional[str] = None
+    elements: dict[int, dict] = field(default_factory=dict)
+
+    def update(self, url: str, elements: list[dict], next_ref: int) -> None:
+        self.url = url
+        self.elements = {el["ref"]: el for el in elements}
+        self.next_ref = next_ref
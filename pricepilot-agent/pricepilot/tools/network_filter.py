@@ -0,0 +1,180 @@
+"""Request routing layer that blocks assets the agent never needs.
+
+Every pooled BrowserContext gets a route handler. Requests are blocked when
+they are heavy media/fonts or go to a known third-party tracker, ad or chat
+widget host. Stylesheets and product images are always kept so screenshots
+still show a usable page. Rules can be tuned per store, keyed by the
+hostnames of ``STORE_URLS``.
+
+Each filter counts the requests it blocked and estimates the bytes saved,
+so the savings can be reported per session.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Optional
+from urllib.parse import urlparse
+
+from pricepilot.config import STORE_URLS
+
+# Playwright resource types blocked by default
+DEFAULT_BLOCKED_RESOURCE_TYPES: frozenset[str] = frozenset({"media", "font"})
+
+# Third-party analytics, ads, session-replay and chat-widget hosts.
+# Matched as a host suffix, so "doubleclick.net" also blocks "ad.doubleclick.net".
+DEFAULT_BLOCKED_HOSTS: tuple[str, ...] = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googleadservices.com",
+    "googlesyndication.com",
+    "doubleclick.net",
+    "facebook.net",
+    "connect.facebook.com",
+    "analytics.tiktok.com",
+    "hotjar.com",
+    "clarity.ms",
+    "criteo.com",
+    "criteo.net",
+    "taboola.com",
+    "outbrain.com",
+    "adnxs.com",
+    "bat.bing.com",
+    "mc.yandex.ru",
+    "mixpanel.com",
+    "segment.io",
+    "newrelic.com",
+    "nr-data.net",
+    "fullstory.com",
+    "quantserve.com",
+    "scorecardresearch.com",
+    "zopim.com",
+    "zendesk.com",
+    "intercom.io",
+    "livechatinc.com",
+    "tawk.to",
+    "glassix.com",
+    "youtube.com",
+    "vimeo.com",
+)
+
+# Rough average transfer size per resource type, used to estimate savings
+# for requests that were never made (their real size is unknown).
+_ESTIMATED_BYTES: dict[str, int] = {
+    "media": 500_000,
+    "font": 40_000,
+    "script": 60_000,
+    "image": 30_000,
+    "stylesheet": 20_000,
+    "xhr": 3_000,
+    "fetch": 3_000,
+}
+_DEFAULT_ESTIMATED_BYTES = 5_000
+
+
+@dataclass(frozen=True)
+class NetworkRules:
+    """Allow/deny rules applied to a store's pages."""
+
+    block_resource_types: frozenset[str] = DEFAULT_BLOCKED_RESOURCE_TYPES
+    block_hosts: tuple[str, ...] = DEFAULT_BLOCKED_HOSTS
+    # Hosts that are never blocked, even if they match a rule above
+    allow_hosts: tuple[str, ...] = ()
+    # Extra URL substrings to block (e.g. a store's own tracking endpoint)
+    block_url_patterns: tuple[str, ...] = ()
+
+
+def store_host(url: str) -> str:
+    """Return the hostname of a URL without a leading ``www.``."""
+    host = (urlparse(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def _host_matches(host: str, suffixes: tuple[str, ...]) -> bool:
+    return any(host == s or host.endswith("." + s) for s in suffixes)
+
+
+# Per-store rules keyed by STORE_URLS hostname. Stores start from the defaults;
+# override an entry here when a store needs an asset type (e.g. icon fonts).
+STORE_NETWORK_RULES: dict[str, NetworkRules] = {
+    store_host(url): NetworkRules() for url in STORE_URLS.values()
+}
+
+
+def rules_for_url(url: str) -> NetworkRules:
+    """Return the rules of the store serving ``url``, or the defaults."""
+    host = store_host(url)
+    for store, rules in STORE_NETWORK_RULES.items():
+        if host == store or host.endswith("." + store):
+            return rules
+    return NetworkRules()
+
+
+@dataclass
+class NetworkStats:
+    """Per-session counters of what the filter blocked."""
+
+    requests_total: int = 0
+    requests_blocked: int = 0
+    estimated_bytes_saved: int = 0
+    blocked_by_reason: dict[str, int] = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        return {
+            "requests_total": self.requests_total,
+            "requests_blocked": self.requests_blocked,
+            "estimated_bytes_saved": self.estimated_bytes_saved,
+            "blocked_by_reason": dict(self.blocked_by_reason),
+        }
+
+
+class NetworkFilter:
+    """Route handler for one BrowserContext."""
+
+    def __init__(self, rules: Optional[NetworkRules] = None) -> None:
+        self.rules = rules or NetworkRules()
+        self.store: Optional[str] = None
+        self.stats = NetworkStats()
+
+    def set_store_url(self, url: str) -> None:
+        """Switch to the rules of the store at ``url`` (called on navigation)."""
+        host = store_host(url)
+        if host and host != self.store:
+            self.store = host
+            self.rules = rules_for_url(url)
+
+    def block_reason(self, url: str, resource_type: str) -> Optional[str]:
+        """Return why a request should be blocked, or None to let it through."""
+        rules = self.rules
+        host = store_host(url)
+        if not host or _host_matches(host, rules.allow_hosts):
+            return None
+        if resource_type in rules.block_resource_types:
+            return resource_type
+        if _host_matches(host, rules.block_hosts):
+            return "tracker"
+        if any(p in url for p in rules.block_url_patterns):
+            return "pattern"
+        return None
+
+    def _record(self, resource_type: str, reason: Optional[str]) -> None:
+        self.stats.requests_total += 1
+        if reason is None:
+            return
+        self.stats.requests_blocked += 1
+        self.stats.estimated_bytes_saved += _ESTIMATED_BYTES.get(
+            resource_type, _DEFAULT_ESTIMATED_BYTES
+        )
+        self.stats.blocked_by_reason[reason] = self.stats.blocked_by_reason.get(reason, 0) + 1
+
+    async def handle(self, route) -> None:
+        request = route.request
+        reason = self.block_reason(request.url, request.resource_type)
+        self._record(request.resource_type, reason)
+        if reason is not None:
+            await route.abort("blockedbyclient")
+        else:
+            await route.fallback()
+
+    async def attach(self, context) -> None:
+        await context.route("**/*", self.handle)
@@ -0,0 +1,89 @@
+"""Run per-item work concurrently on several tabs of one browser context.
+
+Tabs in the same context share cookies, so items added from any tab land
+in the same store cart. ``run_on_tabs`` opens up to ``concurrency`` extra
+pages on the store, lets each pull the next item from a shared queue and
+returns one result per item in the original order. Every result names its
+item and barcode. Worker exceptions become failed results instead of
+cancelling the other tabs, and every tab is closed when the run ends.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable
+
+from playwright.async_api import BrowserContext, Page
+
+from pricepilot.tracing import goto, tracer
+
+Worker = Callable[[Page, dict], Awaitable[dict]]
+
+
+def _with_item(result: dict, item: dict) -> dict:
+    """``result`` tagged with the item's name and barcode."""
+    return {"item": item.get("name"), "barcode": item.get("barcode"), **result}
+
+
+async def run_on_tabs(
+    context: BrowserContext,
+    start_url: str,
+    items: list[dict],
+    worker: Worker,
+    concurrency: int,
+) -> tuple[list[dict], dict[str, Any]]:
+    """Process ``items`` with ``worker`` on up to ``concurrency`` tabs.
+
+    Returns the per-item results (same order as ``items``) and run stats.
+    """
+    start = time.monotonic()
+    queue: asyncio.Queue[int] = asyncio.Queue()
+    for idx in range(len(items)):
+        queue.put_nowait(idx)
+    results: list[dict] = [{} for _ in items]
+    tabs = max(1, min(concurrency, len(items)))
+    pages: list[Page] = []
+    opened = 0
+
+    async def run_tab() -> None:
+        nonlocal opened
+        try:
+            page = await context.new_page()
+            pages.append(page)
+            await goto(page, start_url, wait_until="domcontentloaded")
+        except Exception:
+            return  # This tab never opened; the other tabs drain the queue
+        opened += 1
+        while True:
+            try:
+                idx = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            attributes = {"pricepilot.item_index": idx,
+                          "pricepilot.item": str(items[idx].get("name", ""))}
+            with tracer.start_as_current_span("item", attributes=attributes):
+                try:
+                    result = await worker(page, items[idx])
+                except Exception as e:
+                    result = {"added": False, "error": str(e)[:200]}
+                results[idx] = _with_item(result, items[idx])
+
+    try:
+        await asyncio.gather(*(run_tab() for _ in range(tabs)))
+    finally:
+        for page in pages:
+            try:
+                await page.close()
+            except Exception:
+                pass
+
+    # Items never picked up because no tab could be opened
+    for idx, result in enumerate(results):
+        if not result:
+            results[idx] = _with_item({"added": False, "error": "No tab available"}, items[idx])
+    stats = {
+        "tabs": opened,
+        "elapsed_ms": int((time.monotonic() - start) * 1000),
+    }
+    return results, stats
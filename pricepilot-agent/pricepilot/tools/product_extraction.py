@@ -0,0 +1,217 @@
+"""Single-pass, ranked product-card extraction.
+
+One in-page script finds product cards structurally instead of trying a
+list of selectors in order: every price node is an anchor, and the card is
+the largest ancestor that still holds only one product (at most one image,
+one add button and a few prices). Candidate cards are scored by what they
+contain (name, price, image, add button, barcode), nested matches are
+deduplicated and results are returned in document order, paginated for
+lazy-loaded grids. The work is linear in the number of price nodes, so
+pages with 500+ cards stay fast.
+
+Prices come back as raw text and are parsed here (₪ amounts, per-unit
+prices), so the parsing is testable without a browser.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Optional
+
+# Cards scoring below this (e.g. a name without a price) are dropped
+MIN_CARD_SCORE = 5
+
+EXTRACT_PRODUCTS_JS = r"""({hint, start, offset, limit, minScore}) => {
+    const PRICE_SEL = '[class*="price" i], [data-price], [itemprop="price"]';
+    const NAME_SEL = '[itemprop="name"], [class*="name" i], [class*="title" i], '
+        + 'h1, h2, h3, h4, h5';
+    // Add-to-cart only; quantity "+" buttons must not split a card in two
+    const ADD_RE = /הוסף|הוספה|לסל|add to cart/i;
+    const CODE_ATTR_RE = /barcode|ean|gtin|sku|product-?code|product-?id|item-?code|code/i;
+    const MAX_DEPTH = 8;
+
+    const isAdd = (el) =>
+        ADD_RE.test((el.innerText || el.getAttribute('aria-label') || '').trim())
+        || /add-?to-?cart|addtocart/i.test(el.className && String(el.className));
+    const text = (el) => (el ? (el.innerText || el.textContent || '') : '')
+        .replace(/\s+/g, ' ').trim();
+
+    // Price anchors: innermost price-classed nodes, plus leaf nodes showing ₪
+    const anchors = new Set();
+    for (const el of document.querySelectorAll(PRICE_SEL)) {
+        if (!el.querySelector(PRICE_SEL)) anchors.add(el);
+    }
+    const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+    for (let n = walker.nextNode(); n; n = walker.nextNode()) {
+        if (n.nodeValue.includes('₪') && n.parentElement) anchors.add(n.parentElement);
+    }
+
+    // Count prices, images and add buttons under each ancestor in one pass each
+    const count = (nodes) => {
+        const map = new Map();
+        for (const node of nodes) {
+            let el = node;
+            for (let d = 0; d <= MAX_DEPTH && el; d++, el = el.parentElement) {
+                map.set(el, (map.get(el) || 0) + 1);
+            }
+        }
+        return map;
+    };
+    const prices = count(anchors);
+    // Product images only: skip icons inside buttons and tiny sprites
+    const images = count(Array.from(document.querySelectorAll('img')).filter(
+        i => !i.closest('button, [role="button"]') && !(i.width && i.width < 40)));
+    const buttons = count(Array.from(
+        document.querySelectorAll('button, [role="button"]')).filter(isAdd));
+
+    let candidates = [];
+    if (hint) {
+        try { candidates = Array.from(document.querySelectorAll(hint)); } catch (e) {}
+    }
+    if (!candidates.length) {
+        // Climb from each price to the largest ancestor holding a single product
+        const seen = new Set();
+        for (const anchor of anchors) {
+            let card = null;
+            let el = anchor;
+            for (let d = 0; d < MAX_DEPTH && el && el !== document.body;
+                 d++, el = el.parentElement) {
+                if ((prices.get(el) || 0) > 3 || (images.get(el) || 0) > 1
+                    || (buttons.get(el) || 0) > 1) break;
+                card = el;
+            }
+            if (card && !seen.has(card)) { seen.add(card); candidates.push(card); }
+        }
+        candidates.sort((a, b) =>
+            a.compareDocumentPosition(b) & Node.DOCUMENT_POSITION_FOLLOWING ? -1 : 1);
+    }
+
+    // Drop candidates that wrap another candidate (grid rows, nested matches)
+    const cardSet = new Set(candidates);
+    const wrappers = new Set();
+    for (const c of candidates) {
+        for (let el = c.parentElement; el; el = el.parentElement) {
+            if (cardSet.has(el)) wrappers.add(el);
+        }
+    }
+    candidates = candidates.filter(c => !wrappers.has(c));
+
+    const results = [];
+    for (const card of candidates) {
+        const nameEl = card.querySelector(NAME_SEL);
+        const img = card.querySelector('img');
+        const name = text(nameEl) || (img && img.alt) || '';
+        // Outermost price elements, so "₪ 5" + ".90" split across spans reads
+        // as one price, plus any ₪ text outside them (unit prices)
+        const priceEls = Array.from(card.querySelectorAll(PRICE_SEL)).filter(p => {
+            const up = p.parentElement && p.parentElement.closest(PRICE_SEL);
+            return !up || !card.contains(up);
+        });
+        const inPrice = (el) => priceEls.some(p => p.contains(el));
+        const cardWalker = document.createTreeWalker(card, NodeFilter.SHOW_TEXT);
+        for (let n = cardWalker.nextNode(); n; n = cardWalker.nextNode()) {
+            const parent = n.parentElement;
+            if (n.nodeValue.includes('₪') && parent && !inPrice(parent)) priceEls.push(parent);
+        }
+        const priceTexts = [...new Set(priceEls.map(text).filter(Boolean))];
+        const add = Array.from(card.querySelectorAll('button, [role="button"]')).find(isAdd);
+
+        const data = {};
+        let barcode = null;
+        const coded = card.querySelectorAll(
+            '[data-product-code], [data-barcode], [data-sku], [data-product-id], [data-id]');
+        for (const el of [card, ...coded]) {
+            for (const attr of el.attributes) {
+                if (!attr.name.startsWith('data-') || attr.name.startsWith('data-pp-')) continue;
+                if (Object.keys(data).length < 8) data[attr.name.slice(5)] = attr.value.slice(0, 60);
+                if (!barcode && CODE_ATTR_RE.test(attr.name) && /^\d{7,14}$/.test(attr.value)) {
+                    barcode = attr.value;
+                }
+            }
+        }
+
+        const score = (name ? 3 : 0) + (priceTexts.length ? 3 : 0) + (img ? 2 : 0)
+            + (add ? 2 : 0) + (barcode ? 1 : 0);
+        if (score < minScore || !name) continue;
+        results.push({card, name: name.slice(0, 120), priceTexts: priceTexts.slice(0, 3),
+            image_url: img ? (img.currentSrc || img.src || '') : '', barcode, data,
+            has_add_button: !!add, score});
+    }
+
+    const page = results.slice(offset, offset + limit);
+    let next = start;
+    for (const r of page) {
+        let handle = r.card.getAttribute('data-pp-handle');
+        if (!handle) {
+            handle = 'p' + next++;
+            r.card.setAttribute('data-pp-handle', handle);
+        }
+        r.handle = handle;
+        delete r.card;
+    }
+    const scroller = document.scrollingElement || document.documentElement;
+    return {
+        products: page,
+        total: results.length,
+        next,
+        more_below: scroller.scrollTop + window.innerHeight < scroller.scrollHeight - 50,
+    };
+}"""
+
+_NUMBER = r"\d{1,5}(?:[.,]\d{1,2})?"
+_SHEKEL_PRICE_RE = re.compile(rf"₪\s*({_NUMBER})|({_NUMBER})\s*(?:₪|ש\"ח|ש״ח|שח)")
+_ANY_NUMBER_RE = re.compile(_NUMBER)
+_UNIT_WORD = r"(?:גרם|גר'|ג'|ק\"ג|ק״ג|קילו|ליטר|ל'|מ\"ל|מ״ל|יח'|יחידה|יחידות)"
+# "1.29 ₪ ל-100 גרם", "מחיר ל-1 ק"ג: 24.90", "ליח' 3.50"
+_UNIT_RE = re.compile(rf"ל\s*-?\s*((?:\d+(?:[.,]\d+)?\s*)?{_UNIT_WORD})")
+
+
+def _to_float(number: str) -> float:
+    return float(number.replace(",", "."))
+
+
+def parse_price(text: str) -> Optional[float]:
+    """Parse a shekel amount from price text ("₪ 12.90", "12,90 ש״ח", "12.9")."""
+    if not text:
+        return None
+    match = _SHEKEL_PRICE_RE.search(text)
+    if match:
+        return _to_float(match.group(1) or match.group(2))
+    match = _ANY_NUMBER_RE.search(text)
+    return _to_float(match.group(0)) if match else None
+
+
+def parse_unit_price(text: str) -> Optional[dict]:
+    """Parse a per-unit price ("₪1.29 ל-100 גרם") into {amount, per}."""
+    unit = _UNIT_RE.search(text or "")
+    if unit is None:
+        return None
+    amount = parse_price(_UNIT_RE.sub(" ", text))
+    if amount is None:
+        return None
+    return {"amount": amount, "per": unit.group(1).strip()}
+
+
+def normalize_product(raw: dict) -> dict:
+    """Turn one raw in-page result into the tool's product dict."""
+    price = unit_price = None
+    for text in raw.get("priceTexts", []):
+        unit = parse_unit_price(text)
+        if unit is not None:
+            unit_price = unit_price or unit
+        elif price is None:
+            price = parse_price(text)
+    product = {
+        "handle": raw.get("handle"),
+        "name": raw.get("name", ""),
+        "price": price,
+        "price_text": (raw.get("priceTexts") or [""])[0],
+        "image_url": raw.get("image_url", ""),
+    }
+    if unit_price:
+        product["unit_price"] = unit_price
+    if raw.get("barcode"):
+        product["barcode"] = raw["barcode"]
+    if raw.get("data"):
+        product["data"] = raw["data"]
+    return product
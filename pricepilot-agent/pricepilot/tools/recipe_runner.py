@@ -0,0 +1,333 @@
+"""Runs a store recipe (see ``pricepilot.stores``) directly in Playwright.
+
+One call searches for an item, picks the matching result card, clicks add
+and bumps the quantity — no LLM round-trips. Items already in the barcode
+index can skip the search and be added from their product page, and
+``checkout`` opens the cart and clicks through to checkout. Any
+failing step raises ``RecipeStepError`` so the tool can report which step
+broke and let the agent fall back to the manual screenshot-driven flow.
+"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+from playwright.async_api import Locator, Page
+
+from pricepilot.matching import match_candidates
+from pricepilot.stores import StoreRecipe
+from pricepilot.tools.smart_wait import (
+    read_text,
+    settle,
+    wait_for_dom_quiet,
+    wait_for_text_change,
+)
+from pricepilot.tracing import goto
+
+# Per-step timeout — recipes should fail fast and hand over to the agent
+STEP_TIMEOUT_MS = 5000
+# Max time to wait for the cart badge to reflect an add
+CART_UPDATE_TIMEOUT_MS = 3000
+# Max result cards considered when matching by name
+MAX_CARDS = 30
+# How long to look for each candidate add button on a product page
+PRODUCT_PAGE_PROBE_MS = 1500
+# Ancestors of a product page's add button searched for its "+" button
+PRODUCT_SCOPE_LEVELS = 6
+
+# Product page link and store product id of a result card
+_CARD_LINK_JS = """(el) => {
+    const link = Array.from(el.querySelectorAll('a[href]')).concat(el.closest('a[href]') || [])
+        .map(a => a.href).find(h => h && !h.startsWith('javascript:') && !h.endsWith('#'));
+    const id = el.getAttribute('data-product-id') || el.getAttribute('data-product-code')
+        || el.getAttribute('data-id') || el.id || null;
+    return {product_url: link || null, product_id: id};
+}"""
+
+
+# Whether the open product page shows this barcode (attribute, URL or text)
+_PAGE_HAS_BARCODE_JS = """([attr, barcode]) => {
+    if (attr && document.querySelector(`[${attr}="${CSS.escape(barcode)}"]`)) return true;
+    if (location.href.includes(barcode)) return true;
+    return (document.body?.innerText || '').includes(barcode);
+}"""
+
+
+# Mark the add button's ancestors (1 = parent) so the "+" next to it can be
+# found after the click, even when the page swaps the button for a stepper
+_MARK_ADD_SCOPE_JS = """(el, levels) => {
+    document.querySelectorAll('[data-pp-add-scope]')
+        .forEach(e => e.removeAttribute('data-pp-add-scope'));
+    let node = el.parentElement;
+    for (let i = 1; i <= levels && node && node !== document.body; i++) {
+        node.setAttribute('data-pp-add-scope', String(i));
+        node = node.parentElement;
+    }
+}"""
+
+
+class RecipeStepError(Exception):
+    """A recipe step failed; the agent should take over for this item."""
+
+    def __init__(self, step: str, message: str, candidates: Optional[list[str]] = None):
+        super().__init__(message)
+        self.step = step
+        self.candidates = candidates or []
+
+
+async def search(page: Page, recipe: StoreRecipe, query: str) -> Locator:
+    """Fill the search box, submit, and wait for the first result card."""
+    try:
+        box = page.locator(recipe.search_input).first
+        await box.fill(query, timeout=STEP_TIMEOUT_MS)
+        if recipe.search_submit:
+            await page.locator(recipe.search_submit).first.click(timeout=STEP_TIMEOUT_MS)
+        else:
+            await box.press("Enter", timeout=STEP_TIMEOUT_MS)
+    except Exception as e:
+        raise RecipeStepError("search", str(e)[:200]) from e
+
+    cards = page.locator(recipe.result_card)
+    try:
+        await cards.first.wait_for(state="visible", timeout=recipe.results_timeout_ms)
+    except Exception as e:
+        raise RecipeStepError("results", "No result cards appeared") from e
+    # Let lazily rendered cards (prices, buttons) finish before reading them
+    await wait_for_dom_quiet(page, 1500)
+    return cards
+
+
+def _css_string(value: str) -> str:
+    """``value`` quoted for a CSS attribute selector."""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+async def _pick_card(
+    page: Page,
+    recipe: StoreRecipe,
+    cards: Locator,
+    name: str,
+    barcode: Optional[str],
+    manufacturer: Optional[str] = None,
+) -> tuple[Locator, str, float, bool]:
+    """The card to add, its name, the match confidence and whether the card's
+    own barcode attribute equals ``barcode``."""
+    if barcode and recipe.barcode_attr:
+        # Only a result card that carries the barcode or contains it
+        tagged = page.locator(f"[{recipe.barcode_attr}={_css_string(barcode)}]")
+        by_barcode = cards.and_(tagged).or_(cards.filter(has=tagged))
+        if await by_barcode.count():
+            card = by_barcode.first
+            label = await card.locator(recipe.card_name).first.text_content(
+                timeout=STEP_TIMEOUT_MS,
+            )
+            return card, (label or name).strip(), 1.0, True
+
+    names: list[str] = await cards.evaluate_all(
+        """(els, [sel, max]) => els.slice(0, max).map(e =>
+            ((e.querySelector(sel) || e).textContent || '').trim().slice(0, 120))""",
+        [recipe.card_name, MAX_CARDS],
+    )
+    result = match_candidates(name, [{"name": n} for n in names], manufacturer=manufacturer)
+    if not result.confident:
+        raise RecipeStepError(
+            "match", f"No confident match for '{name}'",
+            candidates=[names[m.index] for m in result.ranked[:5] if names[m.index]],
+        )
+    idx = result.best.index
+    return cards.nth(idx), names[idx], result.confidence, False
+
+
+def split_selector(selector: str) -> list[str]:
+    """Split a comma-separated selector list, ignoring commas in quotes / parens."""
+    parts, depth, quote, start = [], 0, "", 0
+    for i, ch in enumerate(selector):
+        if quote:
+            quote = "" if ch == quote else quote
+        elif ch in "\"'":
+            quote = ch
+        elif ch in "([":
+            depth += 1
+        elif ch in ")]":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            parts.append(selector[start:i].strip())
+            start = i + 1
+    parts.append(selector[start:].strip())
+    return [p for p in parts if p]
+
+
+async def _click_add(
+    page: Page, button: Locator, recipe: StoreRecipe, step: str,
+) -> Optional[bool]:
+    """Click an add button and wait for the cart to reflect it.
+
+    Waits for the cart badge to change after the add (or for the DOM to go
+    quiet when the page shows no badge) instead of sleeping. Returns whether
+    the badge changed, or None when there is no badge to check.
+    """
+    before = await read_text(page, recipe.cart_count)
+    try:
+        await button.click(timeout=STEP_TIMEOUT_MS)
+    except Exception as e:
+        raise RecipeStepError(step, str(e)[:200]) from e
+    if before is not None:
+        result = await wait_for_text_change(
+            page, recipe.cart_count, before, CART_UPDATE_TIMEOUT_MS,
+        )
+        return result.met
+    await wait_for_dom_quiet(page, CART_UPDATE_TIMEOUT_MS)
+    return None
+
+
+async def _bump_quantity(scope: Locator, recipe: StoreRecipe, quantity: int) -> None:
+    for _ in range(max(0, quantity - 1)):
+        try:
+            await scope.locator(recipe.quantity_plus).first.click(timeout=STEP_TIMEOUT_MS)
+        except Exception as e:
+            raise RecipeStepError("quantity", str(e)[:200]) from e
+        await wait_for_dom_quiet(scope.page, 1000)
+
+
+async def _add_scope(page: Page, recipe: StoreRecipe) -> Locator:
+    """The nearest marked ancestor of the clicked add button holding a "+"."""
+    for level in range(1, PRODUCT_SCOPE_LEVELS + 1):
+        scope = page.locator(f'[data-pp-add-scope="{level}"]')
+        if await scope.locator(recipe.quantity_plus).count():
+            return scope.first
+    raise RecipeStepError("quantity", "No quantity button next to the add button")
+
+
+async def add_to_cart(card: Locator, recipe: StoreRecipe, quantity: int = 1) -> Optional[bool]:
+    """Click the card's add button, then "+" for each extra unit.
+
+    Returns whether the cart badge confirmed the add (None without a badge).
+    """
+    verified = await _click_add(card.page, card.locator(recipe.add_button).first, recipe, "add")
+    await _bump_quantity(card, recipe, quantity)
+    return verified
+
+
+async def card_link(card: Locator) -> dict:
+    """Product page URL and store product id of a result card (values may be None)."""
+    try:
+        return await card.evaluate(_CARD_LINK_JS)
+    except Exception:
+        return {"product_url": None, "product_id": None}
+
+
+async def page_has_barcode(page: Page, recipe: StoreRecipe, barcode: str) -> bool:
+    """Whether the open page shows ``barcode`` (barcode attribute, URL or text)."""
+    try:
+        return bool(await page.evaluate(_PAGE_HAS_BARCODE_JS, [recipe.barcode_attr, barcode]))
+    except Exception:
+        return False
+
+
+async def add_on_product_page(
+    page: Page,
+    recipe: StoreRecipe,
+    url: str,
+    quantity: int = 1,
+    add_selector: Optional[str] = None,
+    barcode: Optional[str] = None,
+) -> tuple[str, Optional[bool]]:
+    """Open a product page and add it without searching.
+
+    With ``barcode``, the page must show that barcode before anything is
+    clicked. Tries the previously learned ``add_selector`` first, then each
+    of the recipe's add-button selectors. Returns the selector that was
+    clicked and whether the cart badge confirmed the add (None when the page
+    shows no badge). Extra units are added with the "+" nearest the add
+    button, never the first one on the page. Raises
+    ``RecipeStepError("direct")`` only before a click (wrong page, no add
+    button), so the caller's search fallback never adds the item twice.
+    """
+    try:
+        await goto(page, url, wait_until="domcontentloaded")
+    except Exception as e:
+        raise RecipeStepError("direct", str(e)[:200]) from e
+    await wait_for_dom_quiet(page, 1500)
+    if barcode and not await page_has_barcode(page, recipe, barcode):
+        raise RecipeStepError("direct", f"Product page does not show barcode {barcode}")
+
+    options = split_selector(recipe.add_button)
+    if add_selector:
+        options = [add_selector] + [o for o in options if o != add_selector]
+    for selector in options:
+        button = page.locator(selector).first
+        try:
+            await button.wait_for(state="visible", timeout=PRODUCT_PAGE_PROBE_MS)
+        except Exception:
+            continue
+        try:
+            await button.evaluate(_MARK_ADD_SCOPE_JS, PRODUCT_SCOPE_LEVELS)
+        except Exception:
+            pass  # no scope → a quantity above 1 fails at the "quantity" step
+        before = await read_text(page, recipe.cart_count)
+        verified = await _click_add(page, button, recipe, "direct")
+        if verified is False:
+            # The click landed; give a slow badge a second chance, but report
+            # an unverified add rather than fail into a search that re-adds it
+            late = await wait_for_text_change(
+                page, recipe.cart_count, before, CART_UPDATE_TIMEOUT_MS,
+            )
+            verified = late.met
+        if quantity > 1:
+            await _bump_quantity(await _add_scope(page, recipe), recipe, quantity)
+        return selector, verified
+    raise RecipeStepError("direct", "No add button on the product page")
+
+
+async def add_item(
+    page: Page,
+    recipe: StoreRecipe,
+    name: str,
+    quantity: int = 1,
+    barcode: Optional[str] = None,
+    manufacturer: Optional[str] = None,
+) -> dict:
+    """Search, pick, add and set quantity for one item. Raises RecipeStepError."""
+    card: Optional[Locator] = None
+    if barcode and recipe.search_by_barcode:
+        # Barcode search is the most precise; fall back to the name on any miss
+        try:
+            cards = await search(page, recipe, barcode)
+            card, matched, confidence, by_barcode = await _pick_card(
+                page, recipe, cards, name, barcode, manufacturer,
+            )
+        except RecipeStepError:
+            card = None
+    if card is None:
+        cards = await search(page, recipe, name)
+        card, matched, confidence, by_barcode = await _pick_card(
+            page, recipe, cards, name, barcode, manufacturer,
+        )
+
+    verified = await add_to_cart(card, recipe, quantity)
+    return {
+        "added": True,
+        "verified": verified,
+        "item": name,
+        "matched": matched,
+        "confidence": round(confidence, 2),
+        "quantity": quantity,
+        "barcode_match": by_barcode,
+        **await card_link(card),
+    }
+
+
+async def checkout(page: Page, recipe: StoreRecipe) -> dict:
+    """Open the cart, then click through to checkout. Raises RecipeStepError."""
+    try:
+        await page.locator(recipe.cart_link).first.click(timeout=STEP_TIMEOUT_MS)
+    except Exception as e:
+        raise RecipeStepError("cart", str(e)[:200]) from e
+    await settle(page)
+    cart_url = page.url
+    try:
+        await page.locator(recipe.checkout_button).first.click(timeout=STEP_TIMEOUT_MS)
+    except Exception as e:
+        raise RecipeStepError("checkout", str(e)[:200]) from e
+    await settle(page)
+    return {"cart_url": cart_url, "url": page.url}
@@ -0,0 +1,117 @@
+"""Adaptive screenshot encoding with a per-session "unchanged" cache.
+
+Screenshots are returned to the model as base64 text inside JSON, so every
+byte costs input tokens. This module re-encodes Playwright captures as WebP
+(optionally downscaled and grayscale) and keeps a fingerprint of the last
+image's exact pixels per region, so a capture of a page that has not changed
+can be answered with "unchanged" instead of another image. Only identical
+pixels count: a perceptual hash missed a cart badge going 2→3 and a price
+changing on a full viewport, and the model would trust a stale image.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import math
+from dataclasses import dataclass, field
+
+from PIL import Image
+
+# Average size of the previous always-full-viewport JPEG (quality 40) capture,
+# the baseline savings are measured against.
+LEGACY_SCREENSHOT_BYTES = 33_000
+# base64 text tokenizes at roughly this many characters per token
+CHARS_PER_TOKEN = 4
+
+WEBP_QUALITY = 40
+COMPACT_SCALE = 0.5
+
+
+def fingerprint(image: Image.Image) -> str:
+    """Digest of the image's size, mode and every pixel."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{image.mode}:{image.width}x{image.height}".encode("ascii"))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def estimate_tokens(n_bytes: int) -> int:
+    """Tokens used by ``n_bytes`` of image sent as base64 text."""
+    return math.ceil(4 * math.ceil(n_bytes / 3) / CHARS_PER_TOKEN)
+
+
+@dataclass
+class EncodedScreenshot:
+    data: bytes
+    mime: str
+    width: int
+    height: int
+    fingerprint: str
+
+
+def encode_screenshot(raw: bytes, compact: bool = False) -> EncodedScreenshot:
+    """Re-encode a captured JPEG/PNG as WebP; ``compact`` halves it and drops color."""
+    image = Image.open(io.BytesIO(raw))
+    image.load()
+    if compact:
+        image = image.convert("L")
+        width, height = image.size
+        image = image.resize(
+            (max(1, int(width * COMPACT_SCALE)), max(1, int(height * COMPACT_SCALE))),
+            Image.Resampling.LANCZOS,
+        )
+    elif image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    out = io.BytesIO()
+    image.save(out, format="WEBP", quality=WEBP_QUALITY, method=4)
+    return EncodedScreenshot(
+        data=out.getvalue(),
+        mime="image/webp",
+        width=image.width,
+        height=image.height,
+        fingerprint=fingerprint(image),
+    )
+
+
+@dataclass
+class ScreenshotCache:
+    """Last image fingerprint per region plus running savings for one session."""
+
+    last_fingerprint: dict[str, str] = field(default_factory=dict)
+    last_size: dict[str, int] = field(default_factory=dict)
+    sent: int = 0
+    unchanged: int = 0
+    bytes_sent: int = 0
+    bytes_saved: int = 0
+
+    def is_unchanged(self, region: str, image_fingerprint: str) -> bool:
+        return self.last_fingerprint.get(region) == image_fingerprint
+
+    def record_unchanged(self, region: str) -> int:
+        """Count a skipped image; returns the bytes it would have cost."""
+        saved = self.last_size.get(region, LEGACY_SCREENSHOT_BYTES)
+        self.unchanged += 1
+        self.bytes_saved += saved
+        return saved
+
+    def record_sent(self, region: str, shot: EncodedScreenshot) -> int:
+        """Count a sent image; returns the bytes saved versus the legacy capture."""
+        size = len(shot.data)
+        saved = max(0, LEGACY_SCREENSHOT_BYTES - size)
+        self.last_fingerprint[region] = shot.fingerprint
+        self.last_size[region] = size
+        self.sent += 1
+        self.bytes_sent += size
+        self.bytes_saved += saved
+        return saved
+
+    def as_dict(self) -> dict:
+        return {
+            "sent": self.sent,
+            "unchanged": self.unchanged,
+            "bytes_sent": self.bytes_sent,
+            "bytes_saved": self.bytes_saved,
+            "tokens_saved": estimate_tokens(self.bytes_saved),
+        }
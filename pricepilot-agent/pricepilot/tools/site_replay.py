@@ -0,0 +1,364 @@
+"""Record store traffic to HAR files and replay it offline.
+
+``SITE_REPLAY_MODE=record`` saves every response a pooled browser context
+receives (HTML, XHR, scripts, styles, images) into one HAR file per host
+under ``SITE_REPLAY_DIR``; files are rewritten when a context is released.
+``SITE_REPLAY_MODE=replay`` loads those files and serves them from a local
+HTTP server; every request of a pooled context is routed to it through
+Playwright's request interception, so the tools and store recipes run
+deterministically without touching the real sites. A request with no
+recorded response gets a 404 if it is a page and is aborted otherwise.
+
+Entries match on method and URL; a URL whose query string was never
+recorded falls back to the last response recorded for the same path, so a
+search page recorded for one query serves any query. The replay route is
+registered before the network filter's, so requests the filter blocks are
+still blocked (and counted) first.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import quote, unquote, urlsplit
+
+from pricepilot import __version__
+from pricepilot.config import SITE_REPLAY_DIR, SITE_REPLAY_MODE
+
+# Headers that describe the original transfer, not the stored body
+_DROP_HEADERS = {
+    "content-encoding", "content-length", "transfer-encoding", "connection",
+    "keep-alive", "set-cookie", "strict-transport-security", "alt-svc",
+}
+_TEXT_TYPES = ("text/", "application/json", "application/javascript", "image/svg+xml")
+# Marks a response the replay server made up because nothing was recorded
+_MISS_HEADER = "x-pricepilot-replay-miss"
+
+
+@dataclass
+class ArchivedResponse:
+    """One recorded response."""
+
+    method: str
+    url: str
+    status: int
+    headers: dict[str, str] = field(default_factory=dict)
+    body: bytes = b""
+
+    @property
+    def mime_type(self) -> str:
+        return self.headers.get("content-type", "application/octet-stream")
+
+    def har_entry(self) -> dict:
+        content: dict = {"size": len(self.body), "mimeType": self.mime_type}
+        if self.mime_type.startswith(_TEXT_TYPES):
+            try:
+                content["text"] = self.body.decode("utf-8")
+            except UnicodeDecodeError:
+                pass
+        if "text" not in content:
+            content["text"] = base64.b64encode(self.body).decode("ascii")
+            content["encoding"] = "base64"
+        return {
+            "startedDateTime": datetime.now(timezone.utc).isoformat(),
+            "time": 0,
+            "request": {
+                "method": self.method, "url": self.url, "httpVersion": "HTTP/1.1",
+                "headers": [], "queryString": [], "cookies": [],
+                "headersSize": -1, "bodySize": -1,
+            },
+            "response": {
+                "status": self.status, "statusText": "", "httpVersion": "HTTP/1.1",
+                "headers": [{"name": k, "value": v} for k, v in self.headers.items()],
+                "cookies": [], "content": content,
+                "redirectURL": self.headers.get("location", ""),
+                "headersSize": -1, "bodySize": len(self.body),
+            },
+            "cache": {},
+            "timings": {"send": 0, "wait": 0, "receive": 0},
+        }
+
+    @classmethod
+    def from_har_entry(cls, entry: dict) -> "ArchivedResponse":
+        request, response = entry["request"], entry["response"]
+        content = response.get("content", {})
+        text = content.get("text", "")
+        if content.get("encoding") == "base64":
+            body = base64.b64decode(text)
+        else:
+            body = text.encode("utf-8")
+        headers = {h["name"].lower(): h["value"] for h in response.get("headers", [])}
+        if "content-type" not in headers and content.get("mimeType"):
+            headers["content-type"] = content["mimeType"]
+        return cls(request["method"], request["url"], response["status"], headers, body)
+
+
+def _path_key(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}{parts.path}"
+
+
+def write_har_files(files: dict[str, dict]) -> None:
+    """Write HAR documents, each through a temporary file (blocking I/O)."""
+    for path, har in files.items():
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(har, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+
+
+class SiteArchive:
+    """Recorded responses, stored as one HAR file per host."""
+
+    def __init__(self, root: str = SITE_REPLAY_DIR) -> None:
+        self.root = root
+        self._entries: dict[tuple[str, str], ArchivedResponse] = {}
+        self._by_path: dict[tuple[str, str], ArchivedResponse] = {}
+        self._dirty: set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, response: ArchivedResponse) -> None:
+        method = response.method.upper()
+        self._entries[(method, response.url)] = response
+        self._by_path[(method, _path_key(response.url))] = response
+        self._dirty.add(urlsplit(response.url).hostname or "")
+
+    def lookup(self, method: str, url: str) -> Optional[ArchivedResponse]:
+        """The response recorded for ``url``, else the last one for its path."""
+        method = method.upper()
+        return self._entries.get((method, url)) or self._by_path.get((method, _path_key(url)))
+
+    def hosts(self) -> list[str]:
+        return sorted({urlsplit(url).hostname or "" for _, url in self._entries})
+
+    def _path(self, host: str) -> str:
+        return os.path.join(self.root, f"{host or 'unknown'}.har")
+
+    def take_pending(self) -> dict[str, dict]:
+        """HAR document per file path for every host with new entries.
+
+        Built on the caller's thread, so recording can go on while
+        ``write_har_files`` writes the result elsewhere.
+        """
+        dirty, self._dirty = self._dirty, set()
+        files = {}
+        for host in dirty:
+            entries = [e.har_entry() for e in self._entries.values()
+                       if (urlsplit(e.url).hostname or "") == host]
+            files[self._path(host)] = {"log": {
+                "version": "1.2",
+                "creator": {"name": "pricepilot", "version": __version__},
+                "entries": entries,
+            }}
+        return files
+
+    def save(self) -> int:
+        """Rewrite the HAR file of every host with new entries. Returns files written."""
+        files = self.take_pending()
+        write_har_files(files)
+        return len(files)
+
+    @classmethod
+    def load(cls, root: str = SITE_REPLAY_DIR) -> "SiteArchive":
+        """Read every ``*.har`` file under ``root`` (missing directory → empty)."""
+        archive = cls(root)
+        if not os.path.isdir(root):
+            return archive
+        for name in sorted(os.listdir(root)):
+            if not name.endswith(".har"):
+                continue
+            with open(os.path.join(root, name), encoding="utf-8") as f:
+                har = json.load(f)
+            for entry in har.get("log", {}).get("entries", []):
+                archive.add(ArchivedResponse.from_har_entry(entry))
+        archive._dirty.clear()
+        return archive
+
+
+class SiteRecorder:
+    """Adds every response a browser context receives to an archive."""
+
+    def __init__(self, archive: SiteArchive) -> None:
+        self.archive = archive
+
+    async def on_response(self, response) -> None:
+        request = response.request
+        if not request.url.startswith(("http://", "https://")):
+            return
+        status = response.status
+        body = b""
+        if not 300 <= status < 400:
+            try:
+                body = await response.body()
+            except Exception:
+                return  # Body gone (page navigated away, aborted request)
+        headers = {k.lower(): v for k, v in response.headers.items()
+                   if k.lower() not in _DROP_HEADERS}
+        self.archive.add(ArchivedResponse(request.method, request.url, status, headers, body))
+
+    async def attach(self, context) -> None:
+        context.on("response", self.on_response)
+
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+    server: "_ArchiveHTTPServer"
+
+    def _serve(self) -> None:
+        # Paths are /<scheme>/<host>/<original path and query>
+        scheme, _, rest = self.path.lstrip("/").partition("/")
+        url = f"{scheme}://{unquote(rest)}" if rest else ""
+        entry = self.server.archive.lookup(self.command, url) if url else None
+        if entry is None:
+            self.send_response(404)
+            self.send_header("content-type", "text/plain; charset=utf-8")
+            self.send_header(_MISS_HEADER, "1")
+            body = f"Not recorded: {self.command} {url}".encode("utf-8")
+        else:
+            self.send_response(entry.status)
+            for name, value in entry.headers.items():
+                self.send_header(name, value)
+            body = entry.body
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_HEAD = do_OPTIONS = _serve
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+class _ArchiveHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    archive: SiteArchive
+
+
+class ReplayServer:
+    """Serves a ``SiteArchive`` over HTTP on localhost, from a background thread."""
+
+    def __init__(self, archive: SiteArchive) -> None:
+        self.archive = archive
+        self._server: Optional[_ArchiveHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        if self._server is None:
+            raise RuntimeError("Replay server is not running")
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> None:
+        if self._server is not None:
+            return
+        self._server = _ArchiveHTTPServer(("127.0.0.1", 0), _ReplayHandler)
+        self._server.archive = self.archive
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="site-replay", daemon=True,
+        )
+        self._thread.start()
+
+    def url_for(self, url: str) -> str:
+        """Where the replay server serves the recording of ``url``."""
+        parts = urlsplit(url)
+        rest = quote(url.split("://", 1)[1], safe="")
+        return f"{self.base_url}/{parts.scheme}/{rest}"
+
+    async def handle(self, route) -> None:
+        """Playwright route handler: answer from the recording, never the network."""
+        request = route.request
+        if not request.url.startswith(("http://", "https://")):
+            await route.fallback()
+            return
+        try:
+            response = await route.fetch(url=self.url_for(request.url), max_redirects=0)
+        except Exception:
+            await route.abort("failed")
+            return
+        if _MISS_HEADER in response.headers and request.resource_type != "document":
+            await route.abort("failed")
+            return
+        await route.fulfill(response=response)
+
+    def close(self) -> None:
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        self._thread = None
+
+
+class SiteReplay:
+    """The configured mode: off, record into, or replay from ``root``."""
+
+    def __init__(self, mode: str = SITE_REPLAY_MODE, root: str = SITE_REPLAY_DIR) -> None:
+        self._archive: Optional[SiteArchive] = None
+        self._recorder: Optional[SiteRecorder] = None
+        self._server: Optional[ReplayServer] = None
+        # One flush at a time, so an older snapshot never overwrites a newer one
+        self._flush_lock = asyncio.Lock()
+        self.mode = ""
+        self.configure(mode, root)
+
+    def configure(self, mode: str, root: str) -> None:
+        """Switch mode or directory (for contexts created from now on)."""
+        if mode not in ("", "off", "record", "replay"):
+            raise ValueError(f"Unknown SITE_REPLAY_MODE: {mode!r}")
+        self.close()
+        self.mode = "" if mode == "off" else mode
+        self.root = root
+        self._archive = None
+        self._recorder = None
+
+    @property
+    def archive(self) -> SiteArchive:
+        if self._archive is None:
+            self._archive = SiteArchive.load(self.root)
+        return self._archive
+
+    async def attach(self, context) -> None:
+        """Record or replay ``context``'s traffic (no-op when off)."""
+        if self.mode == "record":
+            if self._recorder is None:
+                self._recorder = SiteRecorder(self.archive)
+            await self._recorder.attach(context)
+        elif self.mode == "replay":
+            if self._server is None:
+                self._server = ReplayServer(self.archive)
+                self._server.start()
+            await context.route("**/*", self._server.handle)
+
+    async def flush(self) -> None:
+        """Write what was recorded so far (called when a context is released).
+
+        The files are written in a worker thread, off the event loop.
+        """
+        if self.mode != "record" or self._archive is None:
+            return
+        async with self._flush_lock:
+            files = self._archive.take_pending()
+            if files:
+                await asyncio.to_thread(write_har_files, files)
+
+    def close(self) -> None:
+        if self.mode == "record" and self._archive is not None:
+            self._archive.save()
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+
+
+# Process-wide instance used by the browser pool
+site_replay = SiteReplay()
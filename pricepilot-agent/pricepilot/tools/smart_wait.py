@@ -0,0 +1,152 @@
+"""Event-driven waits that replace fixed sleeps in the browser tools.
+
+Each wait returns as soon as its condition holds and gives up after a max
+timeout, so fast pages don't pay for a fixed sleep and slow SPA pages are
+not read before they have rendered. Waits never raise: they return whether
+the condition was met and how long they took.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from playwright.async_api import Page
+
+# Supported ``until=`` conditions for the wait_for tool
+CONDITIONS = ("networkidle", "selector", "dom_quiet", "cart_change")
+
+# A page counts as settled after this long without DOM mutations
+DOM_QUIET_MS = 250
+
+# Resolves true once the DOM has had no mutations for ``quietMs``, or false
+# when ``timeoutMs`` passes first.
+_DOM_QUIET_JS = """([quietMs, timeoutMs]) => new Promise(resolve => {
+    let timer, hard;
+    const obs = new MutationObserver(() => {
+        clearTimeout(timer);
+        timer = setTimeout(() => done(true), quietMs);
+    });
+    const done = (quiet) => {
+        obs.disconnect();
+        clearTimeout(timer);
+        clearTimeout(hard);
+        resolve(quiet);
+    };
+    obs.observe(document, {
+        subtree: true, childList: true, attributes: true, characterData: true,
+    });
+    timer = setTimeout(() => done(true), quietMs);
+    hard = setTimeout(() => done(false), timeoutMs);
+})"""
+
+_READ_TEXT_JS = """(sel) => {
+    const el = document.querySelector(sel);
+    return el ? (el.textContent || '').trim() : null;
+}"""
+
+_TEXT_CHANGED_JS = """([sel, before]) => {
+    const el = document.querySelector(sel);
+    return !!el && (el.textContent || '').trim() !== before;
+}"""
+
+
+@dataclass
+class WaitResult:
+    condition: str
+    met: bool
+    elapsed_ms: int
+
+    def as_dict(self) -> dict:
+        return {"until": self.condition, "met": self.met, "waited_ms": self.elapsed_ms}
+
+
+def _elapsed_ms(start: float) -> int:
+    return int((time.monotonic() - start) * 1000)
+
+
+async def wait_for_network_idle(page: Page, timeout_ms: int) -> WaitResult:
+    """Wait until there are no network connections for 500 ms."""
+    start = time.monotonic()
+    try:
+        await page.wait_for_load_state("networkidle", timeout=timeout_ms)
+        met = True
+    except Exception:
+        met = False  # Polling / websockets keep some stores from ever going idle
+    return WaitResult("networkidle", met, _elapsed_ms(start))
+
+
+async def wait_for_selector(page: Page, selector: str, timeout_ms: int) -> WaitResult:
+    """Wait until an element matching ``selector`` is visible."""
+    start = time.monotonic()
+    try:
+        await page.locator(selector).first.wait_for(state="visible", timeout=timeout_ms)
+        met = True
+    except Exception:
+        met = False
+    return WaitResult("selector", met, _elapsed_ms(start))
+
+
+async def wait_for_dom_quiet(
+    page: Page, timeout_ms: int, quiet_ms: int = DOM_QUIET_MS,
+) -> WaitResult:
+    """Wait until the DOM has stopped changing for ``quiet_ms``."""
+    start = time.monotonic()
+    try:
+        met = bool(await page.evaluate(_DOM_QUIET_JS, [quiet_ms, timeout_ms]))
+    except Exception:
+        # The page navigated mid-wait; settle on the new document instead
+        try:
+            remaining = max(0, timeout_ms - _elapsed_ms(start))
+            await page.wait_for_load_state("domcontentloaded", timeout=remaining)
+        except Exception:
+            pass
+        met = False
+    return WaitResult("dom_quiet", met, _elapsed_ms(start))
+
+
+async def read_text(page: Page, selector: Optional[str]) -> Optional[str]:
+    """Current trimmed text of the first element matching ``selector``.
+
+    None when there is no selector or no element matches it, so callers can
+    tell a missing badge from an empty one.
+    """
+    if not selector:
+        return None
+    try:
+        return await page.evaluate(_READ_TEXT_JS, selector)
+    except Exception:
+        return None
+
+
+async def wait_for_text_change(
+    page: Page, selector: str, before: Optional[str], timeout_ms: int,
+) -> WaitResult:
+    """Wait until the text of ``selector`` differs from ``before``."""
+    start = time.monotonic()
+    try:
+        await page.wait_for_function(
+            _TEXT_CHANGED_JS, arg=[selector, before or ""], timeout=timeout_ms,
+        )
+        met = True
+    except Exception:
+        met = False
+    return WaitResult("cart_change", met, _elapsed_ms(start))
+
+
+async def settle(page: Page, timeout_ms: int = 2000) -> WaitResult:
+    """Wait for the current document to load and its DOM to go quiet.
+
+    Used after clicks and scrolls: returns almost immediately on static pages
+    and waits for SPA re-renders to finish otherwise.
+    """
+    start = time.monotonic()
+    try:
+        await page.wait_for_load_state("domcontentloaded", timeout=timeout_ms)
+    except Exception:
+        pass
+    remaining = max(0, timeout_ms - _elapsed_ms(start))
+    result = await wait_for_dom_quiet(page, remaining)
+    result.elapsed_ms = _elapsed_ms(start)
+    return result
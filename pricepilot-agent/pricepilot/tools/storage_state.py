@@ -0,0 +1,148 @@
+"""On-disk cache of Playwright storage state per (store, city).
+
+After the agent finishes Phase 1 (cookie banner dismissed, delivery city
+set) it snapshots the context's cookies and localStorage. Later sessions for
+the same store and city are seeded from that snapshot before their first
+navigation, so they land on an already-configured store page and can skip
+Phase 1. Snapshots expire after ``STORAGE_STATE_TTL`` seconds.
+
+Snapshots are shared by every user of a store and city, so only cookies and
+localStorage keys that look like consent or delivery-location settings are
+kept (``setup_only``); anything that names a session, login, user or cart is
+dropped even if it also matches, so one user's cart or login never reaches
+another user's context.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Optional
+
+from pricepilot.config import STORAGE_STATE_DIR, STORAGE_STATE_TTL
+
+# Sets each saved localStorage item on matching origins, without clobbering
+# values the page has already written itself.
+_LOCAL_STORAGE_SCRIPT = """(origins) => {
+    const entry = origins.find(o => o.origin === location.origin);
+    if (!entry) return;
+    try {
+        for (const {name, value} of entry.localStorage) {
+            if (window.localStorage.getItem(name) === null) {
+                window.localStorage.setItem(name, value);
+            }
+        }
+    } catch (e) {}
+}"""
+
+
+# Names kept in a shared snapshot: cookie consent and delivery location
+_SETUP_NAME = re.compile(
+    r"consent|cookie|gdpr|accept|agree|popup|modal|banner|dismiss|seen|"
+    r"city|address|deliver|shipping|location|area|region|zone|zip|branch|lang|locale",
+    re.IGNORECASE,
+)
+# Names never shared, even if they also match _SETUP_NAME
+_PRIVATE_NAME = re.compile(
+    r"sess|sid|auth|token|login|jwt|user|customer|member|account|cart|basket|"
+    r"order|checkout|csrf|xsrf|remember|secure",
+    re.IGNORECASE,
+)
+
+
+def _is_setup_name(name: str) -> bool:
+    return bool(_SETUP_NAME.search(name)) and not _PRIVATE_NAME.search(name)
+
+
+def setup_only(state: dict) -> dict:
+    """The consent/location subset of a Playwright storage state."""
+    cookies = [c for c in state.get("cookies") or [] if _is_setup_name(c.get("name", ""))]
+    origins = []
+    for origin in state.get("origins") or []:
+        items = [i for i in origin.get("localStorage") or [] if _is_setup_name(i.get("name", ""))]
+        if items:
+            origins.append({"origin": origin.get("origin"), "localStorage": items})
+    return {"cookies": cookies, "origins": origins}
+
+
+def _normalize_city(city: Optional[str]) -> str:
+    return " ".join((city or "").split()).lower()
+
+
+class StorageStateCache:
+    """JSON files keyed by a hash of (store host, city)."""
+
+    def __init__(self, directory: str = STORAGE_STATE_DIR, ttl: int = STORAGE_STATE_TTL) -> None:
+        self.directory = Path(directory)
+        self.ttl = ttl
+
+    def _path(self, store: str, city: Optional[str]) -> Path:
+        key = f"{store.lower()}|{_normalize_city(city)}"
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        return self.directory / f"{digest}.json"
+
+    def load(self, store: str, city: Optional[str]) -> Optional[dict]:
+        """Return the saved storage state, or None if missing or expired."""
+        path = self._path(store, city)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry.get("saved_at", 0) > self.ttl:
+            path.unlink(missing_ok=True)
+            return None
+        # Snapshots written before the allowlist may still hold private names
+        return setup_only(entry.get("state") or {})
+
+    def save(self, store: str, city: Optional[str], state: dict) -> Path:
+        """Write the setup part of a snapshot atomically and return its path."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(store, city)
+        entry = {"saved_at": time.time(), "store": store, "city": city,
+                 "state": setup_only(state)}
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+        return path
+
+    def invalidate(self, store: str, city: Optional[str]) -> None:
+        self._path(store, city).unlink(missing_ok=True)
+
+    def purge_expired(self) -> int:
+        """Delete expired snapshots. Returns how many were removed."""
+        removed = 0
+        if not self.directory.is_dir():
+            return removed
+        now = time.time()
+        for path in self.directory.glob("*.json"):
+            try:
+                saved_at = json.loads(path.read_text(encoding="utf-8")).get("saved_at", 0)
+            except (OSError, ValueError):
+                saved_at = 0
+            if now - saved_at > self.ttl:
+                path.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+
+async def apply_storage_state(context, state: dict) -> None:
+    """Seed an existing BrowserContext with saved cookies and localStorage.
+
+    Pooled contexts are created before the store is known, so the state is
+    applied after creation instead of via ``new_context(storage_state=...)``.
+    """
+    cookies = state.get("cookies") or []
+    if cookies:
+        await context.add_cookies(cookies)
+    origins = state.get("origins") or []
+    if origins:
+        await context.add_init_script(
+            f"({_LOCAL_STORAGE_SCRIPT})({json.dumps(origins, ensure_ascii=False)})"
+        )
+
+
+storage_state_cache = StorageStateCache()
@@ -0,0 +1,26 @@
+"""Reading the JSON results the browser tools return to the model.
+
+Shared by the progress events, history compaction and the benchmark's
+scripted model, which all look at the same add-tool results.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+# Tools whose success adds one item, and the one that adds several
+ADD_TOOLS = {"add_item_by_recipe", "add_candidate"}
+BATCH_ADD_TOOL = "add_items_parallel"
+
+
+def tool_payload(response: Any) -> dict:
+    """A tool result as a dict (ADK wraps string results as ``{"result": ...}``)."""
+    if isinstance(response, dict) and isinstance(response.get("result"), str):
+        response = response["result"]
+    if isinstance(response, str):
+        try:
+            response = json.loads(response)
+        except ValueError:
+            return {}
+    return response if isinstance(response, dict) else {}
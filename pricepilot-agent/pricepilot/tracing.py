@@ -0,0 +1,174 @@
+"""OpenTelemetry spans for sessions, agent turns, tool calls and navigations.
+
+One trace per cart: a ``session`` span opens when the API creates the
+session and ends when it is deleted or expires. Each agent run is an
+``agent_turn`` child of it, and ADK's own spans (``invoke_agent``,
+``call_llm``, ``execute_tool``) nest inside the turn. Every tool call adds a
+``tool <name>`` span carrying its arguments and result size, and page loads
+add ``navigate`` spans, so a flame view of the trace shows which phase of a
+run took the time. Spans carry ``pricepilot.session_id`` and
+``pricepilot.store``; per-item spans of ``add_items_parallel`` and the tool
+spans of the single-item search and add tools carry ``pricepilot.item`` and
+``pricepilot.item_index``.
+
+Spans go nowhere until ``setup_tracing()`` installs an exporter
+(``TRACE_EXPORTER``): ``console`` prints them, ``file`` appends one JSON span
+per line to ``TRACE_FILE``. An SDK tracer provider set up elsewhere (e.g.
+ADK's OTLP exporters) is reused rather than replaced.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional, Sequence
+
+from opentelemetry import context as otel_context
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    ConsoleSpanExporter,
+    SpanExporter,
+    SpanExportResult,
+)
+
+from pricepilot import __version__
+from pricepilot.config import TRACE_EXPORTER, TRACE_FILE
+from pricepilot.tools.network_filter import store_host
+
+# Longest tool-argument JSON recorded on a span
+MAX_ARGS_CHARS = 1000
+
+tracer = trace.get_tracer("pricepilot")
+
+
+def _provider() -> TracerProvider:
+    """The global SDK tracer provider, installing one if none is set yet."""
+    provider = trace.get_tracer_provider()
+    if not isinstance(provider, TracerProvider):
+        provider = TracerProvider(resource=Resource.create({
+            "service.name": "pricepilot", "service.version": __version__,
+        }))
+        trace.set_tracer_provider(provider)
+    return provider
+
+
+class JsonLinesExporter(SpanExporter):
+    """Append one JSON span per line to ``path``.
+
+    The file is opened per exported batch, so no handle outlives an export.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        try:
+            with open(self.path, "a", encoding="utf-8") as out:
+                out.writelines(span.to_json(indent=None) + "\n" for span in spans)
+        except OSError:
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+
+def setup_tracing(exporter: str = TRACE_EXPORTER, path: str = TRACE_FILE) -> bool:
+    """Export spans to the console or a JSON-lines file. Returns False when off."""
+    if exporter in ("", "none"):
+        return False
+    if exporter == "console":
+        span_exporter = ConsoleSpanExporter()
+    elif exporter == "file":
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        span_exporter = JsonLinesExporter(path)
+    else:
+        raise ValueError(f"Unknown TRACE_EXPORTER: {exporter!r}")
+    _provider().add_span_processor(BatchSpanProcessor(span_exporter))
+    return True
+
+
+def flush_tracing() -> None:
+    """Export spans still buffered (called on shutdown)."""
+    provider = trace.get_tracer_provider()
+    if isinstance(provider, TracerProvider):
+        provider.force_flush()
+
+
+class SessionSpans:
+    """The open ``session`` span per session id, parent of its turns."""
+
+    def __init__(self) -> None:
+        self._spans: dict[str, trace.Span] = {}
+
+    def start(self, session_id: str, store_url: str, items: int) -> None:
+        # A fresh root, not a child of whatever request created the session
+        self._spans[session_id] = tracer.start_span(
+            "session",
+            context=otel_context.Context(),
+            attributes={
+                "pricepilot.session_id": session_id,
+                "pricepilot.store": store_host(store_url),
+                "pricepilot.items": items,
+            },
+        )
+
+    def context(self, session_id: str) -> Optional[otel_context.Context]:
+        """Context to start the session's child spans in (None if not traced)."""
+        span = self._spans.get(session_id)
+        return trace.set_span_in_context(span) if span is not None else None
+
+    def end(self, session_id: str) -> None:
+        span = self._spans.pop(session_id, None)
+        if span is not None:
+            span.end()
+
+    def close(self) -> None:
+        for session_id in list(self._spans):
+            self.end(session_id)
+
+
+session_spans = SessionSpans()
+
+
+@contextmanager
+def tool_span(
+    tool: str,
+    session_id: str,
+    store: str,
+    args: dict[str, Any],
+    item: Optional[str] = None,
+    item_index: Optional[int] = None,
+) -> Iterator[trace.Span]:
+    """Span around one tool call; the caller adds the result's size and outcome.
+
+    ``item`` and ``item_index`` name the list item the call works on, when
+    there is one.
+    """
+    try:
+        arguments = json.dumps(args, ensure_ascii=False, default=str)[:MAX_ARGS_CHARS]
+    except (TypeError, ValueError):
+        arguments = ""
+    attributes = {
+        "pricepilot.session_id": session_id,
+        "pricepilot.store": store,
+        "pricepilot.tool": tool,
+        "pricepilot.tool.args": arguments,
+    }
+    if item is not None:
+        attributes["pricepilot.item"] = item
+    if item_index is not None:
+        attributes["pricepilot.item_index"] = item_index
+    with tracer.start_as_current_span(f"tool {tool}", attributes=attributes) as span:
+        yield span
+
+
+async def goto(page, url: str, **kwargs):
+    """``page.goto`` inside a ``navigate`` span."""
+    attributes = {"url.full": url, "pricepilot.store": store_host(url)}
+    with tracer.start_as_current_span("navigate", attributes=attributes) as span:
+        response = await page.goto(url, **kwargs)
+        if response is not None:
+            span.set_attribute("http.response.status_code", response.status)
+        return response
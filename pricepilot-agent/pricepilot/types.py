@@ -36,6 +36,22 @@ class BuildCartRequest(BaseModel):
     items: list[CartItem]
 
 
+class StoreCart(BaseModel):
+    """One store and the items to add there, within a batch request."""
+
+    store_name: str
+    store_url: Optional[str] = None  # Override for unlisted stores
+    items: list[CartItem]
+
+
+class BatchBuildCartRequest(BaseModel):
+    """Request to build carts at several stores concurrently."""
+
+    user_id: str
+    city: Optional[str] = None
+    stores: list[StoreCart] = Field(min_length=1, max_length=5)
+
+
 class MessageRequest(BaseModel):
     """User reply during an active session (disambiguation, OTP, etc.)."""
 
@@ -58,17 +74,30 @@ class ChatMessageOut(BaseModel):
 
 
 class SessionCreatedResponse(BaseModel):
-    """Response when a new cart-building session is created."""
+    """Response when a new cart-building session is created.
+
+    Since API 0.3 ``messages`` is empty unless the request passed
+    ``?wait=true``; the agent's messages appear in ``GET /sessions/{id}``.
+    """
 
     session_id: str
     messages: list[ChatMessageOut] = Field(default_factory=list)
+    status: str = "queued"  # queued | running, or the session status with ?wait=true
+    queue_position: Optional[int] = None  # 1-based, while waiting for a run slot
+    eta_seconds: Optional[int] = None  # estimated wait before the run starts
 
 
 class MessageResponse(BaseModel):
-    """Response to a user message within a session."""
+    """Response to a user message within a session.
+
+    Since API 0.3 ``messages`` is empty unless the request passed
+    ``?wait=true``.
+    """
 
     messages: list[ChatMessageOut] = Field(default_factory=list)
-    status: Optional[str] = None  # in_progress | checkout_ready | error
+    status: Optional[str] = None  # queued | running | in_progress | checkout_ready | error
+    queue_position: Optional[int] = None
+    eta_seconds: Optional[int] = None
 
 
 class SessionStatusResponse(BaseModel):
@@ -77,6 +106,33 @@ class SessionStatusResponse(BaseModel):
     session_id: str
     status: str  # in_progress | checkout_ready | completed | error
     messages: list[ChatMessageOut] = Field(default_factory=list)
+    cursor: int = 0  # pass as ?since= to get only newer messages
     checkout_url: Optional[str] = None
     items_added: int = 0
     items_failed: list[str] = Field(default_factory=list)
+    network: Optional[dict] = None  # requests blocked / bytes saved by the network filter
+    screenshots: Optional[dict] = None  # images sent / skipped as unchanged, bytes saved
+    job: Optional[dict] = None  # latest agent run: state, error, timestamps
+    usage: Optional[dict] = None  # tool calls, tool seconds and LLM tokens vs. budget
+    metrics: Optional[dict] = None  # per-tool latency/payload, LLM latency/tokens, run times
+
+
+class StoreSessionStatus(BaseModel):
+    """Status of one store's sub-session within a batch."""
+
+    store_name: str
+    session_id: str
+    status: str  # in_progress | checkout_ready | completed | error
+    checkout_url: Optional[str] = None
+    items_added: int = 0
+    items_failed: list[str] = Field(default_factory=list)
+    messages: list[ChatMessageOut] = Field(default_factory=list)
+    job: Optional[dict] = None  # latest agent run: state, error, timestamps
+
+
+class BatchStatusResponse(BaseModel):
+    """Combined status of a multi-store batch."""
+
+    batch_id: str
+    status: str  # in_progress | checkout_ready | completed | partial | error
+    stores: list[StoreSessionStatus] = Field(default_factory=list)
@@ -0,0 +1,96 @@
+"""Tests for admission control: capacity sizing, fair queueing and 429s."""
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from pricepilot.api import admission, server
+from pricepilot.api.admission import FairQueue, QueueFull, detect_capacity
+from pricepilot.api.jobs import JobManager
+
+GiB = 1024 ** 3
+
+
+def test_capacity_follows_memory_and_cpus(monkeypatch):
+    # The 2 GiB / 2 vCPU Vertex instance: memory allows 6, CPUs allow 6
+    monkeypatch.setattr(admission, "available_memory", lambda: 2 * GiB)
+    monkeypatch.setattr(admission, "available_cpus", lambda: 2.0)
+    assert detect_capacity(ceiling=16) == 6
+    assert detect_capacity(ceiling=4) == 4
+
+    monkeypatch.setattr(admission, "available_cpus", lambda: 0.5)
+    assert detect_capacity(ceiling=16) == 1
+    monkeypatch.setattr(admission, "available_memory", lambda: 256 * 1024 ** 2)
+    assert detect_capacity(ceiling=16) == 1  # Never below one run
+
+
+def test_fair_queue_round_robin_and_bound():
+    queue = FairQueue(maxsize=5)
+    for item in ("a1", "a2", "a3"):
+        queue.put("alice", item)
+    queue.put("bob", "b1")
+    queue.put("carol", "c1")
+    with pytest.raises(QueueFull):
+        queue.put("bob", "b2")
+
+    assert queue.order() == ["a1", "b1", "c1", "a2", "a3"]
+    assert queue.position("c1") == 3
+    assert queue.remove("b1") and queue.position("c1") == 2
+    assert [queue.pop() for _ in range(4)] == ["a1", "c1", "a2", "a3"]
+    assert queue.pop() is None and len(queue) == 0
+
+    fifo = FairQueue(maxsize=0, fair=False)
+    for key, item in (("alice", "a1"), ("alice", "a2"), ("bob", "b1")):
+        fifo.put(key, item)
+    assert fifo.order() == ["a1", "a2", "b1"]
+
+
+@pytest.mark.asyncio
+async def test_queued_jobs_report_position_and_eta():
+    release = asyncio.Event()
+
+    async def run(job):
+        await release.wait()
+
+    manager = JobManager(run, concurrency=1, queue_size=2)
+    manager.avg_run_seconds = 30
+    running = manager.submit("s1", "alice", None)
+    await asyncio.sleep(0)
+    waiting = [manager.submit("s2", "alice", None), manager.submit("s3", "bob", None)]
+    with pytest.raises(QueueFull):
+        manager.submit("s4", "carol", None)
+    assert not manager.has_room()
+
+    assert "queue_position" not in manager.describe(running)
+    info = manager.describe(waiting[1])
+    assert (info["queue_position"], info["eta_seconds"]) == (2, 60)
+    assert manager.retry_after() == 30
+
+    release.set()
+    while any(job.active for job in waiting):
+        await asyncio.sleep(0.01)
+    await manager.close()
+
+
+def test_full_queue_answers_429_with_retry_after(monkeypatch):
+    async def fake_run_async(user_id, session_id, new_message, **kwargs):
+        await asyncio.sleep(0.5)
+        return
+        yield
+
+    monkeypatch.setattr(server.runner, "run_async", fake_run_async)
+    monkeypatch.setattr(server, "job_manager",
+                        JobManager(server._run_job, concurrency=1, queue_size=1))
+    body = {"user_id": "u1", "store_name": "שופרסל", "items": [{"name": "חלב"}]}
+    with TestClient(server.app) as client:
+        first = client.post("/sessions", json=body).json()
+        second = client.post("/sessions", json={**body, "user_id": "u2"}).json()
+        assert first["status"] in ("queued", "running")
+        assert (second["status"], second["queue_position"]) == ("queued", 1)
+
+        rejected = client.post("/sessions", json={**body, "user_id": "u3"})
+        assert rejected.status_code == 429
+        assert int(rejected.headers["Retry-After"]) >= 1
+        batch = {"user_id": "u3", "stores": [{"store_name": "שופרסל", "items": []}]}
+        assert client.post("/sessions/batch", json=batch).status_code == 429
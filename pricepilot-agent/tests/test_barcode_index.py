@@ -0,0 +1,50 @@
+"""Tests for the (store, barcode) → product page index."""
+
+import time
+
+from pricepilot.tools.barcode_index import BarcodeIndex, normalize_barcode
+
+
+def test_record_and_lookup(tmp_path):
+    index = BarcodeIndex(str(tmp_path / "index.sqlite3"), ttl=3600)
+    assert index.lookup("shufersal.co.il", "7290000066318") is None
+
+    assert index.record(
+        "Shufersal.co.il", "7290000066318",
+        product_url="https://www.shufersal.co.il/online/he/p/P_7290000066318",
+        name="חלב תנובה 3%",
+    )
+    entry = index.lookup("shufersal.co.il", " 7290000066318 ")
+    assert entry.product_url.endswith("P_7290000066318")
+    assert entry.add_selector is None
+
+    # A later add that only knows the id keeps the learned URL
+    index.record("shufersal.co.il", "7290000066318", product_id="P_7290000066318")
+    index.record_hit("shufersal.co.il", "7290000066318", 'button:has-text("הוספה לסל")')
+    entry = index.lookup("shufersal.co.il", "7290000066318")
+    assert entry.product_url.endswith("P_7290000066318")
+    assert entry.product_id == "P_7290000066318"
+    assert entry.add_selector == 'button:has-text("הוספה לסל")'
+    assert index.stats() == {"entries": 1, "direct_hits": 1}
+
+
+def test_record_needs_barcode_and_location(tmp_path):
+    index = BarcodeIndex(str(tmp_path / "index.sqlite3"))
+    assert not index.record("shufersal.co.il", None, product_url="https://x/p")
+    assert not index.record("shufersal.co.il", "7290000066318")
+    assert normalize_barcode("abc") is None
+
+
+def test_stale_entries_expire(tmp_path):
+    index = BarcodeIndex(str(tmp_path / "index.sqlite3"), ttl=60)
+    index.record("rami-levy.co.il", "7290011194246", product_url="https://x/p/1")
+    index.record("rami-levy.co.il", "7290000066318", product_url="https://x/p/2")
+    index._connect().execute(
+        "UPDATE products SET updated_at = ? WHERE barcode = ?",
+        (time.time() - 120, "7290011194246"),
+    )
+    assert index.lookup("rami-levy.co.il", "7290011194246") is None
+    assert index.purge_expired() == 0
+
+    index.invalidate("rami-levy.co.il", "7290000066318")
+    assert index.stats()["entries"] == 0
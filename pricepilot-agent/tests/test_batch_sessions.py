@@ -0,0 +1,84 @@
+"""Tests for the multi-store batch endpoints (agent runs stubbed out)."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from pricepilot.api import server
+
+BATCH = {
+    "user_id": "u1",
+    "city": "תל אביב",
+    "stores": [
+        {"store_name": "שופרסל", "items": [{"name": "חלב תנובה 3%"}]},
+        {"store_name": "רמי לוי", "items": [{"name": "חלב תנובה 3%"}, {"name": "ביצים L"}]},
+    ],
+}
+
+
+@pytest.fixture
+def release():
+    """Set to let the stubbed agent runs finish."""
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+@pytest.fixture
+def client(monkeypatch, release):
+    async def fake_run_async(user_id, session_id, new_message, **kwargs):
+        while not release.is_set():  # Stands in for a long agent run
+            await asyncio.sleep(0.01)
+        return
+        yield
+
+    monkeypatch.setattr(server.runner, "run_async", fake_run_async)
+    with TestClient(server.app) as client:
+        yield client
+
+
+def wait_for_stores(client, batch_id, condition, timeout=5.0):
+    """Poll the batch until ``condition(stores)`` holds; fail with the last state."""
+    deadline = time.monotonic() + timeout
+    while True:
+        status = client.get(f"/sessions/batch/{batch_id}", params={"user_id": "u1"})
+        assert status.status_code == 200
+        stores = status.json()["stores"]
+        if condition(stores):
+            return stores
+        if time.monotonic() > deadline:
+            pytest.fail(f"Batch did not reach the expected state: {[s['job'] for s in stores]}")
+        time.sleep(0.02)
+
+
+def test_batch_runs_stores_concurrently(client, release):
+    response = client.post("/sessions/batch", json=BATCH)
+    assert response.status_code == 200
+    body = response.json()
+    assert [s["store_name"] for s in body["stores"]] == ["שופרסל", "רמי לוי"]
+    assert len({s["session_id"] for s in body["stores"]}) == 2
+    # Returned while the runs are still blocked
+    assert body["status"] == "in_progress"
+
+    # Both runs start before either may finish, so they overlap
+    wait_for_stores(client, body["batch_id"],
+                    lambda stores: all(s["job"]["state"] == "running" for s in stores))
+    release.set()
+    stores = wait_for_stores(client, body["batch_id"],
+                             lambda stores: all(s["job"]["state"] == "done" for s in stores))
+    jobs = [s["job"] for s in stores]
+    assert max(j["started_at"] for j in jobs) < min(j["finished_at"] for j in jobs)
+    assert all(s["checkout_url"] is None for s in stores)
+    other_user = client.get(f"/sessions/batch/{body['batch_id']}", params={"user_id": "u2"})
+    assert other_user.status_code == 404
+
+    deleted = client.delete(f"/sessions/batch/{body['batch_id']}", params={"user_id": "u1"})
+    assert deleted.status_code == 200
+
+
+def test_batch_rejects_unknown_store(client):
+    bad = {**BATCH, "stores": [{"store_name": "no such store", "items": []}]}
+    assert client.post("/sessions/batch", json=bad).status_code == 400
@@ -0,0 +1,130 @@
+"""Tests for the scripted model and the benchmark runner."""
+
+import json
+
+import pytest
+from google.adk.models import LlmRequest
+from google.genai import types
+
+from benchmarks import run
+from benchmarks.fake_llm import ScriptedLlm, search_script
+from pricepilot.api import server
+from pricepilot.tools.site_replay import site_replay
+
+PAYLOAD = {"store_url": "https://www.shufersal.co.il/online",
+           "items": [{"name": "חלב", "quantity": 2}]}
+
+
+async def _next(llm, contents):
+    request = LlmRequest(contents=contents)
+    return [r async for r in llm.generate_content_async(request)][0]
+
+
+def _tool_turn(call, result):
+    return [
+        types.Content(role="model", parts=[types.Part(function_call=call)]),
+        types.Content(role="user", parts=[types.Part(function_response=types.FunctionResponse(
+            name=call.name, response={"result": json.dumps(result)},
+        ))]),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_scripted_llm_steps_through_the_script():
+    llm = ScriptedLlm(script=search_script)
+    contents = [types.Content(role="user", parts=[types.Part(text=json.dumps(PAYLOAD))])]
+    names = []
+    results = {"search_products": {"match": {"handle": "p4"}}}
+    while True:
+        response = await _next(llm, contents)
+        part = response.content.parts[0]
+        assert response.usage_metadata.prompt_token_count > 0
+        if part.function_call is None:
+            break
+        names.append(part.function_call.name)
+        if part.function_call.name == "add_candidate":
+            assert part.function_call.args == {"handle": "p4", "quantity": 2}
+        contents += _tool_turn(part.function_call, results.get(part.function_call.name, {}))
+
+    assert names == ["navigate", "screenshot", "search_products", "add_candidate",
+                     "screenshot", "close_browser"]
+    assert part.text == "Added 1 items."
+
+
+def test_percentile_and_compare():
+    assert run._percentile([], 50) is None
+    assert run._percentile([3, 1, 2, 10], 50) == 2
+    assert run._percentile([3, 1, 2, 10], 95) == 10
+    before = {"levels": [{"concurrency": 4, "run_latency_p50": 2.0}], "chromium_peak_rss_mb": 900}
+    after = {"levels": [{"concurrency": 4, "run_latency_p50": 1.5}], "chromium_peak_rss_mb": 700}
+    lines = run.compare(after, before)
+    assert "run_latency_p50" in lines[0] and "-25.0%" in lines[0]
+    assert "chromium_peak_rss_mb" in lines[1]
+
+
+def test_benchmark_reports_each_level_and_restores_the_server():
+    model, concurrency = server.runner.agent.model, server.job_manager.concurrency
+    report = run.run_benchmark(script="chat", levels=(1, 2), rounds=2, warmup=False,
+                               timeout=30)
+
+    assert [level["concurrency"] for level in report["levels"]] == [1, 2]
+    level = report["levels"][1]
+    assert level["sessions"] == 4 and level["failed_sessions"] == 0
+    assert level["run_latency_p95"] >= level["run_latency_p50"] > 0
+    assert level["throughput_per_minute"] > 0
+    assert level["tool_calls_per_item"] == 0
+    assert level["input_tokens_per_session"] > 0
+    assert report["items"] == len(run.DEFAULT_ITEMS)
+    json.dumps(report)
+
+    assert server.runner.agent.model is model
+    assert server.job_manager.concurrency == concurrency
+    assert site_replay.mode == ""
+
+
+@pytest.mark.asyncio
+async def test_scripted_llm_counts_calls_dropped_by_compaction(monkeypatch):
+    from google.adk.agents import LlmAgent
+    from google.adk.runners import InMemoryRunner
+
+    from benchmarks.fake_llm import recipe_script
+    from pricepilot.tools import compaction
+
+    calls = []
+
+    def navigate(url: str) -> str:
+        calls.append("navigate")
+        return json.dumps({"url": url})
+
+    def screenshot(compact: bool = False) -> str:
+        calls.append("screenshot")
+        return json.dumps({"unchanged": True, "region": "viewport"})
+
+    def add_item_by_recipe(name: str, quantity: int = 1) -> str:
+        calls.append(name)
+        return json.dumps({"added": True, "item": name, "quantity": quantity})
+
+    def close_browser() -> str:
+        calls.append("close_browser")
+        return json.dumps({"closed": True})
+
+    monkeypatch.setattr(compaction, "HISTORY_KEEP_RECENT", 2)
+    agent = LlmAgent(
+        name="scripted", model=ScriptedLlm(script=recipe_script),
+        before_model_callback=[compaction.compact_history],
+        tools=[navigate, screenshot, add_item_by_recipe, close_browser],
+    )
+    runner = InMemoryRunner(agent=agent, app_name="bench")
+    await runner.session_service.create_session(app_name="bench", user_id="u", session_id="s")
+    payload = {"store_url": "https://shop.example",
+               "items": [{"name": f"item {i}"} for i in range(4)]}
+    message = types.Content(role="user", parts=[types.Part(text=json.dumps(payload))])
+    texts = [
+        part.text
+        async for event in runner.run_async(user_id="u", session_id="s", new_message=message)
+        for part in (event.content.parts if event.content else []) if part.text
+    ]
+    # Each step ran once although the collapsed items left the request
+    assert calls == ["navigate", "screenshot", "item 0", "item 1", "item 2", "item 3",
+                     "close_browser"]
+    assert texts[-1].startswith("Added 4 items.")
@@ -0,0 +1,231 @@
+"""Tests for the shared browser pool (fake browsers, no Chromium)."""
+
+import asyncio
+
+import pytest
+
+from pricepilot.tools.browser_pool import BrowserPool, BrowserPoolTimeout
+
+
+class FakePage:
+    def __init__(self):
+        self.closed = False
+
+    def is_closed(self):
+        return self.closed
+
+
+class FakeContext:
+    def __init__(self):
+        self.page_obj = FakePage()
+        self.closed = False
+
+    async def new_page(self):
+        return self.page_obj
+
+    async def route(self, pattern, handler):
+        self.route_handler = handler
+
+    async def close(self):
+        self.closed = True
+        self.page_obj.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.contexts = []
+        self.closed = False
+
+    def is_connected(self):
+        return not self.closed
+
+    async def close(self):
+        self.closed = True
+
+
+class FakePool(BrowserPool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.launched = 0
+
+    async def _launch_browser(self):
+        self.launched += 1
+        return FakeBrowser()
+
+    async def _new_context(self, browser):
+        context = FakeContext()
+        browser.contexts.append(context)
+        return context
+
+
+@pytest.mark.asyncio
+async def test_sessions_get_isolated_pages():
+    pool = FakePool(size=2, max_contexts_per_browser=4)
+    a = await pool.page("a")
+    b = await pool.page("b")
+    assert a is not b
+    assert await pool.page("a") is a
+    assert pool.active_sessions == 2
+    # Both fit in one browser process
+    assert pool.launched == 1
+
+
+@pytest.mark.asyncio
+async def test_context_cap_launches_new_browser():
+    pool = FakePool(size=2, max_contexts_per_browser=1)
+    await pool.acquire("a")
+    await pool.acquire("b")
+    assert pool.launched == 2
+    assert pool.stats()["contexts_per_browser"] == [1, 1]
+
+
+@pytest.mark.asyncio
+async def test_release_only_closes_own_context():
+    pool = FakePool(size=1, max_contexts_per_browser=4)
+    a = await pool.acquire("a")
+    b = await pool.acquire("b")
+    assert await pool.release("a") is True
+    assert a.context.closed
+    assert not b.context.closed
+    assert pool.get("a") is None
+    assert await pool.release("a") is False
+
+
+@pytest.mark.asyncio
+async def test_full_pool_waits_for_release():
+    pool = FakePool(size=1, max_contexts_per_browser=1)
+    await pool.acquire("a")
+    waiter = asyncio.create_task(pool.acquire("b"))
+    await asyncio.sleep(0.01)
+    assert not waiter.done()
+    await pool.release("a")
+    session = await asyncio.wait_for(waiter, timeout=1)
+    assert session.session_id == "b"
+    assert pool.launched == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_acquire_same_session_creates_one_context():
+    pool = FakePool(size=1, max_contexts_per_browser=4)
+    first, second = await asyncio.gather(pool.acquire("a"), pool.acquire("a"))
+    assert first is second
+    assert pool.stats()["contexts_per_browser"] == [1]
+
+
+@pytest.mark.asyncio
+async def test_warm_pool_hits_and_replenishes():
+    pool = FakePool(size=1, max_contexts_per_browser=4, warm_contexts=2)
+    await pool.start()
+    assert pool.warm_available == 2
+
+    await pool.acquire("a")
+    assert pool.metrics.warm_hits == 1
+    await asyncio.sleep(0.01)  # let the background replenish run
+    assert pool.warm_available == 2
+    assert pool.metrics.warm_created == 3
+
+
+@pytest.mark.asyncio
+async def test_dead_warm_context_is_closed_and_frees_its_slot():
+    pool = FakePool(size=1, max_contexts_per_browser=1, warm_contexts=1)
+    await pool.start()
+    dead = pool._warm[0].context
+    dead.page_obj.closed = True
+    pool._warming = False  # keep the freed slot for the session
+
+    session = await pool.acquire("a", timeout=1)
+    assert dead.closed and session.context is not dead
+    assert pool.metrics.warm_misses == 1
+    assert pool.stats()["contexts_per_browser"] == [1]
+
+
+@pytest.mark.asyncio
+async def test_warm_pool_limited_by_capacity():
+    pool = FakePool(size=1, max_contexts_per_browser=2, warm_contexts=2)
+    await pool.start()
+    await pool.acquire("a")
+    await pool.acquire("b")
+    await asyncio.sleep(0.01)
+    # Both slots are owned by sessions now, nothing left to warm
+    assert pool.warm_available == 0
+    assert pool.metrics.warm_hits == 2
+
+    await pool.release("a")
+    await asyncio.sleep(0.01)
+    assert pool.warm_available == 1
+
+
+@pytest.mark.asyncio
+async def test_no_warm_contexts_without_start():
+    pool = FakePool(size=1, max_contexts_per_browser=4, warm_contexts=2)
+    await pool.acquire("a")
+    await pool.release("a")
+    await asyncio.sleep(0.01)
+    assert pool.warm_available == 0
+    assert pool.metrics.warm_misses == 1
+
+
+@pytest.mark.asyncio
+async def test_network_filter_attached_per_session():
+    pool = FakePool(size=1, max_contexts_per_browser=4)
+    a = await pool.acquire("a")
+    b = await pool.acquire("b")
+    assert a.network is not None and b.network is not None
+    assert a.network is not b.network
+    assert a.context.route_handler == a.network.handle
+
+    no_filter = FakePool(size=1, max_contexts_per_browser=4, network_filter=False)
+    assert (await no_filter.acquire("a")).network is None
+
+
+@pytest.mark.asyncio
+async def test_full_pool_acquire_times_out():
+    pool = FakePool(size=1, max_contexts_per_browser=1)
+    await pool.acquire("a")
+    with pytest.raises(BrowserPoolTimeout, match="No browser context free"):
+        await pool.acquire("b", timeout=0.05)
+    # The timed-out waiter left no reservation or session lock behind
+    assert set(pool._session_locks) == {"a"}
+    await pool.release("a")
+    assert pool._session_locks == {}
+    assert (await pool.acquire("b", timeout=1)).session_id == "b"
+
+
+@pytest.mark.asyncio
+async def test_browser_launch_does_not_hold_the_pool_lock():
+    launched = asyncio.Event()
+    finish_launch = asyncio.Event()
+
+    class SlowLaunchPool(FakePool):
+        async def _launch_browser(self):
+            if self.launched == 1:
+                launched.set()
+                await finish_launch.wait()
+            return await super()._launch_browser()
+
+    pool = SlowLaunchPool(size=2, max_contexts_per_browser=1)
+    await pool.acquire("a")
+    slow = asyncio.create_task(pool.acquire("b"))
+    await asyncio.wait_for(launched.wait(), timeout=1)
+    # Release and re-acquire on the first browser while the second launches
+    assert await asyncio.wait_for(pool.release("a"), timeout=1) is True
+    assert (await asyncio.wait_for(pool.acquire("c"), timeout=1)).session_id == "c"
+    finish_launch.set()
+    assert (await asyncio.wait_for(slow, timeout=1)).session_id == "b"
+    assert pool.launched == 2
+
+
+@pytest.mark.asyncio
+async def test_recorded_traffic_is_flushed_outside_the_pool_lock(monkeypatch):
+    from pricepilot.tools import browser_pool as pool_module
+
+    pool = FakePool(size=1, max_contexts_per_browser=4)
+    await pool.acquire("a")
+    held = []
+
+    async def flush():
+        held.append(pool._cond.locked())
+
+    monkeypatch.setattr(pool_module.site_replay, "flush", flush)
+    assert await pool.release("a") is True
+    assert held == [False]
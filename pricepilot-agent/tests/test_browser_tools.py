@@ -4,6 +4,8 @@ import json
 
 import pytest
 
+from pricepilot.stores import GENERIC_RECIPE
+
 
 @pytest.mark.asyncio
 async def test_extract_products_returns_json():
@@ -60,3 +62,170 @@ def test_browser_config():
     assert BROWSER_TIMEOUT > 0
     assert BROWSER_VIEWPORT_WIDTH > 0
     assert BROWSER_VIEWPORT_HEIGHT > 0
+
+
+def test_composite_tool_signatures():
+    """Verify the composite search/add tools expose the expected parameters."""
+    import inspect
+
+    from pricepilot.tools.browser_tools import add_candidate, search_products
+
+    params = inspect.signature(search_products).parameters
+    assert {"query", "barcode", "manufacturer"} <= set(params)
+    params = inspect.signature(add_candidate).parameters
+    assert "handle" in params
+    assert params["quantity"].default == 1
+
+
+class FakeLocator:
+    """Records clicks and fills; selectors resolve to the page's fake cards."""
+
+    def __init__(self, page, selector):
+        self.page = page
+        self.selector = selector
+
+    @property
+    def first(self):
+        return self
+
+    def locator(self, selector):
+        return FakeLocator(self.page, f"{self.selector} >> {selector}")
+
+    def filter(self, has_text):
+        return FakeLocator(self.page, f"{self.selector} >> text={has_text}")
+
+    async def count(self):
+        return int(any(self.selector == f'[data-pp-handle="{c["handle"]}"]'
+                       for c in self.page.cards))
+
+    async def fill(self, text, timeout=None):
+        self.page.actions.append(("fill", text))
+
+    async def press(self, key, timeout=None):
+        self.page.actions.append(("press", key))
+
+    async def click(self, timeout=None):
+        self.page.actions.append(("click", self.selector))
+        self.page.badge += 1
+
+    async def wait_for(self, state=None, timeout=None):
+        pass
+
+    async def evaluate(self, script, arg=None):
+        return {"product_url": "https://shop.example/p/1", "product_id": "1"}
+
+
+class FakePage:
+    url = "https://shop.example/search?q=milk"
+
+    def __init__(self, cards):
+        self.cards = cards
+        self.badge = 0
+        self.actions = []
+
+    def locator(self, selector):
+        return FakeLocator(self, selector)
+
+    async def evaluate(self, script, arg=None):
+        from pricepilot.tools.product_extraction import EXTRACT_PRODUCTS_JS
+
+        if script == EXTRACT_PRODUCTS_JS:
+            # Tags cards p<start>, p<start+1>, ... like the in-page script
+            tagged = [{**c, "handle": c.get("handle") or f"p{arg['start'] + i}"}
+                      for i, c in enumerate(self.cards)]
+            self.cards = tagged
+            page = tagged[arg["offset"]:arg["offset"] + arg["limit"]]
+            return {"products": page, "next": arg["start"] + len(tagged),
+                    "total": len(tagged), "more_below": False}
+        if "querySelector(sel)" in script:
+            return str(self.badge)  # read_text of the cart badge
+        return True  # DOM quiet
+
+    async def wait_for_function(self, script, arg=None, timeout=None):
+        pass
+
+
+@pytest.fixture
+def fake_session(monkeypatch):
+    from types import SimpleNamespace as NS
+
+    from pricepilot.tools import browser_tools
+
+    page = FakePage([
+        {"name": "חלב תנובה 3% 1 ליטר", "priceTexts": ["₪6.90"], "barcode": "7290000066318"},
+        {"name": "שוקו תנובה 1 ליטר", "priceTexts": ["₪8.50"]},
+    ])
+    session = NS(page=page, candidates={}, next_handle=1)
+
+    async def acquire(session_id):
+        return session
+
+    remembered = []
+    monkeypatch.setattr(browser_tools.browser_pool, "acquire", acquire)
+    monkeypatch.setattr(browser_tools, "_remember_product",
+                        lambda *args: remembered.append(args))
+    session.remembered = remembered
+    return session
+
+
+@pytest.mark.asyncio
+async def test_search_products_tags_and_ranks_cards(fake_session):
+    from pricepilot.tools.browser_tools import search_products
+
+    result = json.loads(await search_products("חלב תנובה 3%", barcode="7290000066318"))
+    assert [p["handle"] for p in result["products"]][0] == "p1"
+    assert result["match"]["handle"] == "p1" and result["match"]["confident"]
+    assert set(fake_session.candidates) == {"p1", "p2"}
+    assert ("fill", "חלב תנובה 3%") in fake_session.page.actions
+
+
+@pytest.mark.asyncio
+async def test_add_candidate_adds_by_handle(fake_session):
+    from pricepilot.tools.browser_tools import add_candidate, search_products
+
+    await search_products("חלב תנובה 3%")
+    result = json.loads(await add_candidate("p1", quantity=3))
+    assert result == {"added": True, "verified": True, "handle": "p1",
+                      "name": "חלב תנובה 3% 1 ליטר", "quantity": 3}
+    clicks = [a[1] for a in fake_session.page.actions if a[0] == "click"]
+    assert clicks[0].startswith('[data-pp-handle="p1"] >> ')
+    assert clicks[0].endswith(GENERIC_RECIPE.add_button)
+    assert clicks[1:] == [clicks[0].replace(GENERIC_RECIPE.add_button,
+                                            GENERIC_RECIPE.quantity_plus)] * 2
+    assert fake_session.remembered[0][1] == "7290000066318"
+
+
+@pytest.mark.asyncio
+async def test_add_candidate_rejects_unknown_handles(fake_session):
+    from pricepilot.tools.browser_tools import add_candidate, search_products
+
+    await search_products("חלב")
+    for handle in ("p9", 'p1"] , body [x="', "*"):
+        result = json.loads(await add_candidate(handle))
+        assert result["error"].startswith("Unknown handle")
+    assert not [a for a in fake_session.page.actions if a[0] == "click"]
+    assert fake_session.remembered == []
+
+
+@pytest.mark.asyncio
+async def test_add_candidate_only_remembers_the_cards_own_barcode(fake_session):
+    from pricepilot.tools.browser_tools import add_candidate, search_products
+
+    await search_products("חלב תנובה")
+    # A substitute for another barcode, and a card without one
+    await add_candidate("p1", barcode="7290011194246")
+    await add_candidate("p2", barcode="7290011194246")
+    assert fake_session.remembered == []
+
+
+@pytest.mark.asyncio
+async def test_add_candidate_reports_an_unchanged_badge(fake_session):
+    from pricepilot.tools.browser_tools import add_candidate, search_products
+
+    async def badge_never_changes(script, arg=None, timeout=None):
+        raise TimeoutError("badge did not change")
+
+    fake_session.page.wait_for_function = badge_never_changes
+    await search_products("חלב תנובה 3%")
+    result = json.loads(await add_candidate("p1"))
+    assert result["added"] is True and result["verified"] is False
@@ -0,0 +1,91 @@
+"""Tests for per-session budget accounting and enforcement."""
+
+import json
+from types import SimpleNamespace as NS
+from typing import Optional
+
+import pytest
+from google.adk.models import LlmResponse
+from google.adk.tools import ToolContext
+from google.genai import types
+
+from pricepilot.tools import budget
+from pricepilot.tools.budget import (
+    BudgetedTool,
+    budget_ledger,
+    count_model_tokens,
+    stop_when_spent,
+)
+
+
+async def search_products(query: str, tool_context: Optional[ToolContext] = None) -> str:
+    return json.dumps({"products": [query]})
+
+
+async def click(selector: str, tool_context: Optional[ToolContext] = None) -> str:
+    return json.dumps({"clicked": selector})
+
+
+async def close_browser(tool_context: Optional[ToolContext] = None) -> str:
+    return json.dumps({"closed": True})
+
+
+@pytest.fixture
+def small_budget(monkeypatch):
+    monkeypatch.setattr(budget, "MAX_BROWSER_ACTIONS", 5)
+    monkeypatch.setattr(budget, "BUDGET_SOFT_RATIO", 0.6)
+    monkeypatch.setattr(budget, "BUDGET_CHECKOUT_ACTIONS", 2)
+    context = NS(session=NS(id="budget-session"), state={})
+    yield context
+    budget_ledger.drop("budget-session")
+
+
+async def _call(tool, context, **args):
+    return json.loads(await tool.run_async(args=args, tool_context=context))
+
+
+@pytest.mark.asyncio
+async def test_warns_then_refuses_item_tools_then_stops(small_budget):
+    search, press, close = BudgetedTool(search_products), BudgetedTool(click), BudgetedTool(close_browser)
+
+    assert "budget" not in await _call(search, small_budget, query="חלב")
+    assert "budget" not in await _call(search, small_budget, query="ביצים")
+    warned = await _call(search, small_budget, query="לחם")
+    assert warned["budget"]["state"] == "warning"
+    assert "Phase 3" in warned["budget"]["message"]
+    await _call(search, small_budget, query="גבינה")
+    await _call(search, small_budget, query="יוגורט")  # 5/5: exhausted
+
+    refused = await _call(search, small_budget, query="במבה")
+    assert "refused" in refused["error"]
+    assert refused["budget"]["state"] == "exhausted"
+    # Checkout actions still go through, up to the allowance
+    assert (await _call(press, small_budget, selector="#cart"))["clicked"] == "#cart"
+    await _call(press, small_budget, selector="#checkout")
+    assert "error" in await _call(press, small_budget, selector="#pay")
+    assert (await _call(close, small_budget))["closed"] is True
+
+    usage = budget_ledger.get("budget-session")
+    assert (usage.actions, usage.refused, usage.state) == (8, 2, "stopped")
+    stopped = stop_when_spent(NS(session=small_budget.session), None)
+    assert "budget" in stopped.content.parts[0].text
+
+
+@pytest.mark.asyncio
+async def test_tokens_count_against_the_budget(small_budget, monkeypatch):
+    monkeypatch.setattr(budget, "MAX_SESSION_TOKENS", 1000)
+    response = LlmResponse(
+        content=types.Content(role="model", parts=[types.Part(text="ok")]),
+        usage_metadata=types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=700, candidates_token_count=50, total_token_count=750,
+        ),
+    )
+    count_model_tokens(small_budget, response)
+    usage = budget_ledger.get("budget-session")
+    assert (usage.llm_tokens, usage.llm_calls, usage.state) == (750, 1, "warning")
+    assert stop_when_spent(small_budget, None) is None
+
+    count_model_tokens(small_budget, response)
+    refused = await _call(BudgetedTool(search_products), small_budget, query="חלב")
+    assert "refused" in refused["error"]
+    assert refused["budget"]["llm_tokens"] == 1500
@@ -0,0 +1,155 @@
+"""Tests for compacting the conversation history before each model call."""
+
+import json
+from types import SimpleNamespace as NS
+
+from google.adk.models import LlmRequest
+from google.genai import types
+
+from pricepilot import metrics
+from pricepilot.tools.compaction import (
+    compact_contents,
+    compact_history,
+    content_chars,
+)
+
+PAYLOAD = {"store_url": "https://shop.example", "items": [
+    {"name": "חלב תנובה", "quantity": 2}, {"name": "ביצים L", "quantity": 1},
+]}
+IMAGE = "data:image/webp;base64," + "A" * 20000
+
+
+def user(text):
+    return types.Content(role="user", parts=[types.Part(text=text)])
+
+
+def call(name, **args):
+    return types.Content(role="model", parts=[
+        types.Part(function_call=types.FunctionCall(name=name, args=args)),
+    ])
+
+
+def result(name, payload):
+    response = {"result": json.dumps(payload, ensure_ascii=False)}
+    return types.Content(role="user", parts=[
+        types.Part(function_response=types.FunctionResponse(name=name, response=response)),
+    ])
+
+
+def history():
+    """A two-item cart: navigation, a screenshot and search + add per item."""
+    return [
+        user(json.dumps(PAYLOAD, ensure_ascii=False)),
+        call("navigate", url="https://shop.example"),
+        result("navigate", {"url": "https://shop.example", "title": "Shop"}),
+        call("screenshot"),
+        result("screenshot", {"screenshot": IMAGE, "region": "viewport"}),
+        call("search_products", query="חלב תנובה"),
+        result("search_products", {"candidates": [{"handle": "p1", "text": "x" * 5000}]}),
+        call("add_candidate", handle="p1", quantity=2),
+        result("add_candidate", {"added": True, "handle": "p1", "name": "חלב תנובה",
+                                 "quantity": 2}),
+        call("search_products", query="ביצים L"),
+        result("search_products", {"candidates": [{"handle": "p1", "text": "y" * 5000}]}),
+        call("screenshot", selector="results"),
+        result("screenshot", {"screenshot": IMAGE, "region": "results"}),
+        call("add_candidate", handle="p1", quantity=1),
+        result("add_candidate", {"added": True, "handle": "p1", "name": "ביצים L",
+                                 "quantity": 1}),
+    ]
+
+
+def responses(contents):
+    return [
+        (p.function_response.name, p.function_response.response["result"])
+        for c in contents for p in c.parts or [] if p.function_response is not None
+    ]
+
+
+def test_completed_items_collapse_into_a_ledger():
+    contents = history()
+    compacted = compact_contents(contents, keep_recent=6, max_tool_chars=2000)
+
+    # Navigation through the first add is gone; the second item stays whole
+    ledger = compacted[0].parts[-1].text
+    assert ledger.splitlines()[1:] == ["✓ חלב תנובה x2"]
+    assert len(compacted) == len(contents) - 8
+    assert [c.role for c in compacted[1:3]] == ["model", "user"]
+    assert compacted[1].parts[0].function_call.args == {"query": "ביצים L"}
+
+
+def test_the_latest_screenshot_of_each_region_is_kept():
+    contents = [
+        *history(),
+        call("screenshot"),
+        result("screenshot", {"screenshot": IMAGE, "region": "viewport"}),
+    ]
+    compacted = compact_contents(contents, keep_recent=100, max_tool_chars=100000)
+
+    screenshots = [json.loads(r) for name, r in responses(compacted) if name == "screenshot"]
+    assert [s["region"] for s in screenshots] == ["viewport", "results", "viewport"]
+    assert screenshots[0]["screenshot"].startswith("[older screenshot removed")
+    # "results" has no newer image, so later "unchanged" answers can refer to it
+    assert screenshots[1]["screenshot"] == IMAGE
+    assert screenshots[2]["screenshot"] == IMAGE
+
+
+def test_batch_fallbacks_and_cart_check_stay_in_the_ledger():
+    batch = {
+        "added": [{"item": "חלב תנובה", "quantity": 2}, {"item": "לחם", "quantity": 1}],
+        "unverified": ["לחם"],
+        "fallback": [
+            {"added": False, "item": "ביצים L", "quantity": 1, "failed_step": "match",
+             "candidates": ["ביצים M", "ביצים XL"]},
+            {"added": True, "item": "קפה", "quantity": 3, "failed_step": "quantity"},
+        ],
+        "cart": {"before": 0, "after": 3, "consistent": False},
+    }
+    contents = [
+        user(json.dumps(PAYLOAD, ensure_ascii=False)),
+        call("add_items_parallel", items=PAYLOAD["items"]),
+        result("add_items_parallel", batch),
+        *history()[9:15],
+    ]
+    compacted = compact_contents(contents, keep_recent=6, max_tool_chars=2000)
+
+    assert len(compacted) == len(contents) - 2
+    assert compacted[0].parts[-1].text.splitlines()[1:] == [
+        "✓ חלב תנובה x2",
+        "✓ לחם x1 (not confirmed by the cart badge)",
+        "✗ ביצים L x1: not added (match); candidates: ביצים M, ביצים XL",
+        "✗ קפה x3: in the cart, quantity still to set",
+        "! The cart badge did not match the items added; verify the cart before checkout",
+    ]
+
+
+def test_old_tool_results_are_truncated():
+    contents = [history()[0], *history()[5:7], *history()[9:11]]
+    compacted = compact_contents(contents, keep_recent=2, max_tool_chars=300)
+
+    old, recent = [r for name, r in responses(compacted) if name == "search_products"]
+    assert len(old) < 400 and old.endswith("characters removed]")
+    assert len(recent) > 5000
+
+
+def test_session_history_is_not_modified():
+    contents = history()
+    snapshot = [c.model_dump() for c in contents]
+    compact_contents(contents, keep_recent=2, max_tool_chars=100)
+    assert [c.model_dump() for c in contents] == snapshot
+
+
+def test_callback_rewrites_the_request_and_records_savings():
+    request = LlmRequest(contents=history())
+    before = content_chars(request.contents)
+    context = NS(session=NS(id="compaction-session"))
+
+    assert compact_history(context, request) is None
+    after = content_chars(request.contents)
+    assert before - after > len(IMAGE)  # The older screenshot and the first item
+
+    stats = metrics.session_metrics.get("compaction-session").as_dict()["compaction"]
+    assert stats == {"calls": 1, "chars_before": before, "chars_after": after,
+                     "tokens_saved": (before - after) // metrics.CHARS_PER_TOKEN}
+    assert 'pricepilot_history_chars_total{stage="after"}' in metrics.registry.render()
+    metrics.session_metrics.drop("compaction-session")
@@ -0,0 +1,29 @@
+"""Tests for the compact DOM snapshot helpers."""
+
+from pricepilot.tools.dom_snapshot import SnapshotState, diff_snapshots, ref_selector
+
+
+def test_ref_selector():
+    assert ref_selector("12") == '[data-pp-ref="12"]'
+    assert ref_selector("ref=7") == '[data-pp-ref="7"]'
+    assert ref_selector(" 3 ") == '[data-pp-ref="3"]'
+    assert ref_selector("#search") == "#search"
+    assert ref_selector("text=הוסף לסל") == "text=הוסף לסל"
+
+
+def test_diff_snapshots():
+    state = SnapshotState()
+    state.update("https://store/", [
+        {"ref": 1, "role": "searchbox", "name": "חיפוש"},
+        {"ref": 2, "role": "button", "name": "הוסף לסל"},
+        {"ref": 3, "role": "link", "name": "מבצעים"},
+    ], next_ref=4)
+    current = [
+        {"ref": 1, "role": "searchbox", "name": "חיפוש", "value": "חלב"},
+        {"ref": 2, "role": "button", "name": "הוסף לסל"},
+        {"ref": 4, "role": "button", "name": "+"},
+    ]
+    diff = diff_snapshots(state.elements, current)
+    assert diff["added"] == [{"ref": 4, "role": "button", "name": "+"}]
+    assert diff["changed"] == [current[0]]
+    assert diff["removed"] == [3]
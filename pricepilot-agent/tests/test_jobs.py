@@ -0,0 +1,152 @@
+"""Tests for the background job manager and non-blocking session endpoints."""
+
+import asyncio
+import time
+from types import SimpleNamespace as NS
+
+import pytest
+from fastapi.testclient import TestClient
+
+from pricepilot.api import server
+from pricepilot.api.jobs import JobConflict, JobManager
+
+
+@pytest.mark.asyncio
+async def test_runs_are_bounded_by_concurrency():
+    running = peak = 0
+
+    async def run(job):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.02)
+        job.publish({"type": "message", "text": job.content})
+        running -= 1
+
+    manager = JobManager(run, concurrency=2)
+    jobs = [manager.submit(f"s{i}", "u1", f"run {i}") for i in range(5)]
+    assert manager.stats()["queued"] == 5
+    while any(job.active for job in jobs):
+        await asyncio.sleep(0.01)
+    await manager.close()
+
+    assert peak == 2
+    assert [job.state for job in jobs] == ["done"] * 5
+    assert jobs[3].events == [{"type": "message", "text": "run 3"}]
+
+
+@pytest.mark.asyncio
+async def test_cancel_running_and_queued_jobs():
+    started = asyncio.Event()
+
+    async def run(job):
+        started.set()
+        await asyncio.sleep(10)
+
+    manager = JobManager(run, concurrency=1)
+    first = manager.submit("s1", "u1", None)
+    second = manager.submit("s2", "u1", None)
+    await started.wait()
+
+    follower = first.follow()
+    assert await manager.cancel("s2") is True
+    assert await manager.cancel("s1") is True
+    assert [event async for event in follower] == [{"type": "cancelled"}]
+    assert (first.state, second.state) == ("cancelled", "cancelled")
+    assert await manager.cancel("s1") is False
+    # The worker survived the cancellation and still takes new jobs
+    third = manager.submit("s1", "u1", None)
+    await asyncio.sleep(0.01)
+    assert third.state == "running"
+    await manager.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_run_and_conflicting_submit():
+    async def run(job):
+        await asyncio.sleep(0.01)
+        raise RuntimeError("store is down")
+
+    manager = JobManager(run, concurrency=1)
+    job = manager.submit("s1", "u1", None)
+    with pytest.raises(JobConflict):
+        manager.submit("s1", "u1", None)
+    while job.active:
+        await asyncio.sleep(0.01)
+    await manager.close()
+
+    assert job.state == "error" and job.error == "store is down"
+    # A finished job's events are replayed to late followers
+    assert [e["type"] async for e in job.follow()] == ["error"]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def fake_run_async(user_id, session_id, new_message, **kwargs):
+        await asyncio.sleep(0.3)  # Stands in for a long agent run
+        return
+        yield
+
+    monkeypatch.setattr(server.runner, "run_async", fake_run_async)
+    with TestClient(server.app) as client:
+        yield client
+
+
+def test_create_session_returns_before_the_run(client):
+    body = {"user_id": "u1", "store_name": "שופרסל", "items": [{"name": "חלב"}]}
+    start = time.monotonic()
+    created = client.post("/sessions", json=body)
+    assert time.monotonic() - start < 0.3
+    assert created.json()["status"] == "queued"
+    session_id = created.json()["session_id"]
+
+    status = client.get(f"/sessions/{session_id}", params={"user_id": "u1"}).json()
+    assert status["job"]["state"] in ("queued", "running")
+    reply = client.post(f"/sessions/{session_id}/message", json={"user_id": "u1", "text": "L"})
+    assert reply.status_code == 409  # Previous run still going
+
+    deleted = client.delete(f"/sessions/{session_id}", params={"user_id": "u1"})
+    assert deleted.status_code == 200
+    assert server.job_manager.get(session_id) is None
+
+
+def test_events_endpoint_follows_the_run(client):
+    body = {"user_id": "u1", "store_name": "שופרסל", "items": [{"name": "חלב"}]}
+    session_id = client.post("/sessions", json=body).json()["session_id"]
+    with client.stream(
+        "GET", f"/sessions/{session_id}/events", params={"user_id": "u1"},
+    ) as response:
+        lines = [line for line in response.iter_lines() if line.startswith("event: ")]
+    assert lines[0] == "event: session"
+    assert lines[-1] == "event: done"
+
+    status = client.get(f"/sessions/{session_id}", params={"user_id": "u1"}).json()
+    assert status["job"]["state"] == "done"
+    unknown = client.get("/sessions/nope/events", params={"user_id": "u1"})
+    assert unknown.status_code == 404
+
+
+def test_wait_flag_returns_the_runs_messages(monkeypatch):
+    def event(role, text):
+        return NS(id=f"{role}:{text}", timestamp=1700000000.5, partial=False,
+                  content=NS(role=role, parts=[NS(text=text)]))
+
+    replies = iter([["Which eggs, L or M?"], ["Added ביצים L"]])
+
+    async def fake_run_async(user_id, session_id, new_message, **kwargs):
+        yield event("user", new_message.parts[0].text)
+        for text in next(replies):
+            await asyncio.sleep(0.01)
+            yield event("model", text)
+
+    monkeypatch.setattr(server.runner, "run_async", fake_run_async)
+    body = {"user_id": "u1", "store_name": "שופרסל", "items": [{"name": "ביצים"}]}
+    with TestClient(server.app) as client:
+        created = client.post("/sessions", params={"wait": True}, json=body).json()
+        assert [m["text"] for m in created["messages"]] == ["Which eggs, L or M?"]
+        assert created["status"] == "in_progress"
+
+        reply = client.post(f"/sessions/{created['session_id']}/message",
+                            params={"wait": True}, json={"user_id": "u1", "text": "L"}).json()
+        assert reply["status"] == "in_progress"
+        assert [m["text"] for m in reply["messages"]] == ["Added ביצים L"]
@@ -0,0 +1,96 @@
+"""Tests for the local fuzzy product matcher."""
+
+import time
+
+from pricepilot.matching import Size, match_candidates, normalize_hebrew, parse_size
+
+MILKS = [
+    {"name": "חלב תנובה טרי 3% שומן 1 ליטר"},
+    {"name": "חלב טרה 3% בקרטון 1 ליטר"},
+    {"name": "חלב תנובה 1% שומן 2 ליטר"},
+    {"name": "שוקו תנובה 1L"},
+]
+
+
+def test_normalize_hebrew():
+    assert normalize_hebrew("חָלָב תְּנוּבָה") == "חלב תנובה"
+    assert normalize_hebrew('קוטג׳ 5% 250 גר\'') == "קוטג 5% 250 גר"
+    assert normalize_hebrew("לחם אחיד פרוס") == normalize_hebrew("לחמ אחיד פרוס")
+    assert normalize_hebrew("Milk 1.5L") == "milk 1.5 l"
+
+
+def test_parse_size_units():
+    assert parse_size(normalize_hebrew("חלב 1 ליטר"))[0] == Size(1000, "ml")
+    assert parse_size(normalize_hebrew("חלב 1L"))[0] == Size(1000, "ml")
+    assert parse_size(normalize_hebrew('משקה 500 מ"ל'))[0] == Size(500, "ml")
+    assert parse_size(normalize_hebrew('עגבניות 1.5 ק"ג'))[0] == Size(1500, "g")
+    size, rest = parse_size(normalize_hebrew("ביצים L 12 יחידות"))
+    assert size == Size(12, "unit")
+    assert rest == "ביצימ l"
+
+
+def test_size_and_brand_pick_the_right_product():
+    result = match_candidates("חלב 3% 1L", MILKS, manufacturer='תנובה בע"מ')
+    assert result.best.index == 0
+    assert result.confident
+    assert "size" in result.best.reasons and "brand" in result.best.reasons
+
+
+def test_near_tie_between_brands_is_not_confident():
+    result = match_candidates("חלב 3%", MILKS)
+    assert result.best.index in (0, 1)
+    assert not result.confident
+
+
+def test_duplicate_listing_does_not_lower_confidence():
+    result = match_candidates("חלב תנובה 3% 1 ליטר", [MILKS[0], MILKS[0], MILKS[2]])
+    assert result.confident
+
+
+def test_exact_barcode_wins():
+    candidates = MILKS + [{"name": "מוצר", "barcode": "7290000066318"}]
+    result = match_candidates("חלב תנובה 3%", candidates, barcode="7290000066318")
+    assert result.best.index == 4
+    assert result.confidence == 1.0
+
+
+def test_no_candidates():
+    result = match_candidates("חלב", [])
+    assert result.best is None
+    assert not result.confident
+
+
+def test_hundreds_of_candidates_in_milliseconds():
+    candidates = [{"name": f"מוצר מספר {i} של חברה {i % 7} 500 גרם"} for i in range(500)]
+    candidates.append(MILKS[0])
+    start = time.perf_counter()
+    result = match_candidates("חלב תנובה 3% 1 ליטר", candidates, manufacturer="תנובה")
+    assert time.perf_counter() - start < 0.25
+    assert result.best.index == 500
+
+
+def test_variant_words_are_never_a_confident_match():
+    # The only card is the zero-sugar variant: not the requested product
+    result = match_candidates("קוקה קולה 1.5 ליטר", [{"name": "קוקה קולה זירו 1.5 ליטר"}])
+    assert not result.confident
+    assert "variant_mismatch" in result.best.reasons
+    # ...and the other way round
+    result = match_candidates("קוקה קולה זירו 1.5 ליטר", [{"name": "קוקה קולה 1.5 ליטר"}])
+    assert not result.confident
+    assert not match_candidates("יוגורט דנונה", [{"name": "יוגורט דנונה לייט"}]).confident
+
+
+def test_variant_words_pick_the_right_variant():
+    candidates = [{"name": "קוקה קולה 1.5 ליטר"}, {"name": "קוקה קולה זירו 1.5 ליטר"}]
+    result = match_candidates("קוקה קולה זירו 1.5 ליטר", candidates)
+    assert result.best.index == 1 and result.confident
+    result = match_candidates("קוקה קולה 1.5 ליטר", candidates)
+    assert result.best.index == 0 and result.confident
+
+
+def test_different_fat_percentage_is_a_different_product():
+    result = match_candidates("חלב תנובה 3% 1 ליטר", [{"name": "חלב תנובה 1% 1 ליטר"}])
+    assert not result.confident
+    assert "variant_mismatch" in result.best.reasons
+    # A percentage on one side only is not a conflict
+    assert match_candidates("חלב תנובה 1 ליטר", [{"name": "חלב תנובה 3% 1 ליטר"}]).confident
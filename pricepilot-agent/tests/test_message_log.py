@@ -0,0 +1,82 @@
+"""Tests for the cached, incremental message log and GET ?since=."""
+
+import asyncio
+import itertools
+import time
+from types import SimpleNamespace as NS
+
+from fastapi.testclient import TestClient
+
+from pricepilot.api import server
+from pricepilot.api.message_log import MessageLog, MessageLogs, event_messages
+
+_ids = itertools.count()
+
+
+def _event(role, *texts, partial=False):
+    return NS(id=f"e{next(_ids)}", timestamp=1700000000.5, partial=partial,
+              content=NS(role=role, parts=[NS(text=t) for t in texts]))
+
+
+def test_messages_take_ids_and_times_from_events():
+    event = _event("model", "Adding חלב", None, "Done?")
+    messages = event_messages(event)
+    assert [m.id for m in messages] == [f"{event.id}:0", f"{event.id}:2"]
+    assert messages[0].type == "bot" and messages[0].timestamp == 1700000000500
+    assert event_messages(event)[1].id == messages[1].id  # Same id on every build
+
+
+def test_log_is_incremental_and_deduplicated():
+    log = MessageLog()
+    first = _event("user", "{}")
+    assert log.append(first) == 1
+    assert log.append(first) == 0  # Rebuilt logs may see an event twice
+    assert log.append(_event("model", "…", partial=True)) == 0
+    cursor = log.cursor
+    log.append(_event("model", "Which size?"))
+    assert [m.text for m in log.since(cursor)] == ["Which size?"]
+    assert log.since(log.cursor) == []
+    assert len(log.since(None)) == 2
+
+
+def test_cache_evicts_least_recently_used_and_rebuilds():
+    logs = MessageLogs(max_sessions=2)
+    events = [_event("user", "a"), _event("model", "b")]
+    original = logs.create("s1", events)
+    logs.create("s2")
+    logs.get("s1")
+    logs.create("s3")
+    assert logs.get("s2") is None and len(logs) == 2
+    logs.append("s2", _event("model", "lost"))  # Uncached: rebuilt on the next poll
+    assert logs.get("s2") is None
+
+    rebuilt = MessageLogs().create("s1", events)
+    assert [m.id for m in rebuilt.messages] == [m.id for m in original.messages]
+
+
+def test_poll_with_since_returns_only_new_messages(monkeypatch):
+    replies = iter([["Adding חלב", "Which eggs, L or M?"], ["Added ביצים L"]])
+
+    async def fake_run_async(user_id, session_id, new_message, **kwargs):
+        for text in next(replies):
+            await asyncio.sleep(0.01)
+            yield _event("model", text)
+
+    monkeypatch.setattr(server.runner, "run_async", fake_run_async)
+    body = {"user_id": "u1", "store_name": "שופרסל", "items": [{"name": "חלב"}]}
+    with TestClient(server.app) as client:
+        session_id = client.post("/sessions", json=body).json()["session_id"]
+        url, params = f"/sessions/{session_id}", {"user_id": "u1"}
+        while client.get(url, params=params).json()["job"]["state"] != "done":
+            time.sleep(0.01)
+        full = client.get(url, params=params).json()
+        assert [m["text"] for m in full["messages"]] == ["Adding חלב", "Which eggs, L or M?"]
+        assert client.get(url, params={**params, "since": full["cursor"]}).json()["messages"] == []
+
+        client.post(f"{url}/message", json={"user_id": "u1", "text": "L"})
+        while client.get(url, params=params).json()["job"]["state"] != "done":
+            time.sleep(0.01)
+        new = client.get(url, params={**params, "since": full["cursor"]}).json()
+        assert [m["text"] for m in new["messages"]] == ["Added ביצים L"]
+        again = client.get(url, params=params).json()
+        assert again["messages"][:2] == full["messages"]  # Same ids and timestamps
@@ -0,0 +1,99 @@
+"""Tests for the Prometheus metrics and the per-session breakdown."""
+
+import asyncio
+import json
+import time
+from types import SimpleNamespace as NS
+from typing import Optional
+
+import pytest
+from fastapi.testclient import TestClient
+from google.adk.tools import ToolContext
+
+from pricepilot import __version__, metrics
+from pricepilot.api import server
+from pricepilot.metrics import Counter, Gauge, Histogram, Registry
+from pricepilot.tools.budget import BudgetedTool, budget_ledger
+
+
+def test_text_format():
+    registry = Registry()
+    calls = registry.register(Counter("calls_total", "Calls.", ("tool",)))
+    latency = registry.register(Histogram("latency_seconds", "Latency.", buckets=(0.1, 1)))
+    registry.register(Gauge("open", "Open things.", lambda: 3))
+    calls.inc(tool='say "hi"')
+    calls.inc(2, tool='say "hi"')
+    latency.observe(0.05)
+    latency.observe(0.5)
+
+    text = registry.render()
+    assert '# TYPE calls_total counter\ncalls_total{tool="say \\"hi\\""} 3' in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1"} 2' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in text
+    assert "latency_seconds_sum 0.55" in text and "latency_seconds_count 2" in text
+    assert "# TYPE open gauge\nopen 3" in text
+
+
+async def search_products(query: str, tool_context: Optional[ToolContext] = None) -> str:
+    if not query:
+        return json.dumps({"error": "empty query"})
+    return json.dumps({"products": [query] * 10}, ensure_ascii=False)
+
+
+@pytest.mark.asyncio
+async def test_tools_record_latency_payload_and_errors_per_store():
+    context = NS(session=NS(id="metrics-session"),
+                 state={"store_url": "https://www.shufersal.co.il/online"})
+    tool = BudgetedTool(search_products)
+    result = await tool.run_async(args={"query": "חלב"}, tool_context=context)
+    await tool.run_async(args={"query": ""}, tool_context=context)
+
+    stats = metrics.session_metrics.get("metrics-session").as_dict()["tools"]["search_products"]
+    assert stats["calls"] == 2 and stats["errors"] == 1
+    assert stats["payload_bytes"] > len(result.encode("utf-8"))
+    labels = ("search_products", "shufersal.co.il")
+    assert metrics.tool_calls.values[labels + ("error",)] >= 1
+    assert metrics.tool_seconds.series[labels].count >= 2
+    metrics.session_metrics.drop("metrics-session")
+    budget_ledger.drop("metrics-session")
+
+
+def test_metrics_endpoint_and_session_breakdown(monkeypatch):
+    async def fake_run_async(user_id, session_id, new_message, **kwargs):
+        context = NS(session=NS(id=session_id), state={})
+        stop_when_spent = server.root_agent.before_model_callback[0]
+        stop_when_spent(context, None)
+        await asyncio.sleep(0.01)
+        response = NS(usage_metadata=NS(prompt_token_count=1200, candidates_token_count=80,
+                                        total_token_count=1280))
+        server.root_agent.after_model_callback(context, response)
+        return
+        yield
+
+    monkeypatch.setattr(server.runner, "run_async", fake_run_async)
+    body = {"user_id": "u1", "store_name": "שופרסל", "items": [{"name": "חלב"}]}
+    with TestClient(server.app) as client:
+        session_id = client.post("/sessions", json=body).json()["session_id"]
+        url, params = f"/sessions/{session_id}", {"user_id": "u1"}
+        while client.get(url, params=params).json()["job"]["state"] != "done":
+            time.sleep(0.01)
+        breakdown = client.get(url, params=params).json()["metrics"]
+        assert breakdown["runs"] == 1
+        assert breakdown["llm"]["calls"] == 1
+        assert breakdown["llm"]["input_tokens"] == 1200
+        assert breakdown["llm"]["output_tokens"] == 80
+        assert breakdown["llm"]["seconds"] > 0
+
+        scrape = client.get("/metrics")
+        assert scrape.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert 'pricepilot_llm_tokens_total{direction="input"}' in scrape.text
+        assert 'pricepilot_agent_run_duration_seconds_count{outcome="done"}' in scrape.text
+        assert 'pricepilot_runs{state="running"} 0' in scrape.text
+        assert "pricepilot_browser_contexts 0" in scrape.text
+
+        # One version number, in the OpenAPI schema and /health alike
+        assert client.get("/health").json()["version"] == server.app.version == __version__
+
+        client.delete(url, params=params)
+        assert metrics.session_metrics.get(session_id) is None
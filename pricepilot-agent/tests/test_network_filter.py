@@ -0,0 +1,65 @@
+"""Tests for the request-blocking network filter."""
+
+import pytest
+
+from pricepilot.tools.network_filter import NetworkFilter, NetworkRules, store_host
+
+
+class FakeRequest:
+    def __init__(self, url, resource_type):
+        self.url = url
+        self.resource_type = resource_type
+
+
+class FakeRoute:
+    def __init__(self, url, resource_type):
+        self.request = FakeRequest(url, resource_type)
+        self.outcome = None
+
+    async def abort(self, error_code=None):
+        self.outcome = "abort"
+
+    async def fallback(self):
+        self.outcome = "continue"
+
+
+def test_store_host_strips_www():
+    assert store_host("https://www.shufersal.co.il/online") == "shufersal.co.il"
+    assert store_host("https://yochananof.co.il") == "yochananof.co.il"
+
+
+def test_blocks_trackers_fonts_and_media():
+    f = NetworkFilter()
+    assert f.block_reason("https://www.google-analytics.com/g/collect", "xhr") == "tracker"
+    assert f.block_reason("https://static.hotjar.com/c/hotjar.js", "script") == "tracker"
+    assert f.block_reason("https://www.shufersal.co.il/fonts/a.woff2", "font") == "font"
+    assert f.block_reason("https://cdn.example.com/promo.mp4", "media") == "media"
+
+
+def test_keeps_css_images_and_first_party():
+    f = NetworkFilter()
+    f.set_store_url("https://www.rami-levy.co.il/he")
+    assert f.block_reason("https://www.rami-levy.co.il/app.css", "stylesheet") is None
+    assert f.block_reason("https://img.rami-levy.co.il/product/1.jpg", "image") is None
+    assert f.block_reason("https://api-prod.rami-levy.co.il/api/search", "fetch") is None
+
+
+def test_allow_hosts_override_blocks():
+    f = NetworkFilter(NetworkRules(allow_hosts=("fonts.example.com",)))
+    assert f.block_reason("https://fonts.example.com/icons.woff", "font") is None
+
+
+@pytest.mark.asyncio
+async def test_handle_counts_savings():
+    f = NetworkFilter()
+    blocked = FakeRoute("https://connect.facebook.net/fbevents.js", "script")
+    allowed = FakeRoute("https://www.victoryonline.co.il/", "document")
+    await f.handle(blocked)
+    await f.handle(allowed)
+    assert blocked.outcome == "abort"
+    assert allowed.outcome == "continue"
+    stats = f.stats.as_dict()
+    assert stats["requests_total"] == 2
+    assert stats["requests_blocked"] == 1
+    assert stats["estimated_bytes_saved"] > 0
+    assert stats["blocked_by_reason"] == {"tracker": 1}
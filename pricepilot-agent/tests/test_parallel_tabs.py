@@ -0,0 +1,84 @@
+"""Tests for running per-item work on several tabs of one context."""
+
+import asyncio
+import time
+
+import pytest
+
+from pricepilot.tools.parallel_tabs import run_on_tabs
+
+
+class FakePage:
+    def __init__(self):
+        self.url = None
+        self.closed = False
+
+    async def goto(self, url, wait_until=None):
+        self.url = url
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeContext:
+    def __init__(self, failures: int = 0):
+        self.pages: list[FakePage] = []
+        self.failures = failures
+
+    async def new_page(self):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("tab crashed")
+        page = FakePage()
+        self.pages.append(page)
+        return page
+
+
+ITEMS = [{"name": f"item {i}", "barcode": f"729000000000{i}"} for i in range(6)]
+
+
+async def _slow_add(page, item):
+    await asyncio.sleep(0.05)
+    return {"added": True, "item": item["name"], "tab": id(page)}
+
+
+@pytest.mark.asyncio
+async def test_items_run_concurrently_and_keep_order():
+    context = FakeContext()
+    start = time.monotonic()
+    results, stats = await run_on_tabs(context, "https://store/", ITEMS, _slow_add, 3)
+    elapsed = time.monotonic() - start
+
+    assert [r["item"] for r in results] == [i["name"] for i in ITEMS]
+    assert stats["tabs"] == 3
+    assert len({r["tab"] for r in results}) == 3
+    assert elapsed < 0.05 * len(ITEMS) / 2
+    assert all(p.closed and p.url == "https://store/" for p in context.pages)
+
+
+@pytest.mark.asyncio
+async def test_worker_errors_and_failed_tabs_do_not_stop_the_run():
+    async def flaky(page, item):
+        if item["name"] == "item 2":
+            raise RuntimeError("boom")
+        return {"added": True, "item": item["name"]}
+
+    context = FakeContext(failures=2)
+    results, stats = await run_on_tabs(context, "https://store/", ITEMS, flaky, 3)
+    assert stats["tabs"] == 1
+    assert results[2] == {"item": "item 2", "barcode": "7290000000002",
+                          "added": False, "error": "boom"}
+    assert sum(r["added"] for r in results) == 5
+
+
+@pytest.mark.asyncio
+async def test_no_tab_available():
+    results, stats = await run_on_tabs(
+        FakeContext(failures=5), "https://store/", ITEMS[:2], _slow_add, 2,
+    )
+    assert stats["tabs"] == 0
+    assert results == [
+        {"item": item["name"], "barcode": item["barcode"],
+         "added": False, "error": "No tab available"}
+        for item in ITEMS[:2]
+    ]
@@ -0,0 +1,113 @@
+"""Tests for the single-pass product extraction engine.
+
+Price parsing runs in pure Python. The in-page script runs against the
+reduced store fixtures in ``tests/fixtures/stores`` and is skipped when
+Chromium is not installed.
+"""
+
+import time
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+
+from pricepilot.tools.product_extraction import (
+    EXTRACT_PRODUCTS_JS,
+    MIN_CARD_SCORE,
+    normalize_product,
+    parse_price,
+    parse_unit_price,
+)
+
+FIXTURES = Path(__file__).parent / "fixtures" / "stores"
+
+
+def test_parse_price():
+    assert parse_price("₪ 12.90") == 12.9
+    assert parse_price("12,90 ש״ח") == 12.9
+    assert parse_price("4.90 ש\"ח") == 4.9
+    assert parse_price("מבצע 2 ב-") == 2.0
+    assert parse_price("") is None
+
+
+def test_parse_unit_price():
+    assert parse_unit_price("₪1.29 ל-100 גרם") == {"amount": 1.29, "per": "100 גרם"}
+    assert parse_unit_price("ליח' 3.50")["per"] == "יח'"
+    assert parse_unit_price('24.90 ₪ לק"ג')["per"] == 'ק"ג'
+    assert parse_unit_price("₪ 12.90") is None
+
+
+def test_normalize_product_splits_unit_price():
+    product = normalize_product({
+        "handle": "p1",
+        "name": "חלב תנובה 3%",
+        "priceTexts": ["₪0.69 ל-100 מ\"ל", "6.90 ₪"],
+        "image_url": "/img/1.jpg",
+        "barcode": "7290000066318",
+        "data": {"product-code": "7290000066318"},
+    })
+    assert product["price"] == 6.9
+    assert product["unit_price"] == {"amount": 0.69, "per": "100 מ\"ל"}
+    assert product["barcode"] == "7290000066318"
+    assert "data" in product
+
+
+@pytest_asyncio.fixture
+async def page():
+    playwright_api = pytest.importorskip("playwright.async_api")
+    async with playwright_api.async_playwright() as p:
+        try:
+            browser = await p.chromium.launch(headless=True)
+        except Exception as e:
+            pytest.skip(f"Chromium not available: {e}")
+        page = await browser.new_page(viewport={"width": 1280, "height": 800})
+        yield page
+        await browser.close()
+
+
+async def _extract(page, html: str, hint: str = "", limit: int = 50) -> dict:
+    await page.set_content(html)
+    return await page.evaluate(EXTRACT_PRODUCTS_JS, {
+        "hint": hint, "start": 1, "offset": 0, "limit": limit, "minScore": MIN_CARD_SCORE,
+    })
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("fixture, expected", [
+    ("shufersal_search.html", ["חלב תנובה טרי 3% שומן", "חלב טרה 3% בקרטון",
+                               "חלב תנובה 1% שומן"]),
+    ("rami_levy_search.html", ["חלב 3% תנובה קרטון 1 ליטר", "ביצים גדולות L 12 יחידות"]),
+    ("victory_search.html", ["גבינה לבנה 5% תנובה 250 גרם", "קוטג' 5% תנובה 250 גרם"]),
+])
+async def test_extracts_store_fixtures_without_hint(page, fixture, expected):
+    result = await _extract(page, (FIXTURES / fixture).read_text(encoding="utf-8"))
+    products = [normalize_product(raw) for raw in result["products"]]
+    assert [p["name"] for p in products] == expected
+    assert all(p["price"] for p in products)
+    assert len({p["handle"] for p in products}) == len(products)
+
+
+@pytest.mark.asyncio
+async def test_extracts_barcode_and_unit_price(page):
+    html = (FIXTURES / "shufersal_search.html").read_text(encoding="utf-8")
+    result = await _extract(page, html)
+    first = normalize_product(result["products"][0])
+    assert first["barcode"] == "7290000066318"
+    assert first["price"] == 6.9
+    assert first["unit_price"]["amount"] == 0.69
+
+
+@pytest.mark.asyncio
+async def test_large_grid_is_fast(page):
+    card = (
+        '<div class="product"><img src="/p/{i}.jpg" width="100">'
+        '<span class="name">מוצר {i}</span><span class="price">₪ {i}.90</span>'
+        '<button>הוסף לסל</button><button>+</button></div>'
+    )
+    html = '<div class="grid">' + "".join(card.format(i=i) for i in range(600)) + "</div>"
+    start = time.monotonic()
+    result = await _extract(page, html, limit=20)
+    elapsed = time.monotonic() - start
+    assert result["total"] == 600
+    assert len(result["products"]) == 20
+    assert elapsed < 2.0
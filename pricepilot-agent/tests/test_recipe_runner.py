@@ -0,0 +1,249 @@
+"""Tests for running store recipe steps (fake page, no Chromium)."""
+
+import pytest
+
+from pricepilot.stores import GENERIC_RECIPE
+from pricepilot.tools.recipe_runner import (
+    _MARK_ADD_SCOPE_JS,
+    _PAGE_HAS_BARCODE_JS,
+    RecipeStepError,
+    _pick_card,
+    add_on_product_page,
+    checkout,
+    split_selector,
+)
+
+
+class FakeLocator:
+    def __init__(self, page, selector):
+        self.page = page
+        self.selector = selector
+
+    @property
+    def first(self):
+        return self
+
+    async def click(self, timeout=None):
+        target = self.page.links.get(self.selector)
+        if target is None:
+            raise TimeoutError(f"waiting for locator('{self.selector}')")
+        self.page.url = target
+
+
+class FakePage:
+    def __init__(self, links):
+        self.links = links
+        self.url = "https://shop.example/"
+
+    def locator(self, selector):
+        return FakeLocator(self, selector)
+
+    async def wait_for_load_state(self, state, timeout=None):
+        pass
+
+    async def evaluate(self, script, arg=None):
+        return True
+
+
+@pytest.mark.asyncio
+async def test_checkout_clicks_cart_then_checkout():
+    page = FakePage({
+        GENERIC_RECIPE.cart_link: "https://shop.example/cart",
+        GENERIC_RECIPE.checkout_button: "https://shop.example/checkout",
+    })
+    assert await checkout(page, GENERIC_RECIPE) == {
+        "cart_url": "https://shop.example/cart", "url": "https://shop.example/checkout",
+    }
+
+
+@pytest.mark.asyncio
+async def test_checkout_reports_the_failed_step():
+    page = FakePage({GENERIC_RECIPE.cart_link: "https://shop.example/cart"})
+    with pytest.raises(RecipeStepError) as failed:
+        await checkout(page, GENERIC_RECIPE)
+    assert failed.value.step == "checkout"
+
+    with pytest.raises(RecipeStepError) as failed:
+        await checkout(FakePage({}), GENERIC_RECIPE)
+    assert failed.value.step == "cart"
+
+
+class ProductButton:
+    def __init__(self, page):
+        self.page = page
+
+    @property
+    def first(self):
+        return self
+
+    async def wait_for(self, state=None, timeout=None):
+        pass
+
+    async def click(self, timeout=None):
+        self.page.clicks += 1
+        self.page.badge += 1
+
+    async def evaluate(self, script, arg=None):
+        self.page.marked = script == _MARK_ADD_SCOPE_JS
+
+
+class AddScope:
+    """The add button's ancestor ``level`` levels up; the "+" sits at ``plus_level``."""
+
+    def __init__(self, page, level):
+        self.page = page
+        self.level = level
+
+    @property
+    def first(self):
+        return self
+
+    def locator(self, selector):
+        return self
+
+    async def count(self):
+        return int(self.page.marked and self.level >= self.page.plus_level)
+
+    async def click(self, timeout=None):
+        self.page.plus_clicks.append(self.level)
+
+
+class ProductPage:
+    """A product page whose cart badge takes ``badge_lag`` waits to update."""
+
+    def __init__(self, barcode, badge_lag=0, has_badge=True):
+        self.barcode = barcode
+        self.badge_lag = badge_lag
+        self.has_badge = has_badge
+        self.badge = 0
+        self.clicks = 0
+        self.badge_waits = 0
+        self.url = "about:blank"
+        self.marked = False
+        self.plus_level = 2
+        self.plus_clicks = []
+
+    async def goto(self, url, **kwargs):
+        self.url = url
+
+    def locator(self, selector):
+        if selector.startswith("[data-pp-add-scope="):
+            return AddScope(self, int(selector.split('"')[1]))
+        if selector == "body":
+            raise AssertionError("the quantity is set on the whole page")
+        return ProductButton(self)
+
+    async def evaluate(self, script, arg=None):
+        if script == _PAGE_HAS_BARCODE_JS:
+            return arg[1] == self.barcode
+        if "querySelector(sel)" in script:
+            return str(self.badge) if self.has_badge else None
+        return True
+
+    async def wait_for_function(self, script, arg=None, timeout=None):
+        self.badge_waits += 1
+        if self.badge_lag:
+            self.badge_lag -= 1
+            raise TimeoutError("badge did not change")
+        if str(self.badge) == arg[1]:
+            raise TimeoutError("badge did not change")
+
+
+@pytest.mark.asyncio
+async def test_direct_add_checks_the_page_barcode_before_clicking():
+    page = ProductPage("7290000066318")
+    with pytest.raises(RecipeStepError, match="does not show barcode"):
+        await add_on_product_page(
+            page, GENERIC_RECIPE, "https://shop.example/p/1", barcode="7290011194246",
+        )
+    assert page.clicks == 0
+
+    selector, verified = await add_on_product_page(
+        page, GENERIC_RECIPE, "https://shop.example/p/1", barcode="7290000066318",
+    )
+    assert selector in split_selector(GENERIC_RECIPE.add_button)
+    assert verified and page.clicks == 1
+
+
+@pytest.mark.asyncio
+async def test_slow_badge_is_not_a_failed_direct_add():
+    page = ProductPage("7290000066318", badge_lag=1)
+    _, verified = await add_on_product_page(page, GENERIC_RECIPE, "https://shop.example/p/1")
+    assert verified and page.clicks == 1
+
+    # Once the click landed the add is reported, never raised into a re-add
+    page = ProductPage("7290000066318", badge_lag=2)
+    _, verified = await add_on_product_page(page, GENERIC_RECIPE, "https://shop.example/p/1")
+    assert not verified and page.clicks == 1
+
+
+@pytest.mark.asyncio
+async def test_missing_badge_waits_for_the_dom_instead():
+    page = ProductPage("7290000066318", has_badge=False)
+    await add_on_product_page(page, GENERIC_RECIPE, "https://shop.example/p/1")
+    assert page.clicks == 1
+    assert page.badge_waits == 0
+
+
+@pytest.mark.asyncio
+async def test_direct_add_sets_the_quantity_next_to_the_add_button():
+    page = ProductPage("7290000066318")
+    await add_on_product_page(page, GENERIC_RECIPE, "https://shop.example/p/1", quantity=3)
+    assert page.plus_clicks == [2, 2]
+
+    page = ProductPage("7290000066318")
+    page.plus_level = 9  # no "+" near the button
+    with pytest.raises(RecipeStepError) as failed:
+        await add_on_product_page(page, GENERIC_RECIPE, "https://shop.example/p/1", quantity=2)
+    assert failed.value.step == "quantity" and page.clicks == 1
+
+
+class Cards:
+    """Result cards; records how the barcode lookup narrows them."""
+
+    def __init__(self, selector):
+        self.selector = selector
+
+    @property
+    def first(self):
+        return self
+
+    def and_(self, other):
+        return Cards(f"({self.selector} & {other.selector})")
+
+    def or_(self, other):
+        return Cards(f"({self.selector} | {other.selector})")
+
+    def filter(self, has):
+        return Cards(f"({self.selector} has {has.selector})")
+
+    def locator(self, selector):
+        return self
+
+    async def count(self):
+        return 1
+
+    async def text_content(self, timeout=None):
+        return " חלב תנובה "
+
+
+@pytest.mark.asyncio
+async def test_barcode_card_is_looked_up_among_the_results_only():
+    from dataclasses import replace
+
+    recipe = replace(GENERIC_RECIPE, barcode_attr="data-product-code")
+    page = FakePage({})
+    page.locator = Cards
+    card, label, confidence, by_barcode = await _pick_card(
+        page, recipe, Cards("cards"), "חלב", '72"9\\',
+    )
+    tagged = '[data-product-code="72\\"9\\\\"]'
+    assert card.selector == f"((cards & {tagged}) | (cards has {tagged}))"
+    assert (label, confidence, by_barcode) == ("חלב תנובה", 1.0, True)
+
+
+def test_split_selector_keeps_quoted_commas():
+    assert split_selector('button:has-text("א, ב"), [aria-label*="הוסף"]') == [
+        'button:has-text("א, ב")', '[aria-label*="הוסף"]',
+    ]
+    assert len(split_selector(GENERIC_RECIPE.add_button)) == 4
@@ -0,0 +1,71 @@
+"""Tests for screenshot encoding and the "unchanged" cache."""
+
+import io
+
+from PIL import Image, ImageDraw
+
+from pricepilot.tools.screenshots import (
+    LEGACY_SCREENSHOT_BYTES,
+    ScreenshotCache,
+    encode_screenshot,
+    estimate_tokens,
+)
+
+
+def _page_jpeg(
+    label_y: int = 100, color=(20, 120, 200), badge: str = "2", price: str = "12.90",
+) -> bytes:
+    image = Image.new("RGB", (1280, 720), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((100, label_y, 600, label_y + 200), fill=color)
+    draw.rectangle((700, 400, 1200, 650), fill=(200, 40, 40))
+    draw.text((1220, 20), badge, fill="black")
+    draw.text((720, 660), f"₪{price}", fill="black")
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=80)
+    return out.getvalue()
+
+
+def test_encode_webp_and_compact_is_smaller():
+    raw = _page_jpeg()
+    full = encode_screenshot(raw)
+    compact = encode_screenshot(raw, compact=True)
+    assert full.mime == "image/webp"
+    assert (full.width, full.height) == (1280, 720)
+    assert (compact.width, compact.height) == (640, 360)
+    assert len(compact.data) < len(full.data)
+
+
+def test_fingerprint_detects_small_changes():
+    same_a = encode_screenshot(_page_jpeg())
+    same_b = encode_screenshot(_page_jpeg())
+    assert same_a.fingerprint == same_b.fingerprint
+    # A cart badge 2→3 or a new price must never count as unchanged
+    for changed in (_page_jpeg(badge="3"), _page_jpeg(price="19.90"),
+                    _page_jpeg(label_y=400, color=(0, 0, 0))):
+        assert encode_screenshot(changed).fingerprint != same_a.fingerprint
+        assert encode_screenshot(changed, compact=True).fingerprint != (
+            encode_screenshot(_page_jpeg(), compact=True).fingerprint
+        )
+
+
+def test_cache_reports_unchanged_and_savings():
+    cache = ScreenshotCache()
+    shot = encode_screenshot(_page_jpeg())
+    assert not cache.is_unchanged("viewport:full", shot.fingerprint)
+    cache.record_sent("viewport:full", shot)
+    assert cache.is_unchanged("viewport:full", shot.fingerprint)
+    # Other regions are tracked separately
+    assert not cache.is_unchanged("results:full", shot.fingerprint)
+
+    saved = cache.record_unchanged("viewport:full")
+    assert saved == len(shot.data)
+    stats = cache.as_dict()
+    assert stats["sent"] == 1 and stats["unchanged"] == 1
+    assert stats["bytes_saved"] >= saved
+    assert stats["tokens_saved"] == estimate_tokens(stats["bytes_saved"])
+
+
+def test_estimate_tokens_matches_documented_baseline():
+    # ~33 KB JPEG → ~44K base64 chars → ~11K tokens
+    assert 10_000 <= estimate_tokens(LEGACY_SCREENSHOT_BYTES) <= 12_000
@@ -0,0 +1,110 @@
+"""Tests for the durable session store and the TTL sweeper."""
+
+import asyncio
+import json
+import sqlite3
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from pricepilot.api import server
+from pricepilot.api.session_store import (
+    MemorySessionStore,
+    SessionSweeper,
+    SqliteSessionStore,
+    make_session_service,
+)
+
+
+def _backdate(path, session_id, seconds):
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE sessions SET update_time = update_time - ? WHERE id = ?",
+                     (seconds, session_id))
+
+
+@pytest.mark.asyncio
+async def test_sqlite_sessions_survive_a_restart_and_expire(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    store = SqliteSessionStore(path)
+    for sid in ("old", "fresh"):
+        await store.create_session(app_name="pricepilot", user_id="u1", session_id=sid,
+                                   state={"store_name": "שופרסל"})
+    _backdate(path, "old", 7200)
+
+    restarted = SqliteSessionStore(path)
+    session = await restarted.get_session(app_name="pricepilot", user_id="u1", session_id="old")
+    assert session.state["store_name"] == "שופרסל"
+
+    expired: list[tuple[str, str]] = []
+
+    async def expire(user_id, session_id):
+        expired.append((user_id, session_id))
+        await restarted.delete_session(app_name="pricepilot", user_id=user_id,
+                                       session_id=session_id)
+
+    sweeper = SessionSweeper(restarted, "pricepilot", expire, ttl=3600)
+    assert await sweeper.sweep() == 1
+    assert expired == [("u1", "old")]
+    assert await restarted.get_session(app_name="pricepilot", user_id="u1", session_id="old") is None
+    assert await restarted.get_session(app_name="pricepilot", user_id="u1", session_id="fresh")
+
+
+@pytest.mark.asyncio
+async def test_get_session_stays_fast_with_thousands_stored(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    store = SqliteSessionStore(path)
+    now = time.time()
+    with sqlite3.connect(path) as conn:
+        conn.executemany(
+            "INSERT INTO sessions (app_name, user_id, id, state, create_time, update_time)"
+            " VALUES ('pricepilot', ?, ?, ?, ?, ?)",
+            [(f"u{i % 50}", f"s{i}", json.dumps({"status": "in_progress"}), now, now)
+             for i in range(5000)],
+        )
+
+    start = time.perf_counter()
+    for i in range(0, 5000, 50):
+        session = await store.get_session(app_name="pricepilot", user_id=f"u{i % 50}",
+                                          session_id=f"s{i}")
+        assert session is not None
+    per_lookup = (time.perf_counter() - start) / 100
+    assert per_lookup < 0.02
+    assert await store.expired_sessions("pricepilot", now - 1) == []
+
+
+@pytest.mark.asyncio
+async def test_memory_store_expiry_and_unknown_backend():
+    store = make_session_service("memory")
+    assert isinstance(store, MemorySessionStore)
+    await store.create_session(app_name="pricepilot", user_id="u1", session_id="s1")
+    assert await store.expired_sessions("pricepilot", time.time() - 60) == []
+    assert await store.expired_sessions("pricepilot", time.time() + 1) == [("u1", "s1")]
+    with pytest.raises(ValueError):
+        make_session_service("redis")
+
+
+def test_sweeper_ends_idle_api_sessions(monkeypatch):
+    async def fake_run_async(user_id, session_id, new_message, **kwargs):
+        await asyncio.sleep(0.01)
+        return
+        yield
+
+    released: list[str] = []
+
+    async def fake_release(session_id):
+        released.append(session_id)
+
+    monkeypatch.setattr(server.runner, "run_async", fake_run_async)
+    monkeypatch.setattr(server.browser_pool, "release", fake_release)
+    body = {"user_id": "u1", "store_name": "שופרסל", "items": [{"name": "חלב"}]}
+    with TestClient(server.app) as client:
+        session_id = client.post("/sessions", json=body).json()["session_id"]
+        monkeypatch.setattr(server.session_sweeper, "ttl", -60)
+        client.portal.call(server.session_sweeper.sweep)
+
+        assert session_id in released
+        assert session_id not in server._progress
+        assert server.job_manager.get(session_id) is None
+        status = client.get(f"/sessions/{session_id}", params={"user_id": "u1"})
+        assert status.status_code == 404
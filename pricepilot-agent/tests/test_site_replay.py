@@ -0,0 +1,205 @@
+"""Tests for recording store traffic to HAR files and replaying it offline.
+
+The archive, recorder, replay server and route handler run without a
+browser; the end-to-end replay through Playwright is skipped when Chromium
+is not installed.
+"""
+
+import json
+import urllib.error
+import urllib.request
+from pathlib import Path
+from types import SimpleNamespace as NS
+
+import pytest
+import pytest_asyncio
+
+from pricepilot import __version__
+from pricepilot.config import STORE_URLS
+from pricepilot.tools.site_replay import (
+    ArchivedResponse,
+    ReplayServer,
+    SiteArchive,
+    SiteRecorder,
+    SiteReplay,
+)
+
+SITES = Path(__file__).parent / "fixtures" / "sites"
+HTML = {"content-type": "text/html; charset=utf-8"}
+
+
+def test_archive_round_trips_through_har_files(tmp_path):
+    archive = SiteArchive(str(tmp_path))
+    archive.add(ArchivedResponse("GET", "https://shop.example/search?q=חלב", 200, HTML,
+                                 "<h1>חלב</h1>".encode()))
+    archive.add(ArchivedResponse("GET", "https://cdn.example/logo.png", 200,
+                                 {"content-type": "image/png"}, b"\x89PNG\x00\xff"))
+    assert archive.save() == 2
+    assert archive.save() == 0  # Nothing new
+    har = json.loads((tmp_path / "shop.example.har").read_text(encoding="utf-8"))
+    assert har["log"]["creator"] == {"name": "pricepilot", "version": __version__}
+
+    loaded = SiteArchive.load(str(tmp_path))
+    assert loaded.hosts() == ["cdn.example", "shop.example"]
+    assert loaded.lookup("GET", "https://cdn.example/logo.png").body == b"\x89PNG\x00\xff"
+    # Another query on a recorded path gets the recorded page
+    page = loaded.lookup("get", "https://shop.example/search?q=ביצים")
+    assert page.body.decode() == "<h1>חלב</h1>"
+    assert loaded.lookup("POST", "https://shop.example/search") is None
+    assert len(SiteArchive.load(str(tmp_path / "missing"))) == 0
+
+
+@pytest.mark.asyncio
+async def test_flush_writes_the_har_files_in_a_worker_thread(tmp_path, monkeypatch):
+    import asyncio
+    import threading
+
+    replay = SiteReplay("record", str(tmp_path))
+    replay.archive.add(ArchivedResponse("GET", "https://shop.example/", 200, HTML, b"<p></p>"))
+    threads = []
+    to_thread = asyncio.to_thread
+
+    async def record_thread(func, *args):
+        threads.append(func)
+        return await to_thread(lambda: (threads.append(threading.current_thread()), func(*args)))
+
+    monkeypatch.setattr(asyncio, "to_thread", record_thread)
+    await replay.flush()
+    await replay.flush()  # Nothing new
+    assert len(threads) == 2 and threads[1] is not threading.main_thread()
+    assert SiteArchive.load(str(tmp_path)).hosts() == ["shop.example"]
+
+
+@pytest.mark.asyncio
+async def test_recorder_keeps_bodies_and_redirects():
+    archive = SiteArchive("unused")
+    recorder = SiteRecorder(archive)
+
+    def response(url, status, headers, body=None):
+        async def read():
+            if body is None:
+                raise RuntimeError("Response body is unavailable for redirect responses")
+            return body
+        return NS(request=NS(url=url, method="GET"), status=status, headers=headers, body=read)
+
+    await recorder.on_response(response("https://shop.example/", 302,
+                                        {"Location": "https://shop.example/he"}))
+    await recorder.on_response(response("https://shop.example/he", 200,
+                                        {**HTML, "content-encoding": "br"}, b"<html></html>"))
+    await recorder.on_response(response("data:image/png;base64,AAAA", 200, {}, b""))
+
+    redirect = archive.lookup("GET", "https://shop.example/")
+    assert (redirect.status, redirect.headers["location"]) == (302, "https://shop.example/he")
+    page = archive.lookup("GET", "https://shop.example/he")
+    assert page.body == b"<html></html>" and "content-encoding" not in page.headers
+    assert len(archive) == 2
+
+
+def test_replay_server_serves_recordings_and_marks_misses():
+    archive = SiteArchive("unused")
+    archive.add(ArchivedResponse("GET", "https://shop.example/search?q=1", 200, HTML,
+                                 "<p>תוצאות</p>".encode()))
+    server = ReplayServer(archive)
+    server.start()
+    try:
+        with urllib.request.urlopen(server.url_for("https://shop.example/search?q=2")) as resp:
+            assert resp.headers["content-type"] == HTML["content-type"]
+            assert resp.read().decode() == "<p>תוצאות</p>"
+        with pytest.raises(urllib.error.HTTPError) as miss:
+            urllib.request.urlopen(server.url_for("https://shop.example/other"))
+        assert miss.value.code == 404
+        assert miss.value.headers["x-pricepilot-replay-miss"] == "1"
+    finally:
+        server.close()
+
+
+class FakeRoute:
+    def __init__(self, url, resource_type, response):
+        self.request = NS(url=url, resource_type=resource_type)
+        self._response = response
+        self.done = None
+
+    async def fetch(self, url, max_redirects):
+        self.fetched = url
+        return self._response
+
+    async def fulfill(self, response):
+        self.done = ("fulfill", response)
+
+    async def abort(self, error_code="failed"):
+        self.done = ("abort", error_code)
+
+    async def fallback(self):
+        self.done = ("fallback", None)
+
+
+@pytest.mark.asyncio
+async def test_route_handler_never_reaches_the_network():
+    server = ReplayServer(SiteArchive("unused"))
+    server.start()
+    try:
+        hit = NS(status=200, headers={"content-type": "text/html"})
+        miss = NS(status=404, headers={"x-pricepilot-replay-miss": "1"})
+
+        route = FakeRoute("https://shop.example/he", "document", hit)
+        await server.handle(route)
+        assert route.done == ("fulfill", hit)
+        assert route.fetched.startswith(server.base_url + "/https/")
+
+        page_miss = FakeRoute("https://shop.example/gone", "document", miss)
+        await server.handle(page_miss)
+        assert page_miss.done == ("fulfill", miss)  # The page shows a 404
+
+        asset_miss = FakeRoute("https://tracker.example/t.js", "script", miss)
+        await server.handle(asset_miss)
+        assert asset_miss.done == ("abort", "failed")
+
+        inline = FakeRoute("data:image/png;base64,AAAA", "image", hit)
+        await server.handle(inline)
+        assert inline.done == ("fallback", None)
+    finally:
+        server.close()
+
+
+def test_fixtures_cover_every_store():
+    archive = SiteArchive.load(str(SITES))
+    for store_url in set(STORE_URLS.values()):
+        home = archive.lookup("GET", store_url)
+        assert home is not None and home.status == 200, store_url
+        search = archive.lookup("GET", home.body.decode().split('action="')[1].split('"')[0]
+                                + "?q=חלב")
+        assert search is not None, store_url
+        assert b"cart-count" in search.body, store_url
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        SiteReplay("live")
+
+
+@pytest_asyncio.fixture
+async def replay_context():
+    playwright_api = pytest.importorskip("playwright.async_api")
+    replay = SiteReplay("replay", str(SITES))
+    async with playwright_api.async_playwright() as p:
+        try:
+            browser = await p.chromium.launch(headless=True)
+        except Exception as e:
+            pytest.skip(f"Chromium not available: {e}")
+        context = await browser.new_context()
+        await replay.attach(context)
+        yield context
+        await browser.close()
+    replay.close()
+
+
+@pytest.mark.asyncio
+async def test_store_search_replays_offline(replay_context):
+    page = await replay_context.new_page()
+    await page.goto(STORE_URLS["שופרסל"], wait_until="domcontentloaded")
+    await page.fill("#js-site-search-input", "חלב")
+    await page.click("button.js_search_button")
+    await page.wait_for_selector("li.miglog-prod")
+    assert await page.locator("li.miglog-prod").count() == 3
+    await page.locator("button.js-add-to-cart").first.click()
+    assert await page.locator(".cart-count").inner_text() == "1"
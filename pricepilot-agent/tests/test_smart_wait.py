@@ -0,0 +1,59 @@
+"""Tests for event-driven waits (fake page, no browser)."""
+
+import pytest
+
+from pricepilot.tools.smart_wait import (
+    read_text,
+    settle,
+    wait_for_dom_quiet,
+    wait_for_network_idle,
+)
+
+
+class FakePage:
+    def __init__(self, quiet=True, idle=True, navigate=False):
+        self.quiet = quiet
+        self.idle = idle
+        self.navigate = navigate
+        self.load_states = []
+
+    async def evaluate(self, script, arg=None):
+        if self.navigate:
+            raise RuntimeError("Execution context was destroyed")
+        if "MutationObserver" in script:
+            return self.quiet
+        return "3"
+
+    async def wait_for_load_state(self, state, timeout=None):
+        self.load_states.append(state)
+        if state == "networkidle" and not self.idle:
+            raise TimeoutError("timeout")
+
+
+@pytest.mark.asyncio
+async def test_dom_quiet_reports_condition():
+    assert (await wait_for_dom_quiet(FakePage(quiet=True), 1000)).met is True
+    assert (await wait_for_dom_quiet(FakePage(quiet=False), 1000)).met is False
+
+
+@pytest.mark.asyncio
+async def test_dom_quiet_survives_navigation():
+    page = FakePage(navigate=True)
+    result = await wait_for_dom_quiet(page, 1000)
+    assert result.met is False
+    assert page.load_states == ["domcontentloaded"]
+
+
+@pytest.mark.asyncio
+async def test_network_idle_timeout_is_not_an_error():
+    result = await wait_for_network_idle(FakePage(idle=False), 500)
+    assert result.as_dict()["met"] is False
+    assert result.as_dict()["until"] == "networkidle"
+
+
+@pytest.mark.asyncio
+async def test_settle_and_read_text():
+    page = FakePage()
+    assert (await settle(page)).met is True
+    assert await read_text(page, ".cart-count") == "3"
+    assert await read_text(page, None) is None
@@ -0,0 +1,81 @@
+"""Tests for the per-store storage-state cache."""
+
+import json
+import time
+
+import pytest
+
+from pricepilot.tools.storage_state import StorageStateCache, apply_storage_state, setup_only
+
+STATE = {
+    "cookies": [{"name": "city", "value": "tlv", "domain": ".shufersal.co.il", "path": "/"}],
+    "origins": [{"origin": "https://www.shufersal.co.il", "localStorage": [
+        {"name": "deliveryCity", "value": "תל אביב"},
+    ]}],
+}
+
+
+def test_save_and_load_roundtrip(tmp_path):
+    cache = StorageStateCache(directory=str(tmp_path), ttl=60)
+    cache.save("shufersal.co.il", "תל אביב", STATE)
+    assert cache.load("shufersal.co.il", "תל אביב") == STATE
+    # City is normalized for whitespace
+    assert cache.load("shufersal.co.il", "  תל   אביב ") == STATE
+    assert cache.load("shufersal.co.il", "חיפה") is None
+    assert cache.load("rami-levy.co.il", "תל אביב") is None
+
+
+def test_only_setup_cookies_and_keys_are_shared(tmp_path):
+    private = {
+        "cookies": STATE["cookies"] + [
+            {"name": name, "value": "x", "domain": ".shufersal.co.il", "path": "/"}
+            for name in ("JSESSIONID", "auth_token", "cartId", "delivery_cart", "OptanonConsent")
+        ],
+        "origins": STATE["origins"] + [{"origin": "https://www.rami-levy.co.il", "localStorage": [
+            {"name": "userToken", "value": "secret"}, {"name": "basket", "value": "[1,2]"},
+        ]}],
+    }
+    kept = setup_only(private)
+    assert [c["name"] for c in kept["cookies"]] == ["city", "OptanonConsent"]
+    assert kept["origins"] == STATE["origins"]
+
+    cache = StorageStateCache(directory=str(tmp_path), ttl=60)
+    path = cache.save("shufersal.co.il", None, private)
+    assert "JSESSIONID" not in path.read_text(encoding="utf-8")
+    assert cache.load("shufersal.co.il", None) == kept
+
+
+def test_expired_snapshot_is_dropped(tmp_path):
+    cache = StorageStateCache(directory=str(tmp_path), ttl=60)
+    path = cache.save("victoryonline.co.il", None, STATE)
+    entry = json.loads(path.read_text(encoding="utf-8"))
+    entry["saved_at"] = time.time() - 120
+    path.write_text(json.dumps(entry), encoding="utf-8")
+    assert cache.load("victoryonline.co.il", None) is None
+    assert not path.exists()
+
+
+def test_purge_expired(tmp_path):
+    cache = StorageStateCache(directory=str(tmp_path), ttl=0)
+    cache.save("a.co.il", None, STATE)
+    cache.save("b.co.il", None, STATE)
+    time.sleep(0.01)
+    assert cache.purge_expired() == 2
+
+
+@pytest.mark.asyncio
+async def test_apply_storage_state_seeds_context():
+    class FakeContext:
+        cookies = None
+        script = None
+
+        async def add_cookies(self, cookies):
+            self.cookies = cookies
+
+        async def add_init_script(self, script):
+            self.script = script
+
+    context = FakeContext()
+    await apply_storage_state(context, STATE)
+    assert context.cookies == STATE["cookies"]
+    assert "deliveryCity" in context.script
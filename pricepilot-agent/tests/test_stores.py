@@ -0,0 +1,73 @@
+"""Tests for the store recipe registry.
+
+Each recipe is also run against its store's fixture search page in
+``tests/fixtures/sites``; those tests are skipped when Chromium is not
+installed.
+"""
+
+import json
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+
+from pricepilot.config import STORE_URLS
+from pricepilot.stores import GENERIC_RECIPE, STORE_RECIPES, recipe_for_url
+from pricepilot.tools.network_filter import store_host
+
+SITES = Path(__file__).parent / "fixtures" / "sites"
+
+
+def test_every_configured_store_has_a_recipe():
+    for url in STORE_URLS.values():
+        assert store_host(url) in STORE_RECIPES
+
+
+def test_recipe_lookup_by_url():
+    shufersal = recipe_for_url("https://www.shufersal.co.il/online/he/search?q=milk")
+    assert shufersal is STORE_RECIPES["shufersal.co.il"]
+    assert shufersal.barcode_attr == "data-product-code"
+    assert recipe_for_url("https://unknown-store.co.il/") is GENERIC_RECIPE
+
+
+def test_stores_on_the_generic_recipe_are_the_documented_ones():
+    generic = {store for store, recipe in STORE_RECIPES.items() if recipe is GENERIC_RECIPE}
+    assert generic == {"mh-hashuk.co.il", "hcohen.co.il", "yochananof.co.il", "osherad.co.il"}
+
+
+def _search_page(host: str) -> str:
+    """The search results page recorded in the store's fixture archive."""
+    for path in SITES.glob("*.har"):
+        if store_host(f"https://{path.stem}/") != host:
+            continue
+        for entry in json.loads(path.read_text(encoding="utf-8"))["log"]["entries"]:
+            content = entry["response"]["content"]
+            if "search" in entry["request"]["url"] and "html" in content.get("mimeType", ""):
+                return content["text"]
+    raise AssertionError(f"No fixture search page for {host}")
+
+
+@pytest_asyncio.fixture
+async def page():
+    playwright_api = pytest.importorskip("playwright.async_api")
+    async with playwright_api.async_playwright() as p:
+        try:
+            browser = await p.chromium.launch(headless=True)
+        except Exception as e:
+            pytest.skip(f"Chromium not available: {e}")
+        yield await browser.new_page()
+        await browser.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("store", sorted(STORE_RECIPES))
+async def test_recipe_matches_the_stores_fixture_search_page(page, store):
+    recipe = STORE_RECIPES[store]
+    await page.set_content(_search_page(store))
+    assert await page.locator(recipe.search_input).count()
+    assert await page.locator(recipe.cart_count).count()
+    cards = page.locator(recipe.result_card)
+    assert await cards.count() >= 2
+    card = cards.first
+    assert (await card.locator(recipe.card_name).first.text_content()).strip()
+    assert await card.locator(recipe.add_button).count()
@@ -0,0 +1,134 @@
+"""Tests for typed progress events and the SSE endpoints (agent runs stubbed)."""
+
+import asyncio
+import json
+import time
+import uuid
+from types import SimpleNamespace as NS
+
+import pytest
+from fastapi.testclient import TestClient
+
+from pricepilot.api import server
+from pricepilot.api.events import ProgressTracker, sse
+from pricepilot.types import BuildCartRequest
+
+
+def _event(role, *parts):
+    return NS(id=str(uuid.uuid4()), timestamp=time.time(), partial=False,
+              content=NS(role=role, parts=list(parts)))
+
+
+def _text(text):
+    return NS(text=text, function_call=None, function_response=None)
+
+
+def _call(tool, **args):
+    return NS(text=None, function_call=NS(name=tool, args=args), function_response=None)
+
+
+def _result(name, payload):
+    return NS(text=None, function_call=None,
+              function_response=NS(name=name, response={"result": json.dumps(payload)}))
+
+
+RUN = [
+    _event("model", _text("Adding item 1/2: חלב")),
+    _event("model", _call("add_item_by_recipe", name="חלב", quantity=1)),
+    _event("user", _result("add_item_by_recipe", {"added": True, "item": "חלב"})),
+    _event("model", _call("search_products", query="ביצים")),
+    _event("user", _result("search_products", {"error": "No result cards appeared"})),
+    _event("model", _text("Which eggs do you want, L or M?")),
+]
+
+
+def test_tracker_types_events_and_counts_items():
+    tracker = ProgressTracker(total=2)
+    typed = [e for event in RUN for e in tracker.events_for(event)]
+    assert [e["type"] for e in typed] == [
+        "message", "tool_call", "tool_result", "item_progress",
+        "tool_call", "tool_result", "message",
+    ]
+    assert typed[3] == {"type": "item_progress", "added": 1, "total": 2, "item": "חלב"}
+    assert typed[5]["ok"] is False
+    assert tracker.finish(None) == [
+        {"type": "question", "text": "Which eggs do you want, L or M?"},
+    ]
+    ready = tracker.finish("https://www.shufersal.co.il/online/he/checkout")
+    assert ready[0]["type"] == "checkout_ready"
+
+
+def test_tracker_counts_batch_adds():
+    tracker = ProgressTracker(total=3)
+    batch = {"added": [{"item": "חלב", "quantity": 2}, {"item": "לחם", "quantity": 1}],
+             "fallback": [{"added": False, "item": "ביצים", "failed_step": "match"}]}
+    typed = tracker.events_for(_event("user", _result("add_items_parallel", batch)))
+    assert typed[-1] == {"type": "item_progress", "added": 2, "total": 3, "item": "לחם"}
+
+
+def test_sse_frame():
+    assert sse({"type": "done", "status": "ok"}) == (
+        'event: done\ndata: {"type": "done", "status": "ok"}\n\n'
+    )
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def fake_run_async(user_id, session_id, new_message, **kwargs):
+        for event in RUN:
+            await asyncio.sleep(0.05)
+            yield event
+
+    monkeypatch.setattr(server.runner, "run_async", fake_run_async)
+    # Entering the client runs the lifespan, so the job workers share its loop
+    with TestClient(server.app) as client:
+        yield client
+
+
+def test_stream_sends_session_first_and_ends_with_done(client):
+    body = {"user_id": "u1", "store_name": "שופרסל",
+            "items": [{"name": "חלב"}, {"name": "ביצים"}]}
+    with client.stream("POST", "/sessions/stream", json=body) as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        frames = [
+            json.loads(line[len("data: "):])
+            for line in response.iter_lines() if line.startswith("data: ")
+        ]
+
+    assert frames[0]["type"] == "session"
+    types = [f["type"] for f in frames]
+    assert "item_progress" in types
+    assert types[-2:] == ["question", "done"]
+    assert frames[-1]["added"] == 1
+
+    status = client.get(f"/sessions/{frames[0]['session_id']}", params={"user_id": "u1"})
+    assert status.json()["items_added"] == 1
+
+
+@pytest.mark.asyncio
+async def test_first_event_arrives_before_the_run_finishes(monkeypatch):
+    async def fake_run_async(user_id, session_id, new_message, **kwargs):
+        for event in RUN:
+            await asyncio.sleep(0.05)
+            yield event
+
+    monkeypatch.setattr(server.runner, "run_async", fake_run_async)
+    request = BuildCartRequest(user_id="u1", store_name="שופרסל", items=[{"name": "חלב"}])
+    try:
+        response = await server.create_session_stream(request)
+        start = time.monotonic()
+        chunks = response.body_iterator
+        first = await chunks.__anext__()
+        first_at = time.monotonic() - start
+        rest = [chunk async for chunk in chunks]
+    finally:
+        await server.job_manager.close()
+
+    assert first.startswith("event: session")
+    assert first_at < 0.05  # The stubbed run takes 6 × 0.05 s
+    assert rest[-1].startswith("event: done")
+
+
+def test_message_stream_unknown_session(client):
+    response = client.post("/sessions/nope/message/stream", json={"user_id": "u1", "text": "L"})
+    assert response.status_code == 404
@@ -0,0 +1,112 @@
+"""Tests for the session, turn, tool and navigation spans."""
+
+import asyncio
+import json
+import time
+from types import SimpleNamespace as NS
+from typing import Optional
+
+import pytest
+from fastapi.testclient import TestClient
+from google.adk.tools import ToolContext
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from pricepilot import tracing
+from pricepilot.api import server
+from pricepilot.tools.budget import BudgetedTool, budget_ledger
+
+
+@pytest.fixture
+def spans():
+    exporter = InMemorySpanExporter()
+    tracing._provider().add_span_processor(SimpleSpanProcessor(exporter))
+    yield exporter
+    exporter.shutdown()
+
+
+async def search_products(query: str, tool_context: Optional[ToolContext] = None) -> str:
+    await tracing.goto(NS(goto=_fake_goto), "https://www.shufersal.co.il/online/search?q=x")
+    return json.dumps({"products": [query]}, ensure_ascii=False)
+
+
+async def _fake_goto(url, **kwargs):
+    return NS(status=200)
+
+
+def test_session_turn_tool_and_navigation_spans_form_one_trace(spans, monkeypatch):
+    tool = BudgetedTool(search_products)
+
+    async def fake_run_async(user_id, session_id, new_message, **kwargs):
+        context = NS(session=NS(id=session_id),
+                     state={"store_url": "https://www.shufersal.co.il/online"})
+        await tool.run_async(args={"query": "חלב"}, tool_context=context)
+        await asyncio.sleep(0.01)
+        return
+        yield
+
+    monkeypatch.setattr(server.runner, "run_async", fake_run_async)
+    body = {"user_id": "u1", "store_name": "שופרסל", "items": [{"name": "חלב"}]}
+    with TestClient(server.app) as client:
+        session_id = client.post("/sessions", json=body).json()["session_id"]
+        url, params = f"/sessions/{session_id}", {"user_id": "u1"}
+        while client.get(url, params=params).json()["job"]["state"] != "done":
+            time.sleep(0.01)
+        client.delete(url, params=params)
+    budget_ledger.drop(session_id)
+
+    by_name = {span.name: span for span in spans.get_finished_spans()
+               if span.attributes.get("pricepilot.session_id", session_id) == session_id}
+    session, turn = by_name["session"], by_name["agent_turn"]
+    tool_call, navigate = by_name["tool search_products"], by_name["navigate"]
+    assert session.parent is None
+    assert turn.parent.span_id == session.context.span_id
+    assert tool_call.parent.span_id == turn.context.span_id
+    assert navigate.parent.span_id == tool_call.context.span_id
+    assert {s.context.trace_id for s in (session, turn, tool_call, navigate)} == {
+        session.context.trace_id
+    }
+
+    assert session.attributes["pricepilot.store"] == "shufersal.co.il"
+    assert turn.attributes["pricepilot.outcome"] == "done"
+    assert json.loads(tool_call.attributes["pricepilot.tool.args"]) == {"query": "חלב"}
+    assert tool_call.attributes["pricepilot.tool.result_bytes"] > 0
+    assert tool_call.attributes["pricepilot.tool.outcome"] == "ok"
+    assert navigate.attributes["http.response.status_code"] == 200
+
+
+def test_file_exporter_writes_json_lines(tmp_path):
+    path = tmp_path / "traces" / "spans.jsonl"
+    assert tracing.setup_tracing("", str(path)) is False
+    assert tracing.setup_tracing("file", str(path)) is True
+    with tracing.tracer.start_as_current_span("navigate", attributes={"url.full": "x"}):
+        pass
+    tracing.flush_tracing()
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert any(span["name"] == "navigate" for span in lines)
+    with pytest.raises(ValueError):
+        tracing.setup_tracing("jaeger")
+
+
+@pytest.mark.asyncio
+async def test_item_tool_spans_carry_the_item(spans):
+    async def add_candidate(handle: str, tool_context: Optional[ToolContext] = None) -> str:
+        return json.dumps({"added": True, "handle": handle})
+
+    context = NS(session=NS(id="item-spans"),
+                 state={"store_url": "https://www.shufersal.co.il/online",
+                        "item_names": ["לחם", "חלב"]})
+    await BudgetedTool(search_products).run_async(args={"query": "חלב"}, tool_context=context)
+    await BudgetedTool(add_candidate).run_async(args={"handle": "p1"}, tool_context=context)
+    await BudgetedTool(search_products).run_async(args={"query": "גבינה"}, tool_context=context)
+    budget_ledger.drop("item-spans")
+
+    tool_spans = [span for span in spans.get_finished_spans()
+                  if span.attributes.get("pricepilot.session_id") == "item-spans"
+                  and span.name.startswith("tool ")]
+    assert [(s.name, s.attributes["pricepilot.item"], s.attributes.get("pricepilot.item_index"))
+            for s in tool_spans] == [
+        ("tool search_products", "חלב", 1),
+        ("tool add_candidate", "חלב", 1),
+        ("tool search_products", "גבינה", None),
+    ]